@@ -3,6 +3,9 @@ ClaimCopilot - Interactive CLI Demo
 
 Usage:
     python app.py
+    python app.py --file claim.txt        # one claim, then exit
+    python app.py --daemon                # use a running claim daemon if there is one
+    python app.py --serve                 # start the claim daemon (keeps models loaded)
 
 Menu:
   1) Paste claim text
@@ -12,12 +15,17 @@ Menu:
 Notes:
   - When pasting text, finish by typing '///END' on a new line.
   - If no OPENAI_API_KEY is set, LLM-dependent parts will show '[LLM disabled]'.
+  - The pipeline (and its models) is built once per session, in the background
+    while the menu is shown. With --daemon, claims are sent to a long-running
+    worker (src/claim_daemon.py) instead, so nothing is loaded here at all.
 """
 
+import argparse
 import os
 import sys
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 
 # --- Locate project root and src folder --------------------------------------
 
@@ -27,13 +35,58 @@ SRC = BASE / "src"
 if str(SRC) not in sys.path:
     sys.path.append(str(SRC))
 
-# --- Import orchestrator and state -------------------------------------------
+# --- Import state (the orchestrator and models are loaded on demand) --------
 
-from orchestrator import Orchestrator  # type: ignore
 from state import ClaimState  # type: ignore
 
 END_MARKER = "///END"
 
+# --- Pipeline, built once per session ------------------------------------------
+
+_PIPELINE: Any = None
+_PIPELINE_LOCK = threading.Lock()
+
+
+def get_pipeline(daemon: Optional[str] = None) -> Any:
+    """
+    Object with a run(text) -> ClaimState method, created on first call and
+    reused for every later claim: a DaemonClient when `daemon` is given and a
+    daemon answers there, otherwise an in-process Orchestrator (models warmed up).
+    """
+    global _PIPELINE
+    with _PIPELINE_LOCK:
+        if _PIPELINE is not None:
+            return _PIPELINE
+        if daemon is not None:
+            from claim_daemon import DaemonClient  # type: ignore
+            client = DaemonClient(daemon)
+            if client.ping():
+                _PIPELINE = client
+                return _PIPELINE
+            print(f"[Warning] No claim daemon at {daemon}; running the pipeline in this process.")
+
+        from orchestrator import Orchestrator  # type: ignore
+        from model_registry import warmup  # type: ignore
+
+        orc = Orchestrator()
+        warmup(verbose=False)
+        _PIPELINE = orc
+        return _PIPELINE
+
+
+def preload_pipeline(daemon: Optional[str] = None) -> None:
+    """
+    Start building the pipeline in the background, so the menu shows right
+    away and the models are (usually) ready by the time a claim is entered.
+    """
+    def _load():
+        try:
+            get_pipeline(daemon)
+        except Exception as e:
+            print("[Warning] Could not preload the pipeline:", e)
+
+    threading.Thread(target=_load, name="pipeline-preload", daemon=True).start()
+
 # --- Pretty-print helpers ----------------------------------------------------
 
 def print_section(title: str):
@@ -69,13 +122,12 @@ def show_header():
 
 # --- Core function to run pipeline on one claim text -------------------------
 
-def run_claim(text: str, save_dir: Optional[Path] = None) -> ClaimState:
+def run_claim(text: str, save_dir: Optional[Path] = None, daemon: Optional[str] = None) -> ClaimState:
     """
     Run the full agentic workflow on a single claim text.
     Returns the final ClaimState.
     """
-    orc = Orchestrator()
-    state = orc.run(text)
+    state = get_pipeline(daemon).run(text)
 
     # Pretty print results
     print_section("RAW TEXT")
@@ -99,7 +151,9 @@ def run_claim(text: str, save_dir: Optional[Path] = None) -> ClaimState:
 
     print_section("TRACE (Agents that ran)")
     for step in state.trace:
-        print(f"  [{step['timestamp']}] {step['agent']} -> {step['action']}")
+        timing = step.get("metrics") or {}
+        took = f" ({timing['duration_ms']:.1f} ms)" if "duration_ms" in timing else ""
+        print(f"  [{step['timestamp']}] {step['agent']} -> {step['action']}{took}")
 
     # Optionally save JSON output
     if save_dir is not None:
@@ -146,10 +200,43 @@ def read_multiline_input() -> str:
 
     return "\n".join(lines).strip()
 
-def main():
-    show_header()
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ClaimCopilot interactive CLI demo")
+    parser.add_argument("--file", help="Run one claim from this .txt file and exit")
+    parser.add_argument("--daemon", nargs="?", const="", default=None, metavar="ADDRESS",
+                        help="Send claims to a running claim daemon (default address if none given)")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the claim daemon in this process (keeps the models loaded)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
     outputs_dir = BASE / "outputs"
 
+    daemon = args.daemon
+    if daemon is not None or args.serve:
+        from claim_daemon import DEFAULT_ADDRESS, ClaimDaemon  # type: ignore
+        daemon = daemon or DEFAULT_ADDRESS
+        if args.serve:
+            try:
+                ClaimDaemon(daemon).serve_forever()
+            except KeyboardInterrupt:
+                pass
+            return
+
+    if args.file:
+        text = read_text_from_file(args.file)
+        if not text.strip():
+            print("[Warning] File is empty or could not be read.")
+            sys.exit(1)
+        run_claim(text, save_dir=outputs_dir, daemon=daemon)
+        return
+
+    show_header()
+    # Models load while the user reads the menu / pastes text; every claim reuses them
+    preload_pipeline(daemon)
+
     try:
         while True:
             print("\nMenu:")
@@ -168,7 +255,7 @@ def main():
                     print("[Warning] No text entered. Try again.")
                     continue
 
-                run_claim(text, save_dir=outputs_dir)
+                run_claim(text, save_dir=outputs_dir, daemon=daemon)
                 pause()
 
             elif choice == "2":
@@ -182,7 +269,7 @@ def main():
                     print("[Warning] File is empty or could not be read.")
                     continue
 
-                run_claim(text, save_dir=outputs_dir)
+                run_claim(text, save_dir=outputs_dir, daemon=daemon)
                 pause()
 
             else:
@@ -0,0 +1,279 @@
+"""
+ClaimCopilot - Batch runner
+
+Runs the full pipeline over a claims JSONL file (one {"id", "text", ...} record
+per line, or {"id", "documents": [text, ...], ...} for multi-document claims)
+using a pool of worker processes, and writes one result line per claim
+to an output JSONL file in input order. Input and output may be gzip / zstd
+compressed (.gz / .zst); both are streamed, so memory stays flat.
+
+Usage:
+    python batch_run.py --input data/claims.jsonl --output outputs/batch_results.jsonl --workers 4
+    python batch_run.py ... --resume        # continue an interrupted run
+    python batch_run.py ... --deferred --chunk-size 5000   # LLM prompts via the OpenAI Batch API
+    python batch_run.py ... --dedup outputs/intake_index.sqlite   # flag / reuse duplicate claims
+
+Notes:
+  - Each worker process builds its Orchestrator (and loads the NER model) once.
+  - After every chunk the output is synced and a checkpoint
+    (<output>.ckpt) records how many claims are done and the output size,
+    so --resume continues from the last completed chunk.
+  - --deferred answers each chunk's LLM prompts with one Batch API job
+    (src/batch_api.py) in this process; use a large --chunk-size.
+  - --dedup flags duplicate / near-duplicate claims (src/dedup.py) and answers
+    exact duplicates of earlier claims from their stored result. It runs in
+    this process, so every claim is checked against all earlier ones.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# --- Locate project root and src folder --------------------------------------
+
+BASE = Path(__file__).resolve().parent
+SRC = BASE / "src"
+
+if str(SRC) not in sys.path:
+    sys.path.append(str(SRC))
+
+from orchestrator import Orchestrator  # type: ignore
+from state import ClaimState  # type: ignore
+from model_registry import warmup  # type: ignore
+from jsonl_io import JsonlWriter, iter_jsonl  # type: ignore
+
+DEFAULT_INPUT = BASE / "data" / "claims.jsonl"
+DEFAULT_OUTPUT = BASE / "outputs" / "batch_results.jsonl"
+
+# --- Result records ----------------------------------------------------------
+
+def result_record(rec: Dict[str, Any], state: ClaimState) -> Dict[str, Any]:
+    """
+    Flatten one finished ClaimState into the JSON line we write out.
+    """
+    return {
+        "id": rec.get("id"),
+        "extracted_fields": state.extracted_fields,
+        "triage": state.triage,
+        "summary": state.summary,
+        "issues": state.issues,
+    }
+
+# --- Worker side -------------------------------------------------------------
+
+_ORC: Optional[Orchestrator] = None
+_DEFERRED = False
+
+
+def _init_worker(
+    fast_path: bool,
+    combined_llm: bool = False,
+    deferred: bool = False,
+    dedup: Optional[str] = None,
+) -> None:
+    """
+    Pool initializer: build one Orchestrator per process and load models now,
+    so every chunk this worker handles reuses them.
+    """
+    global _ORC, _DEFERRED
+    warmup(verbose=False)
+    index = None
+    if dedup:
+        from dedup import IntakeIndex  # type: ignore
+        index = IntakeIndex(dedup, store_states=True)
+    _ORC = Orchestrator(
+        fast_path=fast_path,
+        combined_llm=combined_llm,
+        dedup=index,
+        reuse_duplicates=index is not None,
+    )
+    _DEFERRED = deferred
+
+
+def process_chunk(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Run the pipeline over one chunk of input records (stage-wise batched).
+    """
+    texts = [r.get("documents") or r.get("text", "") for r in records]
+    ids = [None if r.get("id") is None else str(r["id"]) for r in records]
+    if _DEFERRED:
+        states = _ORC.run_deferred(texts, claim_ids=ids)
+    else:
+        states = _ORC.run_many(texts, chunk_size=len(records) or 1, claim_ids=ids)
+    return [result_record(r, s) for r, s in zip(records, states)]
+
+# --- Input / ordering --------------------------------------------------------
+
+def iter_chunks(records: Iterable[Dict[str, Any]], chunk_size: int) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    Group a record stream into (chunk number, records) lists of `chunk_size`.
+    """
+    it = iter(records)
+    n = 0
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield n, chunk
+        n += 1
+
+
+def iter_results(
+    chunks: Iterable[Tuple[Any, List[Dict[str, Any]]]],
+    workers: int,
+    fast_path: bool = False,
+    combined_llm: bool = False,
+    deferred: bool = False,
+    dedup: Optional[str] = None,
+) -> Iterator[Tuple[Any, List[Dict[str, Any]]]]:
+    """
+    Process (tag, records) chunks and yield (tag, results) in the same order.
+
+    workers <= 1 runs in this process. Otherwise chunks are spread over a
+    process pool; at most 2 * workers chunks are in flight, so memory stays
+    bounded however large the input is. deferred=True always runs in this
+    process: the LLM work happens remotely in Batch API jobs. So does `dedup`
+    (path of the intake index), so that one index sees every claim.
+    """
+    if workers <= 1 or deferred or dedup:
+        _init_worker(fast_path, combined_llm, deferred, dedup)
+        try:
+            for tag, records in chunks:
+                yield tag, process_chunk(records)
+        finally:
+            _ORC.close()
+            if _ORC.dedup is not None:
+                _ORC.dedup.close()
+        return
+
+    with Pool(processes=workers, initializer=_init_worker, initargs=(fast_path, combined_llm)) as pool:
+        in_flight: deque = deque()
+        for tag, records in chunks:
+            in_flight.append((tag, pool.apply_async(process_chunk, (records,))))
+            if len(in_flight) >= 2 * workers:
+                done_tag, res = in_flight.popleft()
+                yield done_tag, res.get()
+        while in_flight:
+            done_tag, res = in_flight.popleft()
+            yield done_tag, res.get()
+
+# --- Checkpoints -------------------------------------------------------------
+
+def checkpoint_path(output_path: Path) -> Path:
+    return output_path.with_name(output_path.name + ".ckpt")
+
+
+def load_checkpoint(output_path: Path) -> Optional[Dict[str, Any]]:
+    path = checkpoint_path(output_path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_checkpoint(output_path: Path, data: Dict[str, Any]) -> None:
+    # Write-then-rename so a crash never leaves a half-written checkpoint
+    path = checkpoint_path(output_path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data), encoding="utf-8")
+    os.replace(tmp, path)
+
+# --- Main entry point --------------------------------------------------------
+
+def run(
+    input_path: Path = DEFAULT_INPUT,
+    output_path: Path = DEFAULT_OUTPUT,
+    workers: int = 1,
+    chunk_size: int = 64,
+    resume: bool = False,
+    fast_path: bool = False,
+    combined_llm: bool = False,
+    deferred: bool = False,
+    dedup: Optional[str] = None,
+) -> int:
+    """
+    Process every claim in `input_path` and write results to `output_path`.
+    Returns the total number of claims written (including resumed ones).
+    """
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    ckpt = load_checkpoint(output_path) if resume else None
+    if ckpt is not None:
+        if ckpt.get("input") != str(input_path.resolve()):
+            raise ValueError(
+                f"Checkpoint {checkpoint_path(output_path)} belongs to {ckpt.get('input')}, not {input_path}"
+            )
+        if ckpt.get("complete"):
+            print(f"Nothing to do: {output_path} is already complete ({ckpt['records_done']} claims).")
+            return ckpt["records_done"]
+        records_done = ckpt["records_done"]
+        # Drop anything written after the last checkpoint
+        with output_path.open("ab") as f:
+            f.truncate(ckpt["output_offset"])
+        writer = JsonlWriter(output_path, mode="a")
+        print(f"Resuming after {records_done} claims.")
+    else:
+        records_done = 0
+        writer = JsonlWriter(output_path, mode="w")
+
+    def checkpoint(complete: bool) -> None:
+        save_checkpoint(output_path, {
+            "input": str(input_path.resolve()),
+            "output_offset": writer.sync(),
+            "records_done": records_done,
+            "complete": complete,
+        })
+
+    start = time.perf_counter()
+    new_records = 0
+    with writer:
+        chunks = iter_chunks(iter_jsonl(input_path, skip=records_done), chunk_size)
+        for _, results in iter_results(chunks, workers, fast_path, combined_llm, deferred, dedup):
+            writer.write_many(results)
+            records_done += len(results)
+            new_records += len(results)
+            checkpoint(complete=False)
+
+            elapsed = time.perf_counter() - start
+            print(f"  processed {records_done} claims ({new_records / elapsed:.1f} claims/s)")
+
+        checkpoint(complete=True)
+
+    print(f"Wrote {records_done} results to: {output_path.resolve()}")
+    return records_done
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run ClaimCopilot over a claims JSONL file.")
+    parser.add_argument("--input", type=Path, default=DEFAULT_INPUT)
+    parser.add_argument("--output", type=Path, default=DEFAULT_OUTPUT)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--resume", action="store_true", help="continue from <output>.ckpt")
+    parser.add_argument("--fast-path", action="store_true", help="skip NER when regex rules find the name")
+    parser.add_argument("--combined-llm", action="store_true", help="one structured LLM call for QA note + summary")
+    parser.add_argument("--deferred", action="store_true", help="answer LLM prompts through the OpenAI Batch API")
+    parser.add_argument("--dedup", metavar="PATH", help="intake index (SQLite) to flag and reuse duplicate claims")
+    args = parser.parse_args(argv)
+
+    run(
+        input_path=args.input,
+        output_path=args.output,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        fast_path=args.fast_path,
+        combined_llm=args.combined_llm,
+        deferred=args.deferred,
+        dedup=args.dedup,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,361 @@
+"""
+ClaimCopilot - Benchmarks
+
+Measures per-agent and end-to-end latency / throughput of the pipeline on
+generated claims (src/generate_dataset.py), with a stub LLM whose latency is
+configurable, so numbers are reproducible and cost nothing.
+
+For every agent and for the full pipeline (Orchestrator.run per claim,
+Orchestrator.run_many in chunks) it reports p50 / p95 / p99 latency in ms,
+claims per second and the process-wide peak RSS, and saves everything as JSON.
+
+Usage:
+    python bench.py                                   # defaults: 200 claims, 50 ms LLM latency
+    python bench.py --claims 1000 --llm-latency-ms 0  # pure CPU cost of the pipeline
+    python bench.py --compare outputs/benchmarks/bench-<old>.json
+    python bench.py --compare OLD.json --fail-above 10  # exit 1 on a >10% p50 / throughput regression
+
+Notes:
+  - The NER model is loaded (warmup) before anything is timed; if it can't be
+    loaded, extraction falls back to regex and "ner_loaded" is false in the output.
+  - "process_peak_rss_mb" is the high-water mark of the whole process after
+    each scenario (models, earlier scenarios included), not the memory of that
+    scenario alone; it only grows.
+  - Metrics that can't be computed (no calls, zero wall time) are null.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# --- Locate project root and src folder --------------------------------------
+
+BASE = Path(__file__).resolve().parent
+SRC = BASE / "src"
+
+if str(SRC) not in sys.path:
+    sys.path.append(str(SRC))
+
+from orchestrator import Orchestrator  # type: ignore
+from agents.extraction import ExtractionAgent  # type: ignore
+from state import ClaimState  # type: ignore
+from generate_dataset import DEFAULT_SEED, generate_single_claim  # type: ignore
+from model_registry import ner_loaded, peak_rss_mb, warmup  # type: ignore
+from jsonl_io import JSON_BACKEND  # type: ignore
+
+DEFAULT_OUT_DIR = BASE / "outputs" / "benchmarks"
+
+# --- Stub LLM ----------------------------------------------------------------
+
+class StubLLMClient:
+    """
+    Drop-in for LLMClient (same chat / achat / chat_many API) that never touches
+    the network: every request takes `latency_ms` and returns a canned reply
+    (a canned JSON review when a response_format is requested).
+    chat_many() models `max_concurrency` requests in flight at once.
+    """
+    JSON_REPLY = json.dumps({"issues": ["No issues found."], "summary": "Stub summary."})
+
+    def __init__(self, latency_ms: float = 50.0, max_concurrency: int = 8, reply: str = "OK"):
+        self.model = "stub"
+        self.latency = latency_ms / 1000.0
+        self.max_concurrency = max(1, max_concurrency)
+        self.reply = reply
+        self.requests = 0
+
+    def _reply(self, response_format: Optional[Dict[str, Any]]) -> str:
+        return self.reply if response_format is None else self.JSON_REPLY
+
+    def chat(self, prompt: str, system: str = "", temperature: float = 0.2,
+             response_format: Optional[Dict[str, Any]] = None) -> str:
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return self._reply(response_format)
+
+    async def achat(self, prompt: str, system: str = "", temperature: float = 0.2,
+                    response_format: Optional[Dict[str, Any]] = None) -> str:
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._reply(response_format)
+
+    async def achat_many(self, prompts: List[str], system: str = "", temperature: float = 0.2,
+                         response_format: Optional[Dict[str, Any]] = None) -> List[str]:
+        return list(await asyncio.gather(*(self.achat(p, system, temperature, response_format) for p in prompts)))
+
+    def chat_many(self, prompts: List[str], system: str = "", temperature: float = 0.2,
+                  response_format: Optional[Dict[str, Any]] = None) -> List[str]:
+        self.requests += len(prompts)
+        waves = math.ceil(len(prompts) / self.max_concurrency)
+        if self.latency and waves:
+            time.sleep(waves * self.latency)
+        return [self._reply(response_format)] * len(prompts)
+
+# --- Statistics --------------------------------------------------------------
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    """
+    q-th percentile (0-100) of an already sorted list, linear interpolation.
+    None for an empty list.
+    """
+    if not sorted_values:
+        return None
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo = math.floor(pos)
+    hi = math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(latencies_s: List[float], claims: int, wall_s: float) -> Dict[str, Any]:
+    """
+    Latency percentiles (ms), throughput and the process peak RSS so far.
+    `latencies_s` are per call (one claim, or one chunk for batched scenarios).
+    """
+    ms = sorted(x * 1000.0 for x in latencies_s)
+    # No calls / no measurable time: null in the JSON rather than NaN / Infinity
+    return {
+        "calls": len(ms),
+        "claims": claims,
+        "p50_ms": round(percentile(ms, 50), 3) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 3) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 3) if ms else None,
+        "mean_ms": round(sum(ms) / len(ms), 3) if ms else None,
+        "claims_per_s": round(claims / wall_s, 2) if wall_s > 0 else None,
+        "process_peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def timed_calls(calls: List[Callable[[], Any]]) -> List[float]:
+    out = []
+    for call in calls:
+        t0 = time.perf_counter()
+        call()
+        out.append(time.perf_counter() - t0)
+    return out
+
+# --- Scenarios ---------------------------------------------------------------
+
+def bench_agents(orc: Orchestrator, texts: List[str], chunk_size: int) -> Dict[str, Any]:
+    """
+    Per-agent numbers. Agents run in pipeline order, so each one sees the fields
+    its upstream agents produced, and only its own call is timed.
+      - "<Agent>.run":       one claim per call
+      - "<Agent>.run_batch": `chunk_size` claims per call
+    """
+    results: Dict[str, Any] = {}
+
+    states = [ClaimState.from_single_text(t) for t in texts]
+    per_agent: Dict[str, List[float]] = {a.name: [] for a in orc.agents}
+    for state in states:
+        for agent in orc.agents:
+            t0 = time.perf_counter()
+            agent.run(state)
+            per_agent[agent.name].append(time.perf_counter() - t0)
+    for agent in orc.agents:
+        lat = per_agent[agent.name]
+        results[f"{agent.name}.run"] = summarize(lat, len(lat), sum(lat))
+
+    states = [ClaimState.from_single_text(t) for t in texts]
+    chunks = [states[i:i + chunk_size] for i in range(0, len(states), chunk_size)]
+    per_agent = {a.name: [] for a in orc.agents}
+    for chunk in chunks:
+        for agent in orc.agents:
+            t0 = time.perf_counter()
+            agent.run_batch(chunk)
+            per_agent[agent.name].append(time.perf_counter() - t0)
+    for agent in orc.agents:
+        lat = per_agent[agent.name]
+        results[f"{agent.name}.run_batch"] = summarize(lat, len(states), sum(lat))
+
+    return results
+
+
+def bench_pipeline(orc: Orchestrator, texts: List[str], chunk_size: int) -> Dict[str, Any]:
+    """
+    End-to-end numbers: Orchestrator.run per claim (latency per claim) and
+    Orchestrator.run_many (latency per chunk of `chunk_size` claims).
+    """
+    results: Dict[str, Any] = {}
+
+    t0 = time.perf_counter()
+    lat = timed_calls([lambda t=t: orc.run(t) for t in texts])
+    results["Orchestrator.run"] = summarize(lat, len(texts), time.perf_counter() - t0)
+
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    t0 = time.perf_counter()
+    lat = timed_calls([lambda c=c: orc.run_many(c, chunk_size=chunk_size) for c in chunks])
+    results["Orchestrator.run_many"] = summarize(lat, len(texts), time.perf_counter() - t0)
+
+    return results
+
+# --- Comparison --------------------------------------------------------------
+
+COMPARE_METRICS = ("p50_ms", "p95_ms", "p99_ms", "claims_per_s")
+# Tail latencies are printed but too noisy on short runs to fail a build on
+GATED_METRICS = ("p50_ms", "claims_per_s")
+
+
+def compare(old: Dict[str, Any], new: Dict[str, Any]) -> float:
+    """
+    Print old vs new for every scenario present in both runs.
+    Returns the worst regression in percent (latency up / throughput down)
+    over GATED_METRICS.
+    """
+    worst = 0.0
+    print(f"\n{'scenario':<34}{'metric':<14}{'old':>12}{'new':>12}{'change':>10}")
+    for name, new_row in new["results"].items():
+        old_row = old.get("results", {}).get(name)
+        if old_row is None:
+            continue
+        for metric in COMPARE_METRICS:
+            a, b = old_row.get(metric), new_row.get(metric)
+            if not a or b is None:
+                continue
+            change = (b - a) / a * 100.0
+            regression = -change if metric == "claims_per_s" else change
+            if metric in GATED_METRICS:
+                worst = max(worst, regression)
+            flag = "  <-- slower" if regression > 5.0 else ""
+            print(f"{name:<34}{metric:<14}{a:>12.2f}{b:>12.2f}{change:>+9.1f}%{flag}")
+    return worst
+
+# --- Main entry point --------------------------------------------------------
+
+def git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BASE, capture_output=True, text=True, timeout=10,
+        )
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def run(
+    claims: int = 200,
+    llm_latency_ms: float = 50.0,
+    llm_concurrency: int = 8,
+    chunk_size: int = 32,
+    warmup_claims: int = 10,
+    seed: int = DEFAULT_SEED,
+    fast_path: bool = False,
+    parallel: bool = True,
+    combined_llm: bool = False,
+) -> Dict[str, Any]:
+    """
+    Run every scenario once and return the full results document.
+    """
+    rng = random.Random(seed)
+    texts = [generate_single_claim(i, rng)["text"] for i in range(1, claims + 1)]
+
+    warmup(verbose=False)
+    llm = StubLLMClient(latency_ms=llm_latency_ms, max_concurrency=llm_concurrency)
+    with Orchestrator(llm=llm, parallel=parallel, fast_path=fast_path, combined_llm=combined_llm) as orc:
+        # Untimed warmup: first-call costs (regex compilation, NER kernels, thread pool)
+        for t in texts[:warmup_claims]:
+            orc.run(t)
+        orc.run_many(texts[:warmup_claims], chunk_size=chunk_size)
+
+        results: Dict[str, Any] = {}
+        results.update(bench_agents(orc, texts, chunk_size))
+        results.update(bench_pipeline(orc, texts, chunk_size))
+
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "json_backend": JSON_BACKEND,
+            "ner_loaded": any(
+                ner_loaded(a.ner_model) for a in orc.agents if isinstance(a, ExtractionAgent)
+            ),
+        },
+        "params": {
+            "claims": claims,
+            "llm_latency_ms": llm_latency_ms,
+            "llm_concurrency": llm_concurrency,
+            "chunk_size": chunk_size,
+            "warmup_claims": warmup_claims,
+            "seed": seed,
+            "fast_path": fast_path,
+            "parallel": parallel,
+            "combined_llm": combined_llm,
+        },
+        "results": results,
+    }
+
+
+def _cell(value: Optional[float], width: int, digits: int) -> str:
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+
+
+def print_results(doc: Dict[str, Any]) -> None:
+    print(f"\n{'scenario':<34}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'claims/s':>12}{'proc peak MB':>14}")
+    for name, row in doc["results"].items():
+        print(
+            f"{name:<34}{_cell(row['p50_ms'], 10, 2)}{_cell(row['p95_ms'], 10, 2)}{_cell(row['p99_ms'], 10, 2)}"
+            f"{_cell(row['claims_per_s'], 12, 1)}{_cell(row.get('process_peak_rss_mb'), 14, 1)}"
+        )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the ClaimCopilot pipeline.")
+    parser.add_argument("--claims", type=int, default=200)
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="stub LLM latency per request")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="stub LLM requests in flight for chat_many")
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--warmup-claims", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--fast-path", action="store_true")
+    parser.add_argument("--sequential", action="store_true", help="Orchestrator(parallel=False)")
+    parser.add_argument("--combined-llm", action="store_true", help="Orchestrator(combined_llm=True)")
+    parser.add_argument("--output", type=Path, default=None,
+                        help="results JSON (default: outputs/benchmarks/bench-<time>.json)")
+    parser.add_argument("--compare", type=Path, default=None, help="earlier results JSON to compare with")
+    parser.add_argument("--fail-above", type=float, default=None,
+                        help="with --compare: exit 1 if p50 latency or throughput (GATED_METRICS) regresses "
+                             "by more than this percent in any scenario; p95 / p99 are only printed")
+    args = parser.parse_args(argv)
+
+    doc = run(
+        claims=args.claims,
+        llm_latency_ms=args.llm_latency_ms,
+        llm_concurrency=args.llm_concurrency,
+        chunk_size=args.chunk_size,
+        warmup_claims=args.warmup_claims,
+        seed=args.seed,
+        fast_path=args.fast_path,
+        parallel=not args.sequential,
+        combined_llm=args.combined_llm,
+    )
+    print_results(doc)
+
+    out = args.output or DEFAULT_OUT_DIR / f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=2, allow_nan=False), encoding="utf-8")
+    print(f"\nSaved results to: {out.resolve()}")
+
+    if args.compare is not None:
+        old = json.loads(args.compare.read_text(encoding="utf-8"))
+        if old.get("params") != doc["params"]:
+            print("Note: parameters differ from the compared run; numbers may not be comparable.")
+        worst = compare(old, doc)
+        if args.fail_above is not None and worst > args.fail_above:
+            print(f"\nRegression of {worst:.1f}% exceeds --fail-above {args.fail_above}%")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
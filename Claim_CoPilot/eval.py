@@ -1 +1,571 @@
-{"nbformat":4,"nbformat_minor":0,"metadata":{"colab":{"provenance":[],"authorship_tag":"ABX9TyOEdp0yTtbf3i5qobmdOTef"},"kernelspec":{"name":"python3","display_name":"Python 3"},"language_info":{"name":"python"}},"cells":[{"cell_type":"code","execution_count":1,"metadata":{"colab":{"base_uri":"https://localhost:8080/","height":211},"id":"1KtAqKXaCjn-","executionInfo":{"status":"error","timestamp":1764628272488,"user_tz":300,"elapsed":9,"user":{"displayName":"Anurag Inampudi","userId":"06250032972660996083"}},"outputId":"45694619-eb06-444c-e713-1dd40bad9cdd"},"outputs":[{"output_type":"error","ename":"NameError","evalue":"name '__file__' is not defined","traceback":["\u001b[0;31m---------------------------------------------------------------------------\u001b[0m","\u001b[0;31mNameError\u001b[0m                                 Traceback (most recent call last)","\u001b[0;32m/tmp/ipython-input-1571815768.py\u001b[0m in \u001b[0;36m<cell line: 0>\u001b[0;34m()\u001b[0m\n\u001b[1;32m      8\u001b[0m \u001b[0;34m\u001b[0m\u001b[0m\n\u001b[1;32m      9\u001b[0m \u001b[0;31m# --- Locate project root and src folder --------------------------------------\u001b[0m\u001b[0;34m\u001b[0m\u001b[0;34m\u001b[0m\u001b[0m\n\u001b[0;32m---> 10\u001b[0;31m \u001b[0mBASE\u001b[0m \u001b[0;34m=\u001b[0m \u001b[0mPath\u001b[0m\u001b[0;34m(\u001b[0m\u001b[0m__file__\u001b[0m\u001b[0;34m)\u001b[0m\u001b[0;34m.\u001b[0m\u001b[0mresolve\u001b[0m\u001b[0;34m(\u001b[0m\u001b[0;34m)\u001b[0m\u001b[0;34m.\u001b[0m\u001b[0mparent\u001b[0m\u001b[0;34m\u001b[0m\u001b[0;34m\u001b[0m\u001b[0m\n\u001b[0m\u001b[1;32m     11\u001b[0m \u001b[0mSRC\u001b[0m \u001b[0;34m=\u001b[0m \u001b[0mBASE\u001b[0m \u001b[0;34m/\u001b[0m \u001b[0;34m\"src\"\u001b[0m\u001b[0;34m\u001b[0m\u001b[0;34m\u001b[0m\u001b[0m\n\u001b[1;32m     12\u001b[0m \u001b[0;34m\u001b[0m\u001b[0m\n","\u001b[0;31mNameError\u001b[0m: name '__file__' is not defined"]}],"source":["# eval.py - Evaluation script for ClaimCopilot\n","import json\n","import random\n","import re\n","import sys\n","from pathlib import Path\n","from typing import Dict, Any, List\n","\n","# --- Locate project root and src folder --------------------------------------\n","BASE = Path(__file__).resolve().parent\n","SRC = BASE / \"src\"\n","\n","if str(SRC) not in sys.path:\n","    sys.path.append(str(SRC))\n","\n","from orchestrator import Orchestrator  # type: ignore\n","\n","DATA_DIR = BASE / \"data\"\n","OUT_DIR = BASE / \"outputs\"\n","\n","DATA_DIR.mkdir(parents=True, exist_ok=True)\n","OUT_DIR.mkdir(parents=True, exist_ok=True)\n","\n","CLAIMS_PATH = DATA_DIR / \"claims.jsonl\"\n","\n","FIELDS = [\"claimant_name\", \"policy_type\", \"claim_amount\", \"incident_date\", \"priority\"]\n","POLICY_TYPES = [\"Health\", \"Auto\", \"Property\"]\n","\n","\n","# --------------------------------------------------------------------\n","# Data loading\n","# --------------------------------------------------------------------\n","def load_claims(path: Path) -> List[Dict[str, Any]]:\n","    claims = []\n","    with path.open(\"r\", encoding=\"utf-8\") as f:\n","        for line in f:\n","            line = line.strip()\n","            if not line:\n","                continue\n","            claims.append(json.loads(line))\n","    return claims\n","\n","\n","# --------------------------------------------------------------------\n","# Agentic pipeline wrapper\n","# --------------------------------------------------------------------\n","def run_agentic(text: str) -> Dict[str, Any]:\n","    orc = Orchestrator()\n","    state = orc.run(text)\n","    return {\n","        \"claimant_name\": state.extracted_fields.get(\"claimant_name\"),\n","        \"policy_type\": state.extracted_fields.get(\"policy_type\"),\n","        \"claim_amount\": state.extracted_fields.get(\"claim_amount\"),\n","        \"incident_date\": state.extracted_fields.get(\"incident_date\"),\n","        \"priority\": state.triage.get(\"priority\"),\n","        \"summary\": state.summary,\n","    }\n","\n","\n","# --------------------------------------------------------------------\n","# Baseline (regex + heuristics)\n","# --------------------------------------------------------------------\n","def baseline_extract_and_triage(text: str) -> Dict[str, Any]:\n","    # Amount\n","    amount = None\n","    m = re.search(r\"\\$([0-9]+(?:\\.[0-9]{2})?)\", text)\n","    if m:\n","        try:\n","            amount = float(m.group(1))\n","        except Exception:\n","            amount = None\n","\n","    # Date: YYYY-MM-DD\n","    incident_date = None\n","    m = re.search(r\"\\b(20[0-9]{2}-[01][0-9]-[0-3][0-9])\\b\", text)\n","    if m:\n","        incident_date = m.group(1)\n","\n","    # Policy type keyword\n","    policy_type = None\n","    for p in POLICY_TYPES:\n","        if p.lower() in text.lower():\n","            policy_type = p\n","            break\n","\n","    # Very simple “Firstname Lastname submitted/filed”\n","    claimant_name = None\n","    m = re.search(r\"([A-Z][a-z]+ [A-Z][a-z]+)\\s+(submitted|filed|presents)\", text)\n","    if m:\n","        claimant_name = m.group(1)\n","\n","    # Priority heuristic\n","    t_lower = text.lower()\n","    if \"fracture\" in t_lower or \"surgery\" in t_lower or \"hospital\" in t_lower:\n","        priority = \"High\"\n","    elif amount is not None and amount >= 3000:\n","        priority = \"Medium\"\n","    else:\n","        priority = \"Low\"\n","\n","    return {\n","        \"claimant_name\": claimant_name,\n","        \"policy_type\": policy_type,\n","        \"claim_amount\": amount,\n","        \"incident_date\": incident_date,\n","        \"priority\": priority,\n","    }\n","\n","\n","# --------------------------------------------------------------------\n","# Metrics helpers\n","# --------------------------------------------------------------------\n","def update_prf_counts(gold, pred, bucket: Dict[str, int]) -> None:\n","    if gold is None and pred is None:\n","        return\n","    if pred == gold:\n","        bucket[\"tp\"] += 1\n","    else:\n","        if pred is not None:\n","            bucket[\"fp\"] += 1\n","        if gold is not None:\n","            bucket[\"fn\"] += 1\n","\n","\n","def prf(tp: int, fp: int, fn: int):\n","    prec = 0.0 if (tp + fp) == 0 else tp / (tp + fp)\n","    rec = 0.0 if (tp + fn) == 0 else tp / (tp + fn)\n","    if prec + rec == 0:\n","        f1 = 0.0\n","    else:\n","        f1 = 2 * prec * rec / (prec + rec)\n","    return prec, rec, f1\n","\n","\n","# --------------------------------------------------------------------\n","# Main evaluation\n","# --------------------------------------------------------------------\n","def main(eval_n: int = 300, seed: int = 123):\n","    print(f\"Loading claims from: {CLAIMS_PATH}\")\n","    claims = load_claims(CLAIMS_PATH)\n","    print(f\"Total claims available: {len(claims)}\")\n","\n","    random.seed(seed)\n","    sampled_claims = random.sample(claims, min(eval_n, len(claims)))\n","    print(f\"Evaluating on a sampled subset of {len(sampled_claims)} claims.\\n\")\n","\n","    metrics = {\n","        \"agentic\": {f: {\"tp\": 0, \"fp\": 0, \"fn\": 0} for f in FIELDS},\n","        \"baseline\": {f: {\"tp\": 0, \"fp\": 0, \"fn\": 0} for f in FIELDS},\n","    }\n","\n","    case_studies = []\n","\n","    for rec in sampled_claims:\n","        text = rec[\"text\"]\n","        gold = rec\n","\n","        agentic = run_agentic(text)\n","        baseline = baseline_extract_and_triage(text)\n","\n","        case_studies.append(\n","            {\n","                \"id\": rec[\"id\"],\n","                \"text\": text,\n","                \"gold\": {f: gold[f] for f in FIELDS},\n","                \"agentic_pred\": {f: agentic[f] for f in FIELDS},\n","                \"baseline_pred\": {f: baseline[f] for f in FIELDS},\n","            }\n","        )\n","\n","        for field in FIELDS:\n","            g_val = gold[field]\n","            update_prf_counts(g_val, agentic[field], metrics[\"agentic\"][field])\n","            update_prf_counts(g_val, baseline[field], metrics[\"baseline\"][field])\n","\n","    # Summarize metrics\n","    summary_table = {}\n","    print(\"=== Extraction + Triage: Precision / Recall / F1 ===\")\n","    for field in FIELDS:\n","        ag_m = metrics[\"agentic\"][field]\n","        bl_m = metrics[\"baseline\"][field]\n","\n","        ag_p, ag_r, ag_f1 = prf(ag_m[\"tp\"], ag_m[\"fp\"], ag_m[\"fn\"])\n","        bl_p, bl_r, bl_f1 = prf(bl_m[\"tp\"], bl_m[\"fp\"], bl_m[\"fn\"])\n","\n","        summary_table[field] = {\n","            \"agentic_precision\": ag_p,\n","            \"agentic_recall\": ag_r,\n","            \"agentic_f1\": ag_f1,\n","            \"baseline_precision\": bl_p,\n","            \"baseline_recall\": bl_r,\n","            \"baseline_f1\": bl_f1,\n","            \"agentic_counts\": ag_m,\n","            \"baseline_counts\": bl_m,\n","        }\n","\n","        print(\n","            f\"{field:15s} | Agentic P/R/F1: {ag_p:.2f}/{ag_r:.2f}/{ag_f1:.2f} \"\n","            f\"| Baseline P/R/F1: {bl_p:.2f}/{bl_r:.2f}/{bl_f1:.2f}\"\n","        )\n","\n","    # Save results\n","    eval_out_path = OUT_DIR / \"eval_results.json\"\n","    with eval_out_path.open(\"w\", encoding=\"utf-8\") as f:\n","        json.dump({\"summary\": summary_table, \"metrics_raw\": metrics}, f, indent=2)\n","\n","    cases_out_path = OUT_DIR / \"case_studies.jsonl\"\n","    with cases_out_path.open(\"w\", encoding=\"utf-8\") as f:\n","        for cs in case_studies:\n","            f.write(json.dumps(cs) + \"\\n\")\n","\n","    print(\"\\nSaved eval results to:\", eval_out_path.resolve())\n","    print(\"Saved case studies to :\", cases_out_path.resolve())\n","\n","\n","if __name__ == \"__main__\":\n","    main()\n"]}]}
\ No newline at end of file
+"""
+ClaimCopilot - Evaluation
+
+Runs the agentic pipeline and a regex baseline over the labelled claims in
+data/claims.jsonl and reports per-field precision / recall / F1, confusion
+matrices for the categorical fields and bootstrap confidence intervals.
+
+Usage:
+    python eval.py                          # 300 sampled claims (seed 123)
+    python eval.py --n 0 --workers 4        # every claim, predictions on 4 processes
+    python eval.py --n 0 --bootstrap 2000   # reuses cached predictions, only recomputes metrics
+    python eval.py --n 0 --incremental      # re-runs only the agents whose code / settings changed
+
+Notes:
+  - Predictions come from the batched pipeline (batch_run.iter_results) and are
+    cached in outputs/eval_predictions.jsonl, keyed by claim id, a hash of the
+    claim text and the pipeline version (options + agent fingerprints); a re-run
+    only predicts new or changed claims (--refresh ignores the cache).
+  - --incremental caches every agent's output instead (outputs/stage_cache.sqlite,
+    see src/stage_cache.py), keyed by the agent's fingerprint (code, settings,
+    model) and its inputs. After e.g. a triage rule change only TriageAgent and
+    the stages reading its output run again; NER / LLM outputs are reused.
+  - Gold and predictions are stored as one integer-coded NumPy column per field,
+    so all counts, confusion matrices and bootstrap resamples are array
+    operations. Scoring matches update_prf_counts(): a pair where both values
+    are missing is skipped, a match is a tp, otherwise a predicted value is a
+    fp and a gold value is a fn.
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# --- Locate project root and src folder --------------------------------------
+
+BASE = Path(__file__).resolve().parent
+SRC = BASE / "src"
+
+if str(SRC) not in sys.path:
+    sys.path.append(str(SRC))
+
+from batch_run import iter_chunks, iter_results, result_record  # type: ignore
+from jsonl_io import JsonlWriter, iter_jsonl  # type: ignore
+from llm_client import LLMClient  # type: ignore
+from orchestrator import Orchestrator, default_agent_classes  # type: ignore
+from stage_cache import StageCache, agent_class_fingerprint, run_incremental  # type: ignore
+
+DATA_DIR = BASE / "data"
+OUT_DIR = BASE / "outputs"
+
+CLAIMS_PATH = DATA_DIR / "claims.jsonl"
+PREDICTIONS_PATH = OUT_DIR / "eval_predictions.jsonl"
+STAGE_CACHE_PATH = OUT_DIR / "stage_cache.sqlite"
+
+FIELDS = ["claimant_name", "policy_type", "claim_amount", "incident_date", "priority"]
+# Fields with a small label set get a confusion matrix
+CATEGORICAL_FIELDS = ["policy_type", "priority"]
+POLICY_TYPES = ["Health", "Auto", "Property"]
+SYSTEMS = ["agentic", "baseline"]
+
+# --- Data loading ------------------------------------------------------------
+
+def load_claims(path: Path) -> List[Dict[str, Any]]:
+    return list(iter_jsonl(path))
+
+
+def sample_claims(claims: List[Dict[str, Any]], eval_n: int, seed: int) -> List[Dict[str, Any]]:
+    """
+    Same subset as the original notebook evaluation for a given (eval_n, seed);
+    eval_n <= 0 means every claim, in file order.
+    """
+    if eval_n <= 0 or eval_n >= len(claims):
+        return list(claims)
+    random.seed(seed)
+    return random.sample(claims, eval_n)
+
+# --- Agentic predictions (batched, cached) -----------------------------------
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def prediction_from_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    fields = result.get("extracted_fields") or {}
+    triage = result.get("triage") or {}
+    return {
+        "claimant_name": fields.get("claimant_name"),
+        "policy_type": fields.get("policy_type"),
+        "claim_amount": fields.get("claim_amount"),
+        "incident_date": fields.get("incident_date"),
+        "priority": triage.get("priority"),
+        "summary": result.get("summary"),
+    }
+
+
+def pipeline_version(fast_path: bool = False, combined_llm: bool = False) -> Dict[str, Any]:
+    """
+    Pipeline options plus the fingerprint of every agent class, so cached
+    predictions are dropped as soon as any agent changes, and whether the
+    LLM and the NER model are usable: predictions made in fallback mode (no
+    API key, regex-only extraction) are not reused once they are.
+
+    Nothing heavy is built here (no Orchestrator, no NER load): the
+    predictions themselves may run in --workers processes. NER counts as
+    usable when transformers is installed.
+    """
+    llm = LLMClient()
+    return {
+        "fast_path": fast_path,
+        "combined_llm": combined_llm,
+        "agents": {cls.name: agent_class_fingerprint(cls, llm.model) for cls in default_agent_classes(combined_llm)},
+        "llm_enabled": llm.enabled,
+        "ner_available": importlib.util.find_spec("transformers") is not None,
+    }
+
+
+def rewrite_prediction_cache(path: Path, records: Iterable[Dict[str, Any]]) -> None:
+    # Write-then-rename so a crash never leaves a half-written cache
+    tmp = path.with_name(path.name + ".tmp")
+    with JsonlWriter(tmp) as writer:
+        for rec in records:
+            writer.write(rec)
+    os.replace(tmp, path)
+
+
+def predict_agentic(
+    claims: Sequence[Dict[str, Any]],
+    workers: int = 1,
+    chunk_size: int = 64,
+    fast_path: bool = False,
+    combined_llm: bool = False,
+    cache_path: Optional[Path] = PREDICTIONS_PATH,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Pipeline predictions for every claim, in order. Claims already in the
+    prediction cache (same id, text and pipeline version) are not run again; new
+    predictions are appended to the cache, which only keeps the current
+    pipeline version's entries.
+    """
+    config = pipeline_version(fast_path, combined_llm)
+    keys = [(str(c.get("id")), text_hash(c.get("text", ""))) for c in claims]
+
+    cached: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    if cache_path is not None and cache_path.exists() and not refresh:
+        n_records = 0
+        for rec in iter_jsonl(cache_path):
+            n_records += 1
+            if rec.get("config") == config:
+                cached[(rec["id"], rec["text_hash"])] = rec["pred"]
+        if n_records > len(cached):
+            # Drop predictions of older pipeline versions (and superseded
+            # duplicates) so the file doesn't grow with every change
+            rewrite_prediction_cache(cache_path, (
+                {"id": key[0], "text_hash": key[1], "config": config, "pred": pred}
+                for key, pred in cached.items()
+            ))
+
+    todo = [i for i, key in enumerate(keys) if key not in cached]
+    print(f"Agentic predictions: {len(claims) - len(todo)} cached, {len(todo)} to run.")
+    if todo:
+        writer = JsonlWriter(cache_path, mode="w" if refresh else "a") if cache_path is not None else None
+        start = time.perf_counter()
+        done = 0
+        records = [{"id": i, "text": claims[i].get("text", "")} for i in todo]
+        for _, results in iter_results(iter_chunks(records, chunk_size), workers, fast_path, combined_llm):
+            for res in results:
+                i = res["id"]
+                pred = prediction_from_result(res)
+                cached[keys[i]] = pred
+                if writer is not None:
+                    writer.write({"id": keys[i][0], "text_hash": keys[i][1], "config": config, "pred": pred})
+            done += len(results)
+            print(f"  predicted {done}/{len(todo)} claims ({done / (time.perf_counter() - start):.1f} claims/s)")
+        if writer is not None:
+            writer.close()
+
+    return [cached[key] for key in keys]
+
+
+def predict_incremental(
+    claims: Sequence[Dict[str, Any]],
+    chunk_size: int = 256,
+    fast_path: bool = False,
+    combined_llm: bool = False,
+    cache_path: Path = STAGE_CACHE_PATH,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Pipeline predictions through the per-agent stage cache (in this process):
+    only stages whose fingerprint or inputs changed are run.
+    """
+    orc = Orchestrator(fast_path=fast_path, combined_llm=combined_llm)
+    cache = StageCache(cache_path)
+    if refresh:
+        cache.clear()
+    try:
+        states = run_incremental(orc, (c.get("text", "") for c in claims), cache, chunk_size=chunk_size)
+        preds = [prediction_from_result(result_record({}, s)) for s in states]
+    finally:
+        cache.close()
+        orc.close()
+    for agent, c in cache.stats().items():
+        print(f"  {agent:20s} reused {c['hits']}, ran {c['misses']}")
+    return preds
+
+# --- Baseline (regex + heuristics) --------------------------------------------
+
+AMOUNT_RE = re.compile(r"\$([0-9]+(?:\.[0-9]{2})?)")
+DATE_RE = re.compile(r"\b(20[0-9]{2}-[01][0-9]-[0-3][0-9])\b")
+NAME_RE = re.compile(r"([A-Z][a-z]+ [A-Z][a-z]+)\s+(submitted|filed|presents)")
+
+
+def baseline_extract_and_triage(text: str) -> Dict[str, Any]:
+    # Amount
+    amount = None
+    m = AMOUNT_RE.search(text)
+    if m:
+        try:
+            amount = float(m.group(1))
+        except Exception:
+            amount = None
+
+    # Date: YYYY-MM-DD
+    incident_date = None
+    m = DATE_RE.search(text)
+    if m:
+        incident_date = m.group(1)
+
+    # Policy type keyword
+    t_lower = text.lower()
+    policy_type = None
+    for p in POLICY_TYPES:
+        if p.lower() in t_lower:
+            policy_type = p
+            break
+
+    # Very simple "Firstname Lastname submitted/filed"
+    claimant_name = None
+    m = NAME_RE.search(text)
+    if m:
+        claimant_name = m.group(1)
+
+    # Priority heuristic
+    if "fracture" in t_lower or "surgery" in t_lower or "hospital" in t_lower:
+        priority = "High"
+    elif amount is not None and amount >= 3000:
+        priority = "Medium"
+    else:
+        priority = "Low"
+
+    return {
+        "claimant_name": claimant_name,
+        "policy_type": policy_type,
+        "claim_amount": amount,
+        "incident_date": incident_date,
+        "priority": priority,
+    }
+
+# --- Metrics helpers (reference, one pair at a time) ---------------------------
+
+def update_prf_counts(gold, pred, bucket: Dict[str, int]) -> None:
+    if gold is None and pred is None:
+        return
+    if pred == gold:
+        bucket["tp"] += 1
+    else:
+        if pred is not None:
+            bucket["fp"] += 1
+        if gold is not None:
+            bucket["fn"] += 1
+
+
+def prf(tp: int, fp: int, fn: int):
+    prec = 0.0 if (tp + fp) == 0 else tp / (tp + fp)
+    rec = 0.0 if (tp + fn) == 0 else tp / (tp + fn)
+    if prec + rec == 0:
+        f1 = 0.0
+    else:
+        f1 = 2 * prec * rec / (prec + rec)
+    return prec, rec, f1
+
+# --- Columnar metrics ----------------------------------------------------------
+
+class FieldColumns:
+    """
+    Gold and predicted values of one field for N claims as integer codes
+    (-1 = missing). Equal values share a code, so comparing two columns is
+    an array comparison; `labels[code]` gives the value back.
+    """
+
+    def __init__(self, gold: Sequence[Any], preds: Dict[str, Sequence[Any]]):
+        self._codes: Dict[Any, int] = {}
+        self.labels: List[Any] = []
+        self.gold = self._encode(gold)
+        self.preds = {system: self._encode(values) for system, values in preds.items()}
+
+    def _encode(self, values: Sequence[Any]) -> np.ndarray:
+        out = np.empty(len(values), dtype=np.int64)
+        codes = self._codes
+        for i, v in enumerate(values):
+            if v is None:
+                out[i] = -1
+                continue
+            code = codes.get(v)
+            if code is None:
+                code = codes[v] = len(self.labels)
+                self.labels.append(v)
+            out[i] = code
+        return out
+
+    def outcomes(self, system: str) -> np.ndarray:
+        """
+        (3, N) 0/1 matrix: tp, fp, fn of every claim (update_prf_counts semantics).
+        """
+        gold, pred = self.gold, self.preds[system]
+        match = gold == pred
+        has_gold, has_pred = gold >= 0, pred >= 0
+        tp = match & has_gold
+        fp = ~match & has_pred
+        fn = ~match & has_gold
+        return np.stack([tp, fp, fn]).astype(np.int8)
+
+    def confusion(self, system: str) -> Dict[str, Any]:
+        """
+        Confusion matrix (rows = gold, columns = predicted), with a None
+        label for missing values.
+        """
+        k = len(self.labels) + 1
+        idx = (self.gold + 1) * k + (self.preds[system] + 1)
+        matrix = np.bincount(idx, minlength=k * k).reshape(k, k)
+        return {"labels": [None] + list(self.labels), "matrix": matrix.tolist()}
+
+
+def prf_arrays(tp: np.ndarray, fp: np.ndarray, fn: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    prf() over whole arrays of counts.
+    """
+    tp, fp, fn = (np.asarray(a, dtype=np.float64) for a in (tp, fp, fn))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        prec = np.where(tp + fp > 0, tp / (tp + fp), 0.0)
+        rec = np.where(tp + fn > 0, tp / (tp + fn), 0.0)
+        f1 = np.where(prec + rec > 0, 2 * prec * rec / (prec + rec), 0.0)
+    return prec, rec, f1
+
+
+def bootstrap_counts(outcomes: np.ndarray, n_boot: int, seed: int, chunk: int = 100) -> np.ndarray:
+    """
+    tp / fp / fn totals of `n_boot` bootstrap resamples of the claims.
+    `outcomes` is (K, N) per-claim 0/1 rows; returns (K, n_boot). Every row
+    uses the same resamples (paired bootstrap), so systems compare fairly.
+    """
+    k, n = outcomes.shape
+    rng = np.random.default_rng(seed)
+    rows = outcomes.astype(np.float32)
+    totals = np.empty((k, n_boot), dtype=np.float64)
+    for start in range(0, n_boot, chunk):
+        b = min(chunk, n_boot - start)
+        # How often each claim was drawn in each resample: (b, N)
+        draws = rng.integers(0, n, size=(b, n)) + (np.arange(b) * n)[:, None]
+        weights = np.bincount(draws.ravel(), minlength=b * n).reshape(b, n).astype(np.float32)
+        totals[:, start:start + b] = rows @ weights.T
+    return totals
+
+
+def evaluate(
+    gold: Sequence[Dict[str, Any]],
+    preds: Dict[str, Sequence[Dict[str, Any]]],
+    n_boot: int = 1000,
+    ci: float = 0.95,
+    seed: int = 123,
+) -> Dict[str, Any]:
+    """
+    All metrics in one pass over the columns. Returns the eval_results.json
+    content: "summary" and "metrics_raw" (same layout as before), plus
+    "confusion" and "bootstrap_ci".
+    """
+    columns = {
+        field: FieldColumns(
+            [g.get(field) for g in gold],
+            {system: [p.get(field) for p in values] for system, values in preds.items()},
+        )
+        for field in FIELDS
+    }
+
+    # One (3, N) block per (system, field), stacked: row 3*j + {0,1,2} = tp/fp/fn of pair j
+    pairs = [(system, field) for system in preds for field in FIELDS]
+    outcomes = np.concatenate([columns[field].outcomes(system) for system, field in pairs])
+    counts = outcomes.sum(axis=1, dtype=np.int64).reshape(-1, 3)
+    prec, rec, f1 = prf_arrays(counts[:, 0], counts[:, 1], counts[:, 2])
+
+    metrics_raw: Dict[str, Dict[str, Dict[str, int]]] = {system: {} for system in preds}
+    scores: Dict[Tuple[str, str], Tuple[float, float, float]] = {}
+    for j, (system, field) in enumerate(pairs):
+        tp, fp, fn = (int(c) for c in counts[j])
+        metrics_raw[system][field] = {"tp": tp, "fp": fp, "fn": fn}
+        scores[(system, field)] = (float(prec[j]), float(rec[j]), float(f1[j]))
+
+    summary_table: Dict[str, Dict[str, Any]] = {}
+    for field in FIELDS:
+        row: Dict[str, Any] = {}
+        for system in preds:
+            p, r, f = scores[(system, field)]
+            row.update({f"{system}_precision": p, f"{system}_recall": r, f"{system}_f1": f})
+        for system in preds:
+            row[f"{system}_counts"] = metrics_raw[system][field]
+        summary_table[field] = row
+
+    confusion = {
+        system: {field: columns[field].confusion(system) for field in CATEGORICAL_FIELDS}
+        for system in preds
+    }
+
+    intervals: Dict[str, Dict[str, Any]] = {field: {} for field in FIELDS}
+    if n_boot > 0 and len(gold) > 0:
+        boot = bootstrap_counts(outcomes, n_boot, seed).reshape(len(pairs), 3, n_boot)
+        b_prec, b_rec, b_f1 = prf_arrays(boot[:, 0], boot[:, 1], boot[:, 2])
+        q = [(1 - ci) / 2 * 100, (1 + ci) / 2 * 100]
+        bounds = {name: np.percentile(arr, q, axis=1) for name, arr in
+                  (("precision", b_prec), ("recall", b_rec), ("f1", b_f1))}
+        for j, (system, field) in enumerate(pairs):
+            for name, b in bounds.items():
+                intervals[field][f"{system}_{name}"] = [float(b[0, j]), float(b[1, j])]
+
+    return {
+        "summary": summary_table,
+        "metrics_raw": metrics_raw,
+        "confusion": confusion,
+        "bootstrap_ci": {"level": ci, "resamples": n_boot, "fields": intervals},
+    }
+
+# --- Main evaluation -----------------------------------------------------------
+
+def main(
+    eval_n: int = 300,
+    seed: int = 123,
+    claims_path: Path = CLAIMS_PATH,
+    workers: int = 1,
+    chunk_size: int = 64,
+    fast_path: bool = False,
+    combined_llm: bool = False,
+    n_boot: int = 1000,
+    refresh: bool = False,
+    write_cases: bool = True,
+    incremental: bool = False,
+):
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    print(f"Loading claims from: {claims_path}")
+    claims = load_claims(claims_path)
+    print(f"Total claims available: {len(claims)}")
+
+    sampled_claims = sample_claims(claims, eval_n, seed)
+    print(f"Evaluating on {len(sampled_claims)} claims.\n")
+
+    start = time.perf_counter()
+    if incremental:
+        print("Agentic predictions: incremental (per-agent stage cache).")
+        agentic = predict_incremental(
+            sampled_claims, chunk_size=max(chunk_size, 256),
+            fast_path=fast_path, combined_llm=combined_llm, refresh=refresh,
+        )
+    else:
+        agentic = predict_agentic(
+            sampled_claims, workers=workers, chunk_size=chunk_size,
+            fast_path=fast_path, combined_llm=combined_llm, refresh=refresh,
+        )
+    baseline = [baseline_extract_and_triage(rec["text"]) for rec in sampled_claims]
+    predict_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = evaluate(sampled_claims, {"agentic": agentic, "baseline": baseline}, n_boot=n_boot, seed=seed)
+    metrics_seconds = time.perf_counter() - start
+
+    ci = results["bootstrap_ci"]
+    print("=== Extraction + Triage: Precision / Recall / F1 ===")
+    for field in FIELDS:
+        row = results["summary"][field]
+        line = (
+            f"{field:15s} | Agentic P/R/F1: {row['agentic_precision']:.2f}/{row['agentic_recall']:.2f}/{row['agentic_f1']:.2f} "
+            f"| Baseline P/R/F1: {row['baseline_precision']:.2f}/{row['baseline_recall']:.2f}/{row['baseline_f1']:.2f}"
+        )
+        f1_ci = ci["fields"][field].get("agentic_f1")
+        if f1_ci is not None:
+            line += f" | Agentic F1 {ci['level']:.0%} CI: [{f1_ci[0]:.2f}, {f1_ci[1]:.2f}]"
+        print(line)
+
+    for field in CATEGORICAL_FIELDS:
+        cm = results["confusion"]["agentic"][field]
+        print(f"\nAgentic confusion matrix for {field} (rows = gold, columns = predicted):")
+        labels = [str(label) for label in cm["labels"]]
+        width = max(len(label) for label in labels) + 2
+        print(" " * width + "".join(f"{label:>{width}}" for label in labels))
+        for label, row in zip(labels, cm["matrix"]):
+            print(f"{label:<{width}}" + "".join(f"{v:>{width}}" for v in row))
+
+    print(f"\nPredictions: {predict_seconds:.2f}s, metrics: {metrics_seconds:.2f}s")
+
+    results["meta"] = {
+        "claims": len(sampled_claims),
+        "eval_n": eval_n,
+        "seed": seed,
+        "fast_path": fast_path,
+        "combined_llm": combined_llm,
+        "incremental": incremental,
+        "predict_seconds": round(predict_seconds, 3),
+        "metrics_seconds": round(metrics_seconds, 3),
+    }
+
+    # Save results
+    eval_out_path = OUT_DIR / "eval_results.json"
+    with eval_out_path.open("w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print("\nSaved eval results to:", eval_out_path.resolve())
+
+    if write_cases:
+        cases_out_path = OUT_DIR / "case_studies.jsonl"
+        with JsonlWriter(cases_out_path) as w:
+            for rec, ag, bl in zip(sampled_claims, agentic, baseline):
+                w.write({
+                    "id": rec["id"],
+                    "text": rec["text"],
+                    "gold": {f: rec.get(f) for f in FIELDS},
+                    "agentic_pred": {f: ag.get(f) for f in FIELDS},
+                    "baseline_pred": {f: bl.get(f) for f in FIELDS},
+                })
+        print("Saved case studies to :", cases_out_path.resolve())
+
+
+def parse_args(argv: Optional[Iterable[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Evaluate ClaimCopilot against the labelled claims")
+    parser.add_argument("--input", type=Path, default=CLAIMS_PATH, help="Labelled claims JSONL (.gz / .zst ok)")
+    parser.add_argument("--n", type=int, default=300, help="Claims to sample (0 = all)")
+    parser.add_argument("--seed", type=int, default=123, help="Sampling / bootstrap seed")
+    parser.add_argument("--workers", type=int, default=1, help="Processes for the pipeline predictions")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Claims per batched pipeline run")
+    parser.add_argument("--fast-path", action="store_true", help="Try rule-based name extraction before NER")
+    parser.add_argument("--combined-llm", action="store_true", help="One structured LLM call for QA note + summary")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Bootstrap resamples for the CIs (0 = off)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Cache per-agent outputs and re-run only changed stages (in this process)")
+    parser.add_argument("--refresh", action="store_true", help="Ignore and rewrite the prediction / stage cache")
+    parser.add_argument("--no-cases", action="store_true", help="Don't write outputs/case_studies.jsonl")
+    return parser.parse_args(list(argv) if argv is not None else None)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    main(
+        eval_n=args.n,
+        seed=args.seed,
+        claims_path=args.input,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        fast_path=args.fast_path,
+        combined_llm=args.combined_llm,
+        n_boot=args.bootstrap,
+        refresh=args.refresh,
+        write_cases=not args.no_cases,
+        incremental=args.incremental,
+    )
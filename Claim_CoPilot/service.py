@@ -0,0 +1,339 @@
+"""
+ClaimCopilot - HTTP service
+
+Long-running local HTTP API in front of one warmed-up Orchestrator, for
+putting the copilot behind an intake portal.
+
+Usage:
+    python service.py                                   # http://127.0.0.1:8080
+    python service.py --host 0.0.0.0 --port 8080 --max-batch-size 32 --max-wait-ms 20 --max-queue 256
+    python service.py ... --dedup outputs/intake_index.sqlite   # flag / reuse duplicate claims
+
+Endpoints:
+    POST /claims          {"text": "..."} or {"documents": ["...", ...]}, optional "id"
+                          -> {"id", "extracted_fields", "triage", "summary", "issues"}
+    POST /claims:batch    {"claims": [{...}, ...]} -> {"results": [...]} (input order)
+    GET  /healthz         -> {"ok": true, "queue": {...}}
+    GET  /metrics         Prometheus text format (src/metrics.py)
+
+Notes:
+  - Concurrent requests are grouped into micro-batches (src/microbatch.py): a
+    batch starts when --max-batch-size claims are waiting or --max-wait-ms
+    after its first claim arrived, and runs through Orchestrator.run_many, so
+    NER and the LLM stages work on whole batches. If a batch fails, its
+    claims are re-run one by one, so only the claim that broke it gets 500.
+  - At most --max-queue claims wait at a time. Beyond that requests get
+    503 with a Retry-After header instead of queueing, so latency stays
+    bounded under overload; a batch request is accepted whole or not at all.
+  - Standard library only (asyncio): HTTP/1.1 with keep-alive, request
+    bodies need a Content-Length.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+# --- Locate project root and src folder --------------------------------------
+
+BASE = Path(__file__).resolve().parent
+SRC = BASE / "src"
+
+if str(SRC) not in sys.path:
+    sys.path.append(str(SRC))
+
+from batch_run import result_record  # type: ignore
+from jsonl_io import dumps, loads  # type: ignore
+from metrics import METRICS, render_prometheus  # type: ignore
+from microbatch import MicroBatcher, QueueFullError  # type: ignore
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+
+# Larger request bodies are refused with 413
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+REQUESTS = METRICS.counter(
+    "claimcopilot_service_requests_total", "HTTP requests by endpoint and status", ("endpoint", "status"))
+REQUEST_SECONDS = METRICS.histogram(
+    "claimcopilot_service_request_seconds", "HTTP request latency (queueing + pipeline)", ("endpoint",))
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# --- Requests ----------------------------------------------------------------
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def claim_input(rec: Any) -> Any:
+    """
+    The text or list of documents of one claim record, or HttpError(400).
+    """
+    if not isinstance(rec, dict):
+        raise HttpError(400, "Each claim must be a JSON object")
+    documents = rec.get("documents")
+    if documents is not None:
+        if not isinstance(documents, list) or not documents or not all(isinstance(d, str) for d in documents):
+            raise HttpError(400, '"documents" must be a non-empty list of strings')
+        return documents
+    text = rec.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise HttpError(400, 'Claim needs "text" (string) or "documents" (list of strings)')
+    return text
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+    """
+    (method, path, headers, body) of the next request on the connection,
+    or None when the client closed it.
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    body = b""
+    if method in ("POST", "PUT"):
+        if "content-length" not in headers:
+            raise HttpError(411, "Content-Length required")
+        try:
+            length = int(headers["content-length"])
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length)
+    return method, urlsplit(target).path, headers, body
+
+
+def write_response(
+    writer: asyncio.StreamWriter,
+    status: int,
+    payload: Any,
+    headers: Optional[Dict[str, str]] = None,
+    keep_alive: bool = True,
+) -> None:
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, content_type = dumps(payload), "application/json"
+    lines = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines.extend(f"{k}: {v}" for k, v in (headers or {}).items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+
+# --- Service -----------------------------------------------------------------
+
+class ClaimService:
+    """
+    One warmed-up Orchestrator behind a MicroBatcher, served over HTTP.
+    """
+
+    def __init__(
+        self,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        max_batch_size: int = 32,
+        max_wait: float = 0.02,
+        max_queue: int = 256,
+        workers: int = 1,
+        fast_path: bool = False,
+        combined_llm: bool = False,
+        dedup: Optional[str] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.fast_path = fast_path
+        self.combined_llm = combined_llm
+        self.dedup = dedup
+        self.orchestrator: Any = None
+        self.batcher = MicroBatcher(
+            self.process_batch,
+            max_batch_size=max_batch_size,
+            max_wait=max_wait,
+            max_queue=max_queue,
+            workers=workers,
+        )
+
+    def load(self) -> None:
+        """
+        Build the Orchestrator and load the models (same setup as the claim daemon).
+        """
+        from model_registry import warmup  # type: ignore
+        from orchestrator import Orchestrator  # type: ignore
+
+        index = None
+        if self.dedup:
+            from dedup import IntakeIndex  # type: ignore
+            index = IntakeIndex(self.dedup, store_states=True)
+        self.orchestrator = Orchestrator(
+            fast_path=self.fast_path,
+            combined_llm=self.combined_llm,
+            dedup=index,
+            reuse_duplicates=index is not None,
+        )
+        warmup()
+        self.orchestrator.llm.warmup()
+
+    def process_batch(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Run one micro-batch of claim records (called in a batcher thread).
+        """
+        texts = [claim_input(r) for r in records]
+        ids = [None if r.get("id") is None else str(r["id"]) for r in records]
+        states = self.orchestrator.run_many(texts, chunk_size=len(records) or 1, claim_ids=ids)
+        return [result_record(r, s) for r, s in zip(records, states)]
+
+    # --- Endpoints -------------------------------------------------------------
+
+    async def _submit(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        try:
+            futures = self.batcher.submit_many(records)
+        except QueueFullError as e:
+            raise HttpError(503, str(e), {"Retry-After": str(int(e.retry_after + 0.999))})
+        return list(await asyncio.gather(*futures))
+
+    async def route(self, method: str, path: str, body: bytes) -> Tuple[int, Any]:
+        if path == "/healthz":
+            return 200, {"ok": True, "queue": self.batcher.stats()}
+        if path == "/metrics":
+            return 200, render_prometheus()
+        if path not in ("/claims", "/claims:batch"):
+            raise HttpError(404, f"No endpoint {path}")
+        if method != "POST":
+            raise HttpError(405, f"{path} only accepts POST")
+
+        try:
+            data = loads(body)
+        except ValueError:
+            raise HttpError(400, "Body is not valid JSON")
+        if path == "/claims":
+            claim_input(data)
+            return 200, (await self._submit([data]))[0]
+
+        claims = data.get("claims") if isinstance(data, dict) else None
+        if not isinstance(claims, list):
+            raise HttpError(400, 'Body needs "claims": [...]')
+        if len(claims) > self.batcher.max_queue:
+            raise HttpError(413, f"At most {self.batcher.max_queue} claims per batch request")
+        for rec in claims:
+            claim_input(rec)
+        return 200, {"results": await self._submit(claims)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": e.message}, e.headers, keep_alive=False)
+                    await writer.drain()
+                    return
+                if request is None:
+                    return
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                start = time.perf_counter()
+                extra: Dict[str, str] = {}
+                try:
+                    status, payload = await self.route(method, path, body)
+                except HttpError as e:
+                    status, payload, extra = e.status, {"error": e.message}, e.headers
+                except Exception as e:
+                    print("[ClaimService] Warning: request failed:", e)
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                endpoint = path if path in ("/claims", "/claims:batch", "/healthz", "/metrics") else "other"
+                REQUESTS.inc(endpoint=endpoint, status=str(status))
+                REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint)
+
+                write_response(writer, status, payload, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self) -> None:
+        if self.orchestrator is None:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        await self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        # The port actually bound (port=0 picks a free one)
+        self.port = server.sockets[0].getsockname()[1]
+        print(f"[ClaimService] Listening on http://{self.host}:{self.port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.orchestrator.close()
+            if self.orchestrator.dedup is not None:
+                self.orchestrator.dedup.close()
+            print("[ClaimService] Stopped.")
+
+# --- Entry point -------------------------------------------------------------
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve ClaimCopilot over HTTP.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-batch-size", type=int, default=32, help="claims per micro-batch")
+    parser.add_argument("--max-wait-ms", type=float, default=20.0,
+                        help="how long a batch waits for more claims after its first one")
+    parser.add_argument("--max-queue", type=int, default=256,
+                        help="waiting claims before requests get 503 + Retry-After")
+    parser.add_argument("--workers", type=int, default=1, help="micro-batches running at once")
+    parser.add_argument("--fast-path", action="store_true", help="skip NER when regex rules find the name")
+    parser.add_argument("--combined-llm", action="store_true", help="one structured LLM call for QA note + summary")
+    parser.add_argument("--dedup", metavar="PATH", help="intake index (SQLite) to flag and reuse duplicate claims")
+    args = parser.parse_args(argv)
+
+    service = ClaimService(
+        args.host,
+        args.port,
+        max_batch_size=args.max_batch_size,
+        max_wait=args.max_wait_ms / 1000.0,
+        max_queue=args.max_queue,
+        workers=args.workers,
+        fast_path=args.fast_path,
+        combined_llm=args.combined_llm,
+        dedup=args.dedup,
+    )
+    try:
+        asyncio.run(service.serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
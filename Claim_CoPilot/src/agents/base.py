@@ -1,7 +1,33 @@
+import functools
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 from llm_client import LLMClient
-from state import ClaimState
+from metrics import instrument_stage
+from prompting import claim_prompt
+from state import ClaimBatch, ClaimState
+
+
+def _instrumented_run(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def run(self, state):
+        with instrument_stage(self, "single", (state,)):
+            return fn(self, state)
+    run._instrumented = True
+    return run
+
+
+def _instrumented_run_batch(fn: Callable) -> Callable:
+    @functools.wraps(fn)
+    def run_batch(self, states, *args, **kwargs):
+        if isinstance(states, ClaimBatch):
+            claims = states.states
+        else:
+            states = claims = list(states)
+        with instrument_stage(self, "batch", claims):
+            return fn(self, states, *args, **kwargs)
+    run_batch._instrumented = True
+    return run_batch
+
 
 class BaseAgent(ABC):
     """
@@ -10,8 +36,25 @@ class BaseAgent(ABC):
       - Has a name
       - Has access to an LLMClient
       - Implements run(state) which modifies the ClaimState in place.
+      - May override run_batch(states) with a faster path for many claims.
+      - Declares the ClaimState fields it reads / writes, which the
+        Orchestrator uses to decide which agents can run concurrently.
+
+    run() / run_batch() of every subclass are timed automatically (see
+    metrics.instrument_stage): durations and LLM token usage end up in the
+    trace entries the call adds and in the process-wide METRICS registry.
     """
     name: str = "BaseAgent"
+    reads: Tuple[str, ...] = ()
+    writes: Tuple[str, ...] = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for attr, wrap in (("run", _instrumented_run), ("run_batch", _instrumented_run_batch)):
+            fn = cls.__dict__.get(attr)
+            if fn is not None and not getattr(fn, "__isabstractmethod__", False) \
+                    and not getattr(fn, "_instrumented", False):
+                setattr(cls, attr, wrap(fn))
 
     def __init__(self, llm: Optional[LLMClient] = None):
         # If no LLM is supplied, create a default one
@@ -24,3 +67,79 @@ class BaseAgent(ABC):
         This method should update state.* and add a trace entry.
         """
         ...
+
+    def run_batch(self, states: List[ClaimState]) -> None:
+        """
+        Run this agent over many claims. The default just calls run() per state;
+        agents with a batched backend (NER, LLM) override it.
+        """
+        for state in states:
+            self.run(state)
+
+    def degraded(self) -> bool:
+        """
+        True when the agent currently runs without its model (LLM disabled,
+        NER not loadable) and produces fallback output that must not be cached.
+        """
+        return False
+
+
+# The default batch loop counts as one batch call of the subclass agent
+BaseAgent.run_batch = _instrumented_run_batch(BaseAgent.run_batch)
+
+
+class LLMAgent(BaseAgent):
+    """
+    Base class for agents whose main work is one LLM call per claim.
+    Subclasses build the prompt and apply the reply; run() / run_batch()
+    take care of calling the LLM (concurrently for batches).
+    """
+    system: str = ""
+    temperature: float = 0.2
+    # Token budget for the user prompt; claim documents are truncated to fit
+    prompt_budget: int = 1500
+    # e.g. {"type": "json_object"} for agents that expect structured replies
+    response_format: Optional[dict] = None
+
+    @abstractmethod
+    def build_prompt(self, state: ClaimState) -> str:
+        """
+        Build the user prompt for this claim.
+        """
+        ...
+
+    @abstractmethod
+    def finish(self, state: ClaimState, reply: str) -> None:
+        """
+        Apply the LLM reply to the ClaimState and add a trace entry.
+        """
+        ...
+
+    def claim_prompt(self, state: ClaimState, sections: Sequence[Tuple[str, Any]]) -> str:
+        """
+        Compact user prompt: the claim documents (fitted to prompt_budget)
+        followed by one compact-JSON line per (label, value) section.
+        """
+        prompt, _, _ = claim_prompt(
+            state.raw_texts, sections, self.prompt_budget, getattr(self.llm, "model", None)
+        )
+        return prompt
+
+    def degraded(self) -> bool:
+        return not self.llm.enabled
+
+    def _llm_kwargs(self) -> dict:
+        kwargs = {"system": self.system, "temperature": self.temperature}
+        if self.response_format is not None:
+            kwargs["response_format"] = self.response_format
+        return kwargs
+
+    def run(self, state: ClaimState) -> None:
+        reply = self.llm.chat(self.build_prompt(state), **self._llm_kwargs())
+        self.finish(state, reply)
+
+    def run_batch(self, states: List[ClaimState]) -> None:
+        prompts = [self.build_prompt(s) for s in states]
+        replies = self.llm.chat_many(prompts, **self._llm_kwargs())
+        for state, reply in zip(states, replies):
+            self.finish(state, reply)
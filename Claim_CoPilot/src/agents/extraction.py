@@ -1,150 +1,223 @@
 import re
+import time
 from typing import List, Tuple, Optional, Dict, Any
 
-from transformers import pipeline, Pipeline
 from .base import BaseAgent
+from llm_client import LLMClient
+from chunking import BERT_MAX_TOKENS, chunk_text, merge_entities
+from model_registry import NER_MODEL, get_ner_pipeline
 from state import ClaimState
+# Date / amount helpers live in text_analysis; re-exported here for existing imports
+from text_analysis import MONTH_MAP, POLICY_TYPES, extract_claim_amount, extract_incident_date
 
-# ---------------- Date & Amount Helpers ----------------
-
-MONTH_MAP = {
-    "january": 1,
-    "february": 2,
-    "march": 3,
-    "april": 4,
-    "may": 5,
-    "june": 6,
-    "july": 7,
-    "august": 8,
-    "september": 9,
-    "october": 10,
-    "november": 11,
-    "december": 12,
-}
+# ---------------- Rule-based claimant name ----------------
 
+# "Firstname Lastname submitted / filed / presented ..." as written by intake forms
+NAME_PATTERN = re.compile(
+    r"\b([A-Z][a-z]+ [A-Z][a-z]+)\s+(?:submitted|filed|presents|presented)\b"
+)
 
-def extract_incident_date(text: str) -> Optional[str]:
-    """
-    Return incident date as 'YYYY-MM-DD' if we can find one, else None.
+# Capitalized words that can precede a claim verb but are never part of a name
+NAME_STOPWORDS = set(m.capitalize() for m in MONTH_MAP) | {
+    *POLICY_TYPES, "On", "The", "This", "Claim", "Policy",
+}
 
-    Supports:
-      - ISO dates: 2024-06-05
-      - Natural dates: November 22, 2024  ->  2024-11-22
-    """
 
-    # 1) ISO-style dates like 2024-06-05
-    m_iso = re.search(r"\b(20\d{2}-\d{2}-\d{2})\b", text)
-    if m_iso:
-        return m_iso.group(1)
-
-    # 2) Long-form dates like 'November 22, 2024'
-    m_long = re.search(
-        r"\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s*(\d{4})",
-        text,
-    )
-    if m_long:
-        month_name = m_long.group(1).lower()
-        day = int(m_long.group(2))
-        year = int(m_long.group(3))
-        month_num = MONTH_MAP.get(month_name)
-        if month_num:
-            return f"{year:04d}-{month_num:02d}-{day:02d}"
-
-    # Nothing found
-    return None
-
-
-def extract_claim_amount(text: str) -> Optional[float]:
+def extract_claimant_name_rules(text: str) -> Optional[str]:
     """
-    Extract the main monetary amount from the claim text.
+    Cheap, high-precision claimant name extraction for form-style text.
 
-    Strategy:
-      - Only consider numbers prefixed with '$' to avoid confusing years (e.g., 2024).
-      - Remove commas and parse as float.
-      - If multiple amounts exist (repairs + medical), pick the largest
-        as the main claim amount.
+    Returns a name only when the pattern matches exactly one distinct name and
+    none of its words is a known non-name (month, policy type, ...).
+    Otherwise returns None and the caller should fall back to NER.
     """
-    # Capture things like $3,750 or $280 or $1200.50
-    matches = re.findall(r"\$\s*([\d,]+(?:\.\d+)?)", text)
-    if not matches:
-        return None
-
-    amounts: List[float] = []
-    for m in matches:
-        cleaned = m.replace(",", "")
-        try:
-            amounts.append(float(cleaned))
-        except ValueError:
-            continue
-
-    if not amounts:
+    names = {
+        m.group(1) for m in NAME_PATTERN.finditer(text)
+        if not any(w in NAME_STOPWORDS for w in m.group(1).split())
+    }
+    if len(names) != 1:
         return None
-
-    # Heuristic: main claim amount = largest value
-    return max(amounts)
+    return names.pop()
 
 
 class ExtractionAgent(BaseAgent):
     name = "ExtractionAgent"
-    _ner: Optional[Pipeline] = None  # shared NER pipeline
+    reads = ("raw_texts",)
+    writes = ("extracted_fields",)
+    ner_model: str = NER_MODEL
+    batch_size: int = 16  # windows per NER forward pass
+    # Long documents are split into windows of this many tokens (a few below
+    # BERT_MAX_TOKENS: a window re-tokenized on its own can come out slightly
+    # longer), overlapping by ner_stride tokens
+    ner_max_tokens: int = BERT_MAX_TOKENS - 10
+    ner_stride: int = 128
+    # After a failed NER load, wait this long before trying again (doubled
+    # after every further failure, up to ner_retry_max), so a long-running
+    # daemon / service picks the model up once it becomes loadable
+    ner_retry_seconds: float = 30.0
+    ner_retry_max: float = 1800.0
+
+    def __init__(self, llm: Optional[LLMClient] = None, fast_path: bool = False):
+        super().__init__(llm)
+        # fast_path: try the rule-based name extractor first and only run NER
+        # for claims where it can't find a name confidently
+        self.fast_path = fast_path
+        # Monotonic time before which no new load attempt is made (None = no failure)
+        self._ner_retry_at: Optional[float] = None
+        self._ner_backoff = self.ner_retry_seconds
+
+    @property
+    def ner_failed(self) -> bool:
+        """
+        True while the last NER load attempt failed (extraction is regex-only).
+        """
+        return self._ner_retry_at is not None
 
-    def _get_ner(self) -> Optional[Pipeline]:
+    def _get_ner(self) -> Optional[Any]:
         """
-        Lazily create the NER pipeline the first time it's needed.
-        If something goes wrong, return None instead of crashing.
+        Return the process-wide NER pipeline from the model registry
+        (loaded on first use, shared by every agent / Orchestrator).
+        If something goes wrong, return None instead of crashing; the load is
+        retried once the backoff has passed.
         """
-        if self._ner is not None:
-            return self._ner
+        if self._ner_retry_at is not None and time.monotonic() < self._ner_retry_at:
+            return None
         try:
-            self._ner = pipeline(
-                "ner",
-                model="dslim/bert-base-NER",
-                aggregation_strategy="simple",
-            )
+            ner = get_ner_pipeline(self.ner_model)
         except Exception as e:
             # Fallback: no NER, just regex-based extraction
-            print("[ExtractionAgent] Warning: could not load NER model:", e)
-            self._ner = None
-        return self._ner
+            print(f"[ExtractionAgent] Warning: could not load NER model (retry in {self._ner_backoff:.0f}s):", e)
+            self._ner_retry_at = time.monotonic() + self._ner_backoff
+            self._ner_backoff = min(self._ner_backoff * 2, self.ner_retry_max)
+            return None
+        self._ner_retry_at = None
+        self._ner_backoff = self.ner_retry_seconds
+        return ner
+
+    def ner_available(self) -> bool:
+        """
+        Load the NER pipeline if needed; False when extraction is regex-only.
+        """
+        return self._get_ner() is not None
+
+    def degraded(self) -> bool:
+        return self.ner_failed
+
+    def _ner_documents(self, ner: Any, texts: List[str], batch_size: int) -> Tuple[List[List[Tuple[str, str]]], List[int]]:
+        """
+        NER over whole documents of any length: each document is split into
+        windows that fit the model (chunk_text, overlapping by `ner_stride`
+        tokens), all windows go through the pipeline together, and the
+        entities of each document are merged back (merge_entities).
+        Returns ([(word, label), ...] per document, windows per document).
+        """
+        tokenizer = getattr(ner, "tokenizer", None)
+        chunks = [
+            chunk_text(t, self.ner_max_tokens, self.ner_stride, tokenizer) if t.strip() else []
+            for t in texts
+        ]
+        windows = [(d, chunk.text) for d, doc_chunks in enumerate(chunks) for chunk in doc_chunks]
+        outputs: List[List[Dict[str, Any]]] = [[] for _ in windows]
+        if windows:
+            # Longest first: similar lengths end up in the same batch (less padding)
+            order = sorted(range(len(windows)), key=lambda k: len(windows[k][1]), reverse=True)
+            inputs = [windows[k][1] for k in order]
+            try:
+                for k, ents in zip(order, ner(inputs, batch_size=batch_size)):
+                    outputs[k] = ents
+            except Exception as e:
+                # Fall back to one window at a time so one bad input doesn't sink the batch
+                print("[ExtractionAgent] Warning during batched NER, retrying per text:", e)
+                for k, text in zip(order, inputs):
+                    try:
+                        outputs[k] = ner(text)
+                    except Exception as e2:
+                        print("[ExtractionAgent] Warning during NER:", e2)
+
+        per_doc: List[List[List[Dict[str, Any]]]] = [[] for _ in texts]
+        for (d, _), ents in zip(windows, outputs):
+            per_doc[d].append(ents)
+        entities = [
+            [(ent["word"], ent["entity_group"]) for ent in merge_entities(doc_chunks, doc_ents)]
+            for doc_chunks, doc_ents in zip(chunks, per_doc)
+        ]
+        return entities, [len(c) for c in chunks]
 
     def run(self, state: ClaimState) -> None:
         """
         Extract basic fields (claimant_name, policy_type, claim_amount, incident_date)
-        from the first raw text using NER + regex (with graceful fallback).
+        from the claim documents using NER + regex (with graceful fallback).
         """
-        text = state.raw_texts[0] if state.raw_texts else ""
-        text_stripped = text.strip()
-        entities: List[Tuple[str, str]] = []
+        self._extract([state], self.batch_size)
 
-        # ---------------- NER extraction ----------------
-        ner = self._get_ner()
-        if ner is not None and text_stripped:
-            try:
-                ents = ner(text)
-                # ents elements look like: {"word": "...", "entity_group": "PER", ...}
-                entities = [(e["word"], e["entity_group"]) for e in ents]
-            except Exception as e:
-                print("[ExtractionAgent] Warning during NER:", e)
+    def run_batch(self, states: List[ClaimState], batch_size: Optional[int] = None) -> None:
+        """
+        Same as run() for many claims, but the documents of all claims go
+        through the NER pipeline in one call with `batch_size` windows per
+        forward pass.
+
+        Windows are sorted by length before batching so each batch pads to a
+        similar length; results are mapped back to their document and claim.
+        """
+        self._extract(states, batch_size or self.batch_size)
+
+    def _extract(self, states: List[ClaimState], batch_size: int) -> None:
+        rule_names: List[Optional[str]] = [
+            extract_claimant_name_rules("\n".join(s.raw_texts)) if self.fast_path else None for s in states
+        ]
+
+        # ---------------- Batched NER extraction ----------------
+        # Only claims the rules couldn't handle go to the model
+        todo = [i for i, s in enumerate(states) if rule_names[i] is None and any(t.strip() for t in s.raw_texts)]
+        entities: List[List[List[Tuple[str, str]]]] = [[[] for _ in s.raw_texts] for s in states]
+        windows = [0] * len(states)
+        ner = self._get_ner() if todo else None
+        if ner is not None:
+            texts = [t for i in todo for t in states[i].raw_texts]
+            doc_entities, doc_windows = self._ner_documents(ner, texts, batch_size)
+            pos = 0
+            for i in todo:
+                n = len(states[i].raw_texts)
+                entities[i] = doc_entities[pos:pos + n]
+                windows[i] = sum(doc_windows[pos:pos + n])
+                pos += n
+
+        for state, doc_entities, rule_name, n_windows in zip(states, entities, rule_names, windows):
+            self._apply(state, doc_entities, rule_name, n_windows)
+
+    def _apply(
+        self,
+        state: ClaimState,
+        entities: List[List[Tuple[str, str]]],
+        rule_name: Optional[str] = None,
+        ner_windows: int = 0,
+    ) -> None:
+        """
+        Turn NER entities (one list per document) + regex matches into
+        extracted_fields and a trace entry. Documents are read in order (the
+        claim form usually comes first): each field comes from the first
+        document that has it.
+        A name found by the fast-path rules takes the place of the NER person entity.
+        """
+        analyses = [state.analysis(d) for d in range(len(state.raw_texts))]
 
         # ---------------- Policy type from keywords ----------------
-        policy: Optional[str] = None
-        lowered = text.lower()
-        for p in ["Health", "Auto", "Property"]:
-            if p.lower() in lowered:
-                policy = p
-                break
+        policy: Optional[str] = next((a.policies()[0] for a in analyses if a.policies()), None)
 
-        # ---------------- Claimant name from PERSON NER ----------------
-        claimant_name: Optional[str] = None
-        for word, label in entities:
+        # ---------------- Claimant name from rules or PERSON NER ----------------
+        all_entities = [ent for doc in entities for ent in doc]
+        claimant_name: Optional[str] = rule_name
+        name_source: Optional[str] = "rules" if rule_name else None
+        for word, label in ([] if rule_name else all_entities):
             if label == "PER":
                 # With aggregation_strategy="simple", this is usually full name
                 claimant_name = word
+                name_source = "ner"
                 break
 
-        # ---------------- Amount & date using helper functions ----------------
-        claim_amount = extract_claim_amount(text)
-        incident_date = extract_incident_date(text)
+        # ---------------- Amount & date (regex helpers, computed once per text) ----------------
+        claim_amount = next((a.claim_amount for a in analyses if a.claim_amount is not None), None)
+        incident_date = next((a.incident_date for a in analyses if a.incident_date is not None), None)
 
         # ---------------- Update state.extracted_fields ----------------
         if claimant_name:
@@ -158,9 +231,12 @@ class ExtractionAgent(BaseAgent):
 
         # ---------------- Trace logging ----------------
         trace_payload: Dict[str, Any] = {
-            "entities": entities,
+            "entities": all_entities,
+            "documents": len(state.raw_texts),
+            "ner_windows": ner_windows,
             "policy_guess": policy,
             "claimant_name": claimant_name,
+            "name_source": name_source,
             "claim_amount": claim_amount,
             "incident_date": incident_date,
         }
@@ -0,0 +1,151 @@
+import json
+from typing import Any, List, Optional, Tuple
+from .base import LLMAgent
+from .validation import ValidationAgent
+from .summarization import SummarizationAgent
+from llm_client import LLMClient
+from prompting import system_prompt
+from state import ClaimState
+
+# ---------------- Reply schema ----------------
+
+# {"issues": [str, ...], "summary": str}
+REVIEW_SCHEMA = {
+    "type": "object",
+    "required": ["issues", "summary"],
+    "properties": {
+        "issues": {"type": "array", "items": {"type": "string"}},
+        "summary": {"type": "string", "minLength": 1},
+    },
+}
+
+_JSON_TYPES = {"object": dict, "array": list, "string": str}
+
+
+def conforms(value: Any, schema: dict) -> bool:
+    """
+    Check `value` against the JSON Schema subset REVIEW_SCHEMA uses:
+    type (object / array / string), required, properties, items, minLength.
+    """
+    expected = _JSON_TYPES.get(schema.get("type"))
+    if expected is not None and not isinstance(value, expected):
+        return False
+    if isinstance(value, dict):
+        if any(key not in value for key in schema.get("required", ())):
+            return False
+        for key, sub in schema.get("properties", {}).items():
+            if key in value and not conforms(value[key], sub):
+                return False
+    elif isinstance(value, list) and "items" in schema:
+        return all(conforms(item, schema["items"]) for item in value)
+    elif isinstance(value, str) and len(value) < schema.get("minLength", 0):
+        return False
+    return True
+
+
+def parse_review(reply: Optional[str]) -> Optional[Tuple[List[str], str]]:
+    """
+    Parse and check a combined review reply against REVIEW_SCHEMA.
+    Returns (issues, summary), or None if the reply doesn't conform.
+    """
+    if not reply:
+        return None
+    try:
+        data = json.loads(reply)
+    except (TypeError, ValueError):
+        return None
+    if not conforms(data, REVIEW_SCHEMA):
+        return None
+
+    summary = data["summary"].strip()
+    # A whitespace-only summary is as useless as an empty one
+    if not summary:
+        return None
+    return [i.strip() for i in data["issues"] if i.strip()], summary
+
+
+class ReviewAgent(LLMAgent):
+    """
+    QA note + summary in one structured LLM call (instead of one call each
+    from ValidationAgent and SummarizationAgent).
+
+    The reply must be JSON matching REVIEW_SCHEMA. Claims whose reply is
+    missing or malformed go through the regular two-call path, so the result
+    always has the same shape as with the separate agents.
+    """
+    name = "ReviewAgent"
+    reads = ("raw_texts", "extracted_fields", "triage")
+    writes = ("issues", "summary")
+    system = system_prompt(
+        "Task: you are a precise claims QA checker and you summarize insurance claims accurately.\n"
+        "Reply with one JSON object with exactly these keys:\n"
+        '- "issues": 2-4 short strings noting missing required fields and any contradictions '
+        "between the claim text and the extracted fields\n"
+        '- "summary": a concise, factual summary (4-6 sentences) for a claim adjuster: who is '
+        "involved, what happened and when, policy type and claim amount, priority and any notable issues\n"
+        "Do not hallucinate information not supported by the text."
+    )
+    temperature = 0.2
+    prompt_budget = 1500
+    response_format = {"type": "json_object"}
+
+    def __init__(self, llm: Optional[LLMClient] = None):
+        super().__init__(llm)
+        # Two-call path for replies that don't parse
+        self.validation = ValidationAgent(self.llm)
+        self.summarization = SummarizationAgent(self.llm)
+
+    def build_prompt(self, state: ClaimState) -> str:
+        return self.claim_prompt(state, [
+            ("Extracted fields", state.extracted_fields),
+            ("Triage info", state.triage),
+        ])
+
+    def _apply(self, state: ClaimState, review: Tuple[List[str], str]) -> None:
+        llm_issues, summary = review
+        rule_issues = self.validation.check_fields(state)
+
+        # Same issue layout as ValidationAgent: one LLM note, then rule issues
+        if llm_issues:
+            state.issues.append("LLM-note: " + "\n".join(f"- {i}" for i in llm_issues))
+        state.issues.extend(rule_issues)
+        state.summary = summary
+
+        state.add_trace(self.name, "review_claim", {
+            "issues": rule_issues,
+            "llm_note_present": bool(llm_issues),
+            "summary_preview": summary[:120],
+        })
+
+    def _fallback(self, state: ClaimState, reply: Any) -> None:
+        state.add_trace(self.name, "review_fallback", {
+            "reason": "unparseable structured reply",
+            "reply_preview": str(reply)[:120],
+        })
+
+    def finish(self, state: ClaimState, reply: str) -> None:
+        review = parse_review(reply)
+        if review is None:
+            self._fallback(state, reply)
+            self.validation.run(state)
+            self.summarization.run(state)
+            return
+        self._apply(state, review)
+
+    def run_batch(self, states: List[ClaimState]) -> None:
+        prompts = [self.build_prompt(s) for s in states]
+        replies = self.llm.chat_many(prompts, **self._llm_kwargs())
+
+        failed = []
+        for state, reply in zip(states, replies):
+            review = parse_review(reply)
+            if review is None:
+                self._fallback(state, reply)
+                failed.append(state)
+            else:
+                self._apply(state, review)
+
+        # Batched two-call path for the claims the combined call couldn't handle
+        if failed:
+            self.validation.run_batch(failed)
+            self.summarization.run_batch(failed)
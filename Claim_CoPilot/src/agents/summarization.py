@@ -1,41 +1,130 @@
-import json
-from .base import BaseAgent
+from typing import Any, List, Sequence, Tuple
+from .base import LLMAgent
+from prompting import MIN_TEXT_TOKENS, claim_prompt, compact_json, count_tokens, fit_documents, split_to_tokens, system_prompt
 from state import ClaimState
 
-class SummarizationAgent(BaseAgent):
+class SummarizationAgent(LLMAgent):
+    """
+    Claim summary from one LLM call. Claims whose documents don't fit
+    prompt_budget (pages of police reports, medical bills, ...) are
+    summarized map-reduce style instead of being truncated: each document,
+    long ones in parts of map_budget tokens, is summarized on its own (all
+    parts concurrently), then the claim summary is written from those.
+    """
     name = "SummarizationAgent"
+    reads = ("raw_texts", "extracted_fields", "triage")
+    writes = ("summary",)
+    system = system_prompt(
+        "Task: you summarize insurance claims accurately.\n"
+        "Write a concise, factual summary (4-6 sentences) so a claim adjuster can quickly understand:\n"
+        "- Who is involved\n"
+        "- What happened and when\n"
+        "- Policy type and claim amount\n"
+        "- Priority and any notable issues\n"
+        "Do not hallucinate information not supported by the text."
+    )
+    temperature = 0.3
+    prompt_budget = 1500
 
-    def run(self, state: ClaimState) -> None:
+    # ---------------- Map step (per document) ----------------
+    map_reduce = True
+    map_system = system_prompt(
+        "Task: you summarize one document (or part of a document) of an insurance claim.\n"
+        "In 2-4 sentences, state the facts relevant to the claim: people involved, dates, "
+        "amounts, injuries or damage, policy details.\n"
+        "Do not hallucinate information not supported by the text."
+    )
+    map_budget = 1500
+
+    def _sections(self, state: ClaimState) -> List[Tuple[str, Any]]:
+        return [
+            ("Extracted fields", state.extracted_fields),
+            ("Triage info", state.triage),
+        ]
+
+    def build_prompt(self, state: ClaimState) -> str:
+        return self.claim_prompt(state, self._sections(state))
+
+    def map_parts(self, state: ClaimState) -> List[Tuple[str, str]]:
+        """
+        (label, text) pieces to summarize one by one, or [] when the claim
+        fits a single prompt without truncation.
+        """
+        if not self.map_reduce:
+            return []
+        model = getattr(self.llm, "model", None)
+        _, _, truncated = claim_prompt(state.raw_texts, self._sections(state), self.prompt_budget, model)
+        if not truncated:
+            return []
 
-        text = " ".join(state.raw_texts)
-        fields = state.extracted_fields
-        triage = state.triage
+        parts = []
+        n = len(state.raw_texts)
+        for d, text in enumerate(state.raw_texts, 1):
+            if not text.strip():
+                continue
+            pieces = split_to_tokens(text, self.map_budget, model)
+            for p, piece in enumerate(pieces, 1):
+                label = f"Document {d} of {n}" + (f", part {p} of {len(pieces)}" if len(pieces) > 1 else "")
+                parts.append((label, piece))
+        return parts
 
-        prompt = f"""
-You are an insurance claim summarization assistant.
+    def _map_prompts(self, parts: Sequence[Tuple[str, str]]) -> List[str]:
+        return [f"{label}:\n{text}" for label, text in parts]
 
-Original text:
-{text}
+    def _map_kwargs(self) -> dict:
+        return {"system": self.map_system, "temperature": self.temperature}
 
-Extracted fields:
-{json.dumps(fields)}
+    def reduce_prompt(self, state: ClaimState, parts: Sequence[Tuple[str, str]], summaries: Sequence[str]) -> str:
+        """
+        User prompt for the claim summary from the per-document summaries
+        (fitted to prompt_budget like the documents in build_prompt).
+        """
+        model = getattr(self.llm, "model", None)
+        data = "\n".join(f"{label}: {compact_json(value)}" for label, value in self._sections(state))
+        overhead = count_tokens(data, model) + 4 + 8 * len(parts)
+        fitted, _ = fit_documents(list(summaries), max(MIN_TEXT_TOKENS, self.prompt_budget - overhead), model)
+        body = "\n\n".join(f"[{label}]\n{s}" for (label, _), s in zip(parts, fitted))
+        return f"Document summaries:\n{body}\n\n{data}"
+
+    def _trace_map(self, state: ClaimState, parts: Sequence[Tuple[str, str]], summaries: Sequence[str]) -> None:
+        state.add_trace(self.name, "summarize_documents", {
+            "parts": [label for label, _ in parts],
+            "empty_replies": sum(1 for s in summaries if not s),
+        })
+
+    def run(self, state: ClaimState) -> None:
+        parts = self.map_parts(state)
+        if parts:
+            summaries = self.llm.chat_many(self._map_prompts(parts), **self._map_kwargs())
+            self._trace_map(state, parts, summaries)
+            prompt = self.reduce_prompt(state, parts, summaries)
+        else:
+            prompt = self.build_prompt(state)
+        self.finish(state, self.llm.chat(prompt, **self._llm_kwargs()))
 
-Triage info:
-{json.dumps(triage)}
+    def run_batch(self, states: List[ClaimState]) -> None:
+        """
+        Map prompts of every long claim in one concurrent chat_many(), then
+        the summary prompts (single or reduce) of all claims in another.
+        """
+        parts = [self.map_parts(s) for s in states]
+        flat = [p for claim_parts in parts for p in claim_parts]
+        replies = self.llm.chat_many(self._map_prompts(flat), **self._map_kwargs()) if flat else []
 
-Write a concise, factual summary (4-6 sentences) so a claim adjuster can quickly understand:
-- Who is involved
-- What happened and when
-- Policy type and claim amount
-- Priority and any notable issues
+        prompts = []
+        pos = 0
+        for state, claim_parts in zip(states, parts):
+            if claim_parts:
+                summaries = replies[pos:pos + len(claim_parts)]
+                self._trace_map(state, claim_parts, summaries)
+                prompts.append(self.reduce_prompt(state, claim_parts, summaries))
+                pos += len(claim_parts)
+            else:
+                prompts.append(self.build_prompt(state))
+        for state, summary in zip(states, self.llm.chat_many(prompts, **self._llm_kwargs())):
+            self.finish(state, summary)
 
-Do not hallucinate information not supported by the text.
-"""
-        summary = self.llm.chat(
-            prompt,
-            system="You summarize insurance claims accurately.",
-            temperature=0.3,
-        )
+    def finish(self, state: ClaimState, summary: str) -> None:
         state.summary = summary
 
         state.add_trace(self.name, "summarize_claim", {
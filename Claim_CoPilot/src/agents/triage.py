@@ -1,8 +1,50 @@
+import math
+from typing import Any, Dict, List, Optional, Sequence, Union
 from .base import BaseAgent
-from state import ClaimState
+from llm_client import LLMClient
+from state import ClaimBatch, ClaimState
+from text_analysis import INJURY_KEYWORDS, TextAnalysis
+
+# ---------------- Rule table ----------------
+
+# Checked top to bottom; the first rule whose conditions all hold sets the priority.
+# A rule may use:
+#   - "keywords":   any of these substrings appears in the (lowercased) claim text
+#   - "min_amount": claim_amount >= this value (missing amount counts as 0)
+DEFAULT_TRIAGE_RULES: List[Dict[str, Any]] = [
+    {"priority": "High", "keywords": INJURY_KEYWORDS},
+    {"priority": "Medium", "min_amount": 3000.0},
+]
+DEFAULT_PRIORITY = "Low"
+
 
 class TriageAgent(BaseAgent):
     name = "TriageAgent"
+    reads = ("raw_texts", "extracted_fields")
+    writes = ("triage",)
+
+    def __init__(
+        self,
+        llm: Optional[LLMClient] = None,
+        rules: Optional[Sequence[Dict[str, Any]]] = None,
+        default_priority: str = DEFAULT_PRIORITY,
+    ):
+        super().__init__(llm)
+        self.rules = list(rules) if rules is not None else DEFAULT_TRIAGE_RULES
+        self.default_priority = default_priority
+
+    @staticmethod
+    def _amount(fields: Dict[str, Any]) -> float:
+        # Missing and NaN amounts count as 0, as in run_batch()
+        amount = float(fields["claim_amount"]) if fields.get("claim_amount") is not None else 0.0
+        return 0.0 if math.isnan(amount) else amount
+
+    def _rule_matches(self, rule: Dict[str, Any], analysis: TextAnalysis, amount: float) -> bool:
+        if "keywords" in rule and not analysis.has_any(rule["keywords"]):
+            return False
+        if "min_amount" in rule and not amount >= rule["min_amount"]:
+            return False
+        return True
 
     def run(self, state: ClaimState) -> None:
         """
@@ -10,14 +52,14 @@ class TriageAgent(BaseAgent):
         Uses both extracted fields and raw text.
         """
         fields = state.extracted_fields
-        text = " ".join(state.raw_texts).lower()
+        analysis = state.analysis()
 
-        amount = float(fields.get("claim_amount", 0.0)) if fields.get("claim_amount") is not None else 0.0
-        priority = "Low"
-        if "fracture" in text or "injur" in text or "hospital" in text:
-            priority = "High"
-        elif amount >= 3000:
-            priority = "Medium"
+        amount = self._amount(fields)
+        priority = self.default_priority
+        for rule in self.rules:
+            if self._rule_matches(rule, analysis, amount):
+                priority = rule["priority"]
+                break
 
         claim_type = fields.get("policy_type", "Unknown")
 
@@ -29,3 +71,52 @@ class TriageAgent(BaseAgent):
             "claim_type": claim_type,
             "amount": amount,
         })
+
+    def run_batch(self, states: Union[ClaimBatch, List[ClaimState]]) -> None:
+        """
+        Same result as run() on every claim, computed for the whole batch at once:
+        amounts as one NumPy array, one boolean mask per rule, and np.select
+        for first-match-wins. Falls back to the per-claim path without NumPy.
+        """
+        try:
+            import numpy as np
+        except ImportError:
+            super().run_batch(list(states))
+            return
+
+        batch = states if isinstance(states, ClaimBatch) else ClaimBatch(states)
+        n = len(batch)
+        if n == 0:
+            return
+
+        # Missing amounts are NaN in the column; the scalar path treats them as 0
+        amounts = np.nan_to_num(np.frombuffer(batch.claim_amount, dtype=np.float64), nan=0.0)
+
+        conditions = []
+        for rule in self.rules:
+            mask = np.ones(n, dtype=bool)
+            if "keywords" in rule:
+                keywords = rule["keywords"]
+                mask &= np.fromiter(
+                    (s.analysis().has_any(keywords) for s in batch.states), dtype=bool, count=n
+                )
+            if "min_amount" in rule:
+                mask &= amounts >= rule["min_amount"]
+            conditions.append(mask)
+
+        priorities = np.select(
+            conditions,
+            [rule["priority"] for rule in self.rules],
+            default=self.default_priority,
+        ).tolist() if conditions else [self.default_priority] * n
+
+        batch.priority = priorities
+        batch.claim_type = [s.extracted_fields.get("policy_type", "Unknown") for s in batch.states]
+        batch.write_triage()
+
+        for state, priority, claim_type, amount in zip(batch.states, priorities, batch.claim_type, amounts.tolist()):
+            state.add_trace(self.name, "assign_triage", {
+                "priority": priority,
+                "claim_type": claim_type,
+                "amount": amount,
+            })
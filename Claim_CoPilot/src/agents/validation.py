@@ -1,47 +1,46 @@
-import json
-from .base import BaseAgent
-from state import ClaimState
+from typing import List
+from .base import LLMAgent
+from prompting import system_prompt
+from state import REQUIRED_FIELDS, ClaimState
 
-class ValidationAgent(BaseAgent):
+class ValidationAgent(LLMAgent):
     name = "ValidationAgent"
+    reads = ("raw_texts", "extracted_fields")
+    writes = ("issues",)
+    system = system_prompt(
+        "Task: you are a precise and concise claims QA checker.\n"
+        "1) Note any missing required fields.\n"
+        "2) Note any contradictions between the claim text and the extracted fields.\n"
+        "Reply with 2-4 bullet points."
+    )
+    temperature = 0.2
+    prompt_budget = 1000
+
+    def build_prompt(self, state: ClaimState) -> str:
+        """
+        Ask the LLM to provide a short QA note.
+        """
+        return self.claim_prompt(state, [("Extracted fields", state.extracted_fields)])
 
-    def run(self, state: ClaimState) -> None:
+    def check_fields(self, state: ClaimState) -> List[str]:
         """
         Check for missing fields and simple contradictions.
-        Ask the LLM to provide a short QA note.
         """
         issues = []
 
-        required = ["claimant_name", "policy_type", "claim_amount", "incident_date"]
-        for field in required:
+        for field in REQUIRED_FIELDS:
             if field not in state.extracted_fields:
                 issues.append(f"Missing field: {field}")
 
         # Example contradiction: multiple policy types in raw text
-        text = " ".join(state.raw_texts)
-        found = [p for p in ["Health", "Auto", "Property"] if p.lower() in text.lower()]
+        found = state.analysis().policies()
         if len(set(found)) > 1:
             issues.append(f"Multiple policy types mentioned in text: {found}")
+        return issues
 
-        prompt = f"""
-You are a claims QA checker.
-
-Text:
-{text}
-
-Extracted fields:
-{json.dumps(state.extracted_fields)}
-
-1) Note any missing fields (claimant_name, policy_type, claim_amount, incident_date).
-2) Note any contradictions.
+    def finish(self, state: ClaimState, note: str) -> None:
+        issues = self.check_fields(state)
 
-Reply with 2-4 bullet points.
-"""
-        note = self.llm.chat(
-            prompt,
-            system="You are a precise and concise QA checker.",
-            temperature=0.2,
-        )
         if note:
             state.issues.append(f"LLM-note: {note}")
 
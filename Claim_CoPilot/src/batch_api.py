@@ -0,0 +1,349 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from agents.base import BaseAgent, LLMAgent
+from jsonl_io import dumps, loads
+from metrics import record_llm_batch_result
+from state import ClaimInput, ClaimState
+
+# Endpoint every deferred request goes to
+CHAT_ENDPOINT = "/v1/chat/completions"
+
+# Batch statuses after which nothing will change any more
+FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def custom_id(index: int, agent: BaseAgent) -> str:
+    """
+    Request id inside a batch file: "<claim index>:<agent name>".
+    """
+    return f"{index}:{agent.name}"
+
+
+class BatchAPIError(RuntimeError):
+    pass
+
+
+class Request(NamedTuple):
+    """
+    One chat request of a batch.
+    """
+    cid: str
+    prompt: str
+    system: str
+    temperature: float
+    response_format: Optional[Dict[str, Any]] = None
+
+
+class BatchSubmitter:
+    """
+    Runs LLM prompts through the OpenAI Batch API instead of the real-time
+    completions endpoint: prompts are written to a batch-request JSONL file,
+    uploaded (files.create, purpose="batch"), submitted (batches.create),
+    polled until the batch is done, and the output file is downloaded.
+
+    Every submitted batch is recorded in `work_dir` as <request file hash>.job.json,
+    so re-running the same prompts (e.g. after a crash) re-attaches to the batch
+    already in flight instead of paying for it twice.
+
+    Answers are also stored in the LLMClient's cache, and prompts already in
+    the cache are not submitted at all.
+
+    Point the LLMClient at any server with the same file / batch endpoints
+    via base_url (e.g. a local stub in tests).
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        work_dir: Union[str, Path] = "outputs/batch_jobs",
+        poll_interval: float = 30.0,
+        timeout: Optional[float] = None,
+        completion_window: str = "24h",
+        fallback_sync: bool = True,
+        verbose: bool = True,
+    ):
+        self.llm = llm
+        self.work_dir = Path(work_dir)
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.completion_window = completion_window
+        # Requests the batch didn't answer are sent through the normal API
+        self.fallback_sync = fallback_sync
+        self.verbose = verbose
+
+    # ---------------- Request files ----------------
+
+    def request_line(self, cid: str, agent: LLMAgent, prompt: str) -> Dict[str, Any]:
+        return self._line(Request(cid, prompt, agent.system, agent.temperature, agent.response_format))
+
+    def _line(self, request: "Request") -> Dict[str, Any]:
+        body: Dict[str, Any] = {
+            "model": self.llm.model,
+            "messages": self.llm._messages(request.prompt, request.system),
+            "temperature": request.temperature,
+        }
+        if request.response_format is not None:
+            body["response_format"] = request.response_format
+        return {"custom_id": request.cid, "method": "POST", "url": CHAT_ENDPOINT, "body": body}
+
+    def write_requests(self, lines: Sequence[Dict[str, Any]]) -> Path:
+        """
+        Write the batch-request JSONL file; its name is the hash of its content.
+        """
+        data = b"".join(dumps(line) + b"\n" for line in lines)
+        digest = hashlib.sha256(data).hexdigest()[:16]
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        path = self.work_dir / f"{digest}.requests.jsonl"
+        path.write_bytes(data)
+        return path
+
+    def _job_path(self, requests_path: Path) -> Path:
+        return requests_path.with_name(requests_path.name.replace(".requests.jsonl", ".job.json"))
+
+    # ---------------- Batch lifecycle ----------------
+
+    def _log(self, msg: str) -> None:
+        if self.verbose:
+            print(f"[BatchAPI] {msg}")
+
+    def submit(self, requests_path: Path, metadata: Optional[Dict[str, str]] = None) -> str:
+        """
+        Upload the request file and create the batch; returns the batch id.
+        Re-uses the batch recorded for this exact file unless it ended badly.
+        """
+        client = self.llm.client
+        job_path = self._job_path(requests_path)
+        if job_path.exists():
+            job = json.loads(job_path.read_text(encoding="utf-8"))
+            batch = client.batches.retrieve(job["batch_id"])
+            if batch.status not in ("failed", "expired", "cancelled"):
+                self._log(f"re-attaching to batch {batch.id} ({batch.status})")
+                return batch.id
+
+        with open(requests_path, "rb") as f:
+            uploaded = client.files.create(file=f, purpose="batch")
+        extra = {"metadata": metadata} if metadata else {}
+        batch = client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=CHAT_ENDPOINT,
+            completion_window=self.completion_window,
+            **extra,
+        )
+        job_path.write_text(json.dumps({
+            "batch_id": batch.id,
+            "input_file_id": uploaded.id,
+            "requests": str(requests_path),
+            "submitted_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }), encoding="utf-8")
+        self._log(f"submitted batch {batch.id} ({requests_path.name})")
+        return batch.id
+
+    def wait(self, batch_id: str) -> Any:
+        """
+        Poll until the batch reaches a final status; returns the batch object.
+        """
+        client = self.llm.client
+        start = time.monotonic()
+        while True:
+            batch = client.batches.retrieve(batch_id)
+            if batch.status in FINAL_STATUSES:
+                self._log(f"batch {batch_id} {batch.status}")
+                return batch
+            if self.timeout is not None and time.monotonic() - start > self.timeout:
+                raise BatchAPIError(f"Batch {batch_id} still {batch.status!r} after {self.timeout}s")
+            counts = getattr(batch, "request_counts", None)
+            if counts is not None:
+                self._log(f"batch {batch_id} {batch.status}: {counts.completed}/{counts.total} done")
+            time.sleep(self.poll_interval)
+
+    def fetch_results(self, batch: Any) -> Dict[str, Tuple[str, Any]]:
+        """
+        Download the output file: custom_id -> (reply text, usage) for every
+        request that succeeded. Failed requests are simply absent.
+        """
+        results: Dict[str, Tuple[str, Any]] = {}
+        if not getattr(batch, "output_file_id", None):
+            return results
+        content = self.llm.client.files.content(batch.output_file_id)
+        for line in content.content.splitlines():
+            if not line.strip():
+                continue
+            rec = loads(line)
+            response = rec.get("response") or {}
+            if rec.get("error") or response.get("status_code") != 200:
+                continue
+            body = response.get("body") or {}
+            try:
+                reply = body["choices"][0]["message"]["content"]
+            except (KeyError, IndexError, TypeError):
+                continue
+            if reply is not None:
+                results[rec["custom_id"]] = (reply, body.get("usage"))
+        return results
+
+    # ---------------- Claims ----------------
+
+    def answer(self, requests: Sequence[Request]) -> Dict[str, str]:
+        """
+        custom_id -> reply: from the LLM cache where possible, the rest from
+        one batch. Requests the batch didn't answer are absent.
+        """
+        # custom_id -> cache key of the requests that go into the batch
+        pending: Dict[str, Optional[str]] = {}
+        replies: Dict[str, str] = {}
+        lines = []
+        for request in requests:
+            key = self.llm._cache_key(request.prompt, request.system, request.temperature, request.response_format)
+            cached = self.llm.cache.get(key) if key is not None else None
+            if cached is not None:
+                replies[request.cid] = cached
+                continue
+            pending[request.cid] = key
+            lines.append(self._line(request))
+
+        if lines:
+            self._log(f"{len(lines)} requests to submit ({len(replies)} answered from cache)")
+            batch = self.wait(self.submit(self.write_requests(lines)))
+            for cid, (reply, usage) in self.fetch_results(batch).items():
+                if cid not in pending:
+                    continue
+                replies[cid] = reply
+                record_llm_batch_result(self.llm.model, usage)
+                key = pending[cid]
+                if key is not None:
+                    self.llm.cache.set(key, reply)
+        return replies
+
+    def map_prompts(self, agents: Sequence[LLMAgent], states: Sequence[ClaimState]) -> Dict[str, str]:
+        """
+        Map step of map-reduce agents (SummarizationAgent with long or
+        multi-document claims): every document part is summarized in one
+        batch, and custom_id -> reduce prompt is returned for those claims,
+        so they are not truncated in deferred mode either.
+        """
+        mapped = []
+        for agent in agents:
+            if not hasattr(agent, "map_parts"):
+                continue
+            for i, state in enumerate(states):
+                parts = agent.map_parts(state)
+                if parts:
+                    cids = [f"{custom_id(i, agent)}:map:{k}" for k in range(len(parts))]
+                    mapped.append((agent, i, state, parts, cids))
+        if not mapped:
+            return {}
+
+        replies = self.answer([
+            Request(cid, prompt, agent.map_system, agent.temperature)
+            for agent, _, _, parts, cids in mapped
+            for cid, prompt in zip(cids, agent._map_prompts(parts))
+        ])
+
+        prompts = {}
+        for agent, i, state, parts, cids in mapped:
+            summaries = [replies.get(cid, "") for cid in cids]
+            gaps = [k for k, cid in enumerate(cids) if cid not in replies]
+            if gaps and self.fallback_sync:
+                map_prompts = agent._map_prompts([parts[k] for k in gaps])
+                for k, reply in zip(gaps, self.llm.chat_many(map_prompts, **agent._map_kwargs())):
+                    summaries[k] = reply
+            agent._trace_map(state, parts, summaries)
+            prompts[custom_id(i, agent)] = agent.reduce_prompt(state, parts, summaries)
+        return prompts
+
+    def run_agents(self, agents: Sequence[LLMAgent], states: Sequence[ClaimState]) -> None:
+        """
+        Build the prompts of every (agent, claim), answer them with one batch,
+        and apply each answer with agent.finish() to the right ClaimState.
+        Claims that need a map step first (see map_prompts) take one more batch.
+        """
+        if not getattr(self.llm, "client", None):
+            # No API key / not an OpenAI-backed client: nothing to defer
+            for agent in agents:
+                agent.run_batch(list(states))
+            return
+
+        reduce_prompts = self.map_prompts(agents, states)
+        requests = []
+        for agent in agents:
+            for i, state in enumerate(states):
+                cid = custom_id(i, agent)
+                prompt = reduce_prompts.get(cid) or agent.build_prompt(state)
+                requests.append(Request(cid, prompt, agent.system, agent.temperature, agent.response_format))
+        replies = self.answer(requests)
+
+        for agent in agents:
+            missing = []
+            for i, state in enumerate(states):
+                cid = custom_id(i, agent)
+                reply = replies.get(cid)
+                if reply is None:
+                    missing.append((cid, state))
+                else:
+                    agent.finish(state, reply)
+            if not missing:
+                continue
+            self._log(f"{len(missing)} {agent.name} requests had no batch answer"
+                      + (", sending them now" if self.fallback_sync else ""))
+            if self.fallback_sync:
+                plain = [state for cid, state in missing if cid not in reduce_prompts]
+                if plain:
+                    agent.run_batch(plain)
+                # Map step already done: only the reduce prompt is sent again
+                reduced = [(cid, state) for cid, state in missing if cid in reduce_prompts]
+                if reduced:
+                    prompts = [reduce_prompts[cid] for cid, _ in reduced]
+                    for (_, state), reply in zip(reduced, self.llm.chat_many(prompts, **agent._llm_kwargs())):
+                        agent.finish(state, reply)
+            else:
+                # Left unanswered; visible in the trace
+                for cid, state in missing:
+                    state.add_trace(agent.name, "batch_missing", {"custom_id": cid})
+
+
+def run_deferred(
+    orchestrator: Any,
+    texts: Sequence[ClaimInput],
+    submitter: Optional[BatchSubmitter] = None,
+    claim_ids: Optional[Sequence[Optional[str]]] = None,
+) -> List[ClaimState]:
+    """
+    Offline version of Orchestrator.run_many(): non-LLM agents run right away,
+    and the prompts of the LLM agents are answered through the Batch API.
+    Agents run in graph order; LLM agents are collected until an agent needs
+    one of their outputs, then the collected ones go out as one batch (with
+    the default pipeline: one batch with every Validation + Summarization prompt).
+
+    Claims go through the orchestrator's intake like in run_many(): with a
+    dedup index, duplicates are flagged, exact duplicates are answered from
+    their stored state, and the final states are stored under `claim_ids`.
+    """
+    submitter = submitter or BatchSubmitter(orchestrator.llm)
+    ids = list(claim_ids) if claim_ids is not None else [None] * len(texts)
+    intake = [orchestrator._intake(t, cid) for t, cid in zip(texts, ids)]
+    states = [state for _, state, _ in intake]
+    todo = [state for _, state, reused in intake if not reused]
+
+    if todo:
+        # Agent list order is a valid topological order of the stage graph
+        deferred: Dict[int, LLMAgent] = {}
+        for j, agent in enumerate(orchestrator.agents):
+            if deferred and orchestrator.graph.deps[j] & deferred.keys():
+                submitter.run_agents(list(deferred.values()), todo)
+                deferred = {}
+            if isinstance(agent, LLMAgent):
+                deferred[j] = agent
+            else:
+                agent.run_batch(todo)
+        if deferred:
+            submitter.run_agents(list(deferred.values()), todo)
+
+    if orchestrator.dedup is not None:
+        for claim_id, state, reused in intake:
+            if not reused:
+                orchestrator.dedup.set_state(claim_id, state)
+    return states
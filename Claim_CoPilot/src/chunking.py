@@ -0,0 +1,113 @@
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# ---------------- Token offsets ----------------
+
+# BERT-style encoders see at most 512 tokens, two of which are [CLS] / [SEP]
+BERT_MAX_TOKENS = 510
+
+# Words and punctuation, the unit word-piece tokenizers start from
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+# Without a tokenizer, long words count as one piece per this many characters
+# (over-counts slightly, so the windows stay within the model limit)
+_CHARS_PER_PIECE = 6
+
+
+def token_offsets(text: str, tokenizer: Optional[Any] = None) -> List[Tuple[int, int]]:
+    """
+    (start, end) character offsets of the tokens of `text`: exact with a
+    Hugging Face fast tokenizer (e.g. ner.tokenizer), otherwise an estimate
+    from words and punctuation.
+    """
+    if tokenizer is not None:
+        try:
+            enc = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+            return [(int(s), int(e)) for s, e in enc["offset_mapping"]]
+        except Exception:
+            pass
+    offsets = []
+    for m in _PIECE_RE.finditer(text):
+        start, end = m.span()
+        for s in range(start, end, _CHARS_PER_PIECE):
+            offsets.append((s, min(s + _CHARS_PER_PIECE, end)))
+    return offsets
+
+# ---------------- Windows ----------------
+
+class TextChunk:
+    """
+    A window of a document: its text and where it starts in the document.
+    """
+    __slots__ = ("text", "start")
+
+    def __init__(self, text: str, start: int):
+        self.text = text
+        self.start = start
+
+    def __repr__(self) -> str:
+        return f"TextChunk(start={self.start}, chars={len(self.text)})"
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = BERT_MAX_TOKENS,
+    stride: int = 128,
+    tokenizer: Optional[Any] = None,
+) -> List[TextChunk]:
+    """
+    Split `text` into windows of at most `max_tokens` tokens, each overlapping
+    the previous one by `stride` tokens, so an entity cut at a window edge is
+    seen whole in the next window. Text that fits is returned as one chunk.
+    """
+    if stride >= max_tokens:
+        raise ValueError("stride must be smaller than max_tokens")
+    offsets = token_offsets(text, tokenizer)
+    if len(offsets) <= max_tokens:
+        return [TextChunk(text, 0)]
+
+    chunks = []
+    step = max_tokens - stride
+    for i in range(0, len(offsets), step):
+        window = offsets[i:i + max_tokens]
+        start, end = window[0][0], window[-1][1]
+        chunks.append(TextChunk(text[start:end], start))
+        if i + max_tokens >= len(offsets):
+            break
+    return chunks
+
+# ---------------- Entity merging ----------------
+
+def merge_entities(chunks: Sequence[TextChunk], chunk_entities: Sequence[Sequence[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Entities of one document from the NER output of its chunks, in document
+    order. Offsets are shifted to document positions; an entity found in two
+    overlapping windows (possibly cut short in one of them) is kept once, as
+    the longest span of the same label, then the highest score.
+    Entities without offsets are de-duplicated by (word, label).
+    """
+    spans: List[Dict[str, Any]] = []
+    unplaced: List[Dict[str, Any]] = []
+    for chunk, ents in zip(chunks, chunk_entities):
+        for ent in ents:
+            if ent.get("start") is None or ent.get("end") is None:
+                unplaced.append(ent)
+            else:
+                spans.append(dict(ent, start=ent["start"] + chunk.start, end=ent["end"] + chunk.start))
+    spans.sort(key=lambda e: (e["start"], e["start"] - e["end"]))
+
+    merged: List[Dict[str, Any]] = []
+    for ent in spans:
+        prev = merged[-1] if merged else None
+        if prev is not None and ent["start"] < prev["end"] and ent.get("entity_group") == prev.get("entity_group"):
+            if (ent["end"] - ent["start"], ent.get("score", 0.0)) > (prev["end"] - prev["start"], prev.get("score", 0.0)):
+                merged[-1] = ent
+            continue
+        merged.append(ent)
+
+    seen = {(e.get("word"), e.get("entity_group")) for e in merged}
+    for ent in unplaced:
+        key = (ent.get("word"), ent.get("entity_group"))
+        if key not in seen:
+            seen.add(key)
+            merged.append(ent)
+    return merged
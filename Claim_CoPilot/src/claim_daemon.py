@@ -0,0 +1,221 @@
+import argparse
+import os
+import socket
+import socketserver
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from jsonl_io import dumps, loads
+from state import ClaimState
+
+# ---------------- Addresses ----------------
+
+# Project root (the parent of src/), so clients and daemon agree on the socket path
+BASE = Path(__file__).resolve().parent.parent
+
+# Unix socket where available (no TCP port to manage), localhost TCP elsewhere
+DEFAULT_ADDRESS = os.environ.get(
+    "CLAIMCOPILOT_DAEMON",
+    f"unix:{BASE / 'outputs' / 'claim_daemon.sock'}" if hasattr(socket, "AF_UNIX") else "127.0.0.1:48765",
+)
+
+
+def parse_address(address: str) -> Tuple[int, Union[str, Tuple[str, int]]]:
+    """
+    "unix:<path>" or "<host>:<port>" -> (socket family, socket address).
+    """
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+# ---------------- Server ----------------
+
+class _Handler(socketserver.StreamRequestHandler):
+    """
+    One connection: JSON requests in, JSON replies out, one per line.
+      {"op": "run", "text": "..." or "documents": [...], "claim_id": optional}
+                                    -> {"ok": true, "state": {...}}
+      {"op": "ping"}                -> {"ok": true, "pid": ...}
+      {"op": "shutdown"}            -> {"ok": true}
+    """
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.claim_daemon.handle(loads(line))
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(dumps(reply) + b"\n")
+            self.wfile.flush()
+            if reply.get("shutdown"):
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class ClaimDaemon:
+    """
+    Long-running worker that keeps one warmed-up Orchestrator (NER model,
+    LLM client, thread pool) and runs claims sent over a local socket, so
+    short-lived CLI invocations (app.py --daemon) skip all model loading.
+
+    Connections are served concurrently; each claim goes through
+    Orchestrator.run() exactly as in-process.
+
+    With `dedup` (path of an intake index, see dedup.py) resubmitted claims
+    are flagged, and exact resubmissions are answered from the stored result.
+    """
+
+    def __init__(
+        self,
+        address: str = DEFAULT_ADDRESS,
+        fast_path: bool = False,
+        combined_llm: bool = False,
+        dedup: Optional[str] = None,
+    ):
+        self.address = address
+        self.fast_path = fast_path
+        self.combined_llm = combined_llm
+        self.dedup = dedup
+        self.orchestrator: Any = None
+        self._server: Optional[socketserver.BaseServer] = None
+
+    def load(self) -> None:
+        """
+        Build the Orchestrator and load the models.
+        """
+        from model_registry import warmup
+        from orchestrator import Orchestrator
+
+        index = None
+        if self.dedup:
+            from dedup import IntakeIndex
+            index = IntakeIndex(self.dedup, store_states=True)
+        self.orchestrator = Orchestrator(
+            fast_path=self.fast_path,
+            combined_llm=self.combined_llm,
+            dedup=index,
+            reuse_duplicates=index is not None,
+        )
+        warmup()
+        self.orchestrator.llm.warmup()
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        op = request.get("op")
+        if op == "run":
+            text = request.get("documents") or request.get("text") or ""
+            state = self.orchestrator.run(text, claim_id=request.get("claim_id"))
+            return {"ok": True, "state": state.to_dict()}
+        if op == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if op == "shutdown":
+            return {"ok": True, "shutdown": True}
+        return {"ok": False, "error": f"Unknown op: {op!r}"}
+
+    def serve_forever(self) -> None:
+        if self.orchestrator is None:
+            self.load()
+        family, addr = parse_address(self.address)
+        if family == socket.AF_INET:
+            server: socketserver.BaseServer = _TCPServer(addr, _Handler)
+        else:
+            path = Path(addr)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # A socket file left behind by a daemon that didn't exit cleanly
+            if path.exists() and not DaemonClient(self.address, timeout=1.0).ping():
+                path.unlink()
+            server = _UnixServer(str(path), _Handler)
+        server.claim_daemon = self
+        self._server = server
+        print(f"[ClaimDaemon] Ready on {self.address} (pid {os.getpid()})")
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.orchestrator.close()
+            if self.orchestrator.dedup is not None:
+                self.orchestrator.dedup.close()
+            if family != socket.AF_INET:
+                Path(addr).unlink(missing_ok=True)
+            print("[ClaimDaemon] Stopped.")
+
+# ---------------- Client ----------------
+
+class DaemonClient:
+    """
+    Connects to a running ClaimDaemon. run() returns the ClaimState built
+    by the daemon; ping() tells whether a daemon is listening at all.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: Optional[float] = 300.0):
+        self.address = address
+        self.timeout = timeout
+
+    def _request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        family, addr = parse_address(self.address)
+        with socket.socket(family, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(addr)
+            sock.sendall(dumps(request) + b"\n")
+            with sock.makefile("rb") as f:
+                line = f.readline()
+        if not line:
+            raise ConnectionError(f"No reply from claim daemon at {self.address}")
+        reply = loads(line)
+        if not reply.get("ok"):
+            raise RuntimeError(f"Claim daemon error: {reply.get('error')}")
+        return reply
+
+    def ping(self) -> bool:
+        try:
+            self._request({"op": "ping"})
+            return True
+        except (OSError, ValueError, RuntimeError):
+            return False
+
+    def run(self, text: str) -> ClaimState:
+        return ClaimState.from_dict(self._request({"op": "run", "text": text})["state"])
+
+    def shutdown(self) -> None:
+        self._request({"op": "shutdown"})
+
+
+def main(argv: Optional[list] = None) -> None:
+    parser = argparse.ArgumentParser(description="Persistent ClaimCopilot worker for app.py --daemon")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS,
+                        help="unix:<path> or <host>:<port> (default: %(default)s)")
+    parser.add_argument("--fast-path", action="store_true",
+                        help="Try rule-based name extraction before NER")
+    parser.add_argument("--combined-llm", action="store_true",
+                        help="One structured LLM call for QA note + summary")
+    parser.add_argument("--dedup", metavar="PATH",
+                        help="Intake index (SQLite) to flag resubmitted claims and reuse their results")
+    parser.add_argument("--stop", action="store_true", help="Stop the daemon running at --address")
+    args = parser.parse_args(argv)
+
+    if args.stop:
+        DaemonClient(args.address, timeout=5.0).shutdown()
+        return
+    try:
+        ClaimDaemon(
+            args.address, fast_path=args.fast_path, combined_llm=args.combined_llm, dedup=args.dedup,
+        ).serve_forever()
+    except KeyboardInterrupt:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+
+from jsonl_io import dumps, loads
+from state import ClaimState
+
+# ---------------- Text fingerprints ----------------
+
+_WORD_RE = re.compile(r"\w+")
+_SPACE_RE = re.compile(r"\s+")
+# Ids IntakeIndex assigns: "intake-<n>"
+_ASSIGNED_ID_RE = re.compile(r"intake-(\d+)")
+
+# Word n-grams used as shingles
+SHINGLE_SIZE = 3
+
+# Universal hashing (a * x + b) mod p, as in the usual MinHash construction.
+# a, b and the shingle hashes x are all below 2**32, so a * x + b < 2**64
+# never wraps around in uint64 before the reduction mod p.
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def normalize_text(text: str) -> str:
+    """
+    Case- and whitespace-insensitive form of a claim text.
+    """
+    return _SPACE_RE.sub(" ", text.casefold()).strip()
+
+
+def exact_fingerprint(text: str) -> str:
+    """
+    Hash of the normalized text: equal for resubmissions that only differ
+    in case / whitespace.
+    """
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()[:32]
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    32-bit hashes of the distinct word `size`-grams of the normalized text.
+    """
+    words = _WORD_RE.findall(normalize_text(text))
+    if len(words) <= size:
+        grams = {" ".join(words)}
+    else:
+        grams = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+
+
+class MinHasher:
+    """
+    MinHash signatures with `num_perm` hash functions, computed for all
+    shingles of a text in one vectorized step.
+    """
+
+    def __init__(self, num_perm: int = 64, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(_MAX_HASH), size=num_perm, dtype=np.uint64, endpoint=True)
+        self.b = rng.integers(0, int(_MAX_HASH), size=num_perm, dtype=np.uint64, endpoint=True)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = shingle_hashes(text)
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        # (num_perm, shingles)
+        values = (np.outer(self.a, hashes) + self.b[:, None]) % _MERSENNE_PRIME
+        return (values & _MAX_HASH).min(axis=1).astype(np.uint32)
+
+
+def jaccard_estimate(sig_a: np.ndarray, sig_b: np.ndarray) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+# ---------------- Index ----------------
+
+class DedupMatch:
+    """
+    An earlier claim the new one duplicates ("exact") or nearly duplicates ("near").
+    """
+    __slots__ = ("kind", "claim_id", "similarity")
+
+    def __init__(self, kind: str, claim_id: str, similarity: float):
+        self.kind = kind
+        self.claim_id = claim_id
+        self.similarity = similarity
+
+    def issue(self) -> str:
+        """
+        Text for ClaimState.issues.
+        """
+        if self.kind == "exact":
+            return f"Possible duplicate: same text as claim {self.claim_id}"
+        return f"Possible near-duplicate of claim {self.claim_id} (similarity {self.similarity:.2f})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"match": self.kind, "claim_id": self.claim_id, "similarity": round(self.similarity, 3)}
+
+    def __repr__(self) -> str:
+        return f"DedupMatch({self.to_dict()!r})"
+
+
+class IntakeIndex:
+    """
+    Index of claims seen at intake, to flag resubmissions.
+
+    - Exact duplicates: same normalized text (exact_fingerprint()).
+    - Near-duplicates: MinHash signatures of word 3-gram shingles, looked up
+      with LSH (`bands` bands of num_perm / bands rows); candidates whose
+      estimated Jaccard similarity is >= `threshold` are reported.
+
+    At most `max_entries` claims are kept (oldest dropped first), so memory
+    stays bounded. With a `path`, entries (and, with store_states=True, the
+    final ClaimState of each claim, for reuse on exact matches) are persisted
+    in SQLite and the newest max_entries are loaded again on startup.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        num_perm: int = 64,
+        bands: int = 16,
+        threshold: float = 0.7,
+        max_entries: int = 100_000,
+        store_states: bool = False,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.store_states = store_states
+
+        self._lock = threading.RLock()
+        # claim_id -> (exact fingerprint, signature)
+        self._entries: "OrderedDict[str, Tuple[str, np.ndarray]]" = OrderedDict()
+        self._exact: Dict[str, str] = {}
+        self._buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+        # Final states (encoded) when there is no database to keep them in
+        self._states: Dict[str, bytes] = {}
+        self._next_id = 0
+        self._pending_writes = 0
+        self._inserts_since_prune = 0
+
+        self.path = Path(path) if path else None
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS claims ("
+                " claim_id TEXT PRIMARY KEY, exact TEXT NOT NULL, signature BLOB NOT NULL,"
+                " state BLOB, added REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS claims_added ON claims(added)")
+            # next_id: counter for assigned ids, never lowered by pruning
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.commit()
+            self._load()
+
+    # ---------------- Internals ----------------
+
+    def _load(self) -> None:
+        rows = self._db.execute(
+            "SELECT claim_id, exact, signature FROM claims ORDER BY added DESC, rowid DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        for claim_id, exact, blob in reversed(rows):
+            signature = np.frombuffer(blob, dtype=np.uint32)
+            if len(signature) == self.hasher.num_perm:
+                self._insert(claim_id, exact, signature)
+        row = self._db.execute("SELECT value FROM meta WHERE key = 'next_id'").fetchone()
+        if row is not None:
+            self._next_id = row[0]
+        else:
+            # Index written before the counter existed: continue after the highest assigned id
+            ids = [cid for (cid,) in self._db.execute("SELECT claim_id FROM claims WHERE claim_id LIKE 'intake-%'")]
+            self._next_id = 1 + max((int(cid[7:]) for cid in ids if cid[7:].isdigit()), default=-1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def _insert(self, claim_id: str, exact: str, signature: np.ndarray) -> None:
+        if claim_id in self._entries:
+            self._remove(claim_id)
+        self._entries[claim_id] = (exact, signature)
+        # Newest copy: survives eviction of the older ones
+        self._exact[exact] = claim_id
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, set()).add(claim_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, claim_id: str) -> None:
+        exact, signature = self._entries.pop(claim_id)
+        if self._exact.get(exact) == claim_id:
+            del self._exact[exact]
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            ids = bucket.get(key)
+            if ids is not None:
+                ids.discard(claim_id)
+                if not ids:
+                    del bucket[key]
+        self._states.pop(claim_id, None)
+
+    def _match(self, exact: str, signature: np.ndarray, exclude: Optional[str] = None) -> Optional[DedupMatch]:
+        # `exclude`: the claim itself, when it is processed again (e.g. a resumed run)
+        claim_id = self._exact.get(exact)
+        if claim_id is not None and claim_id != exclude:
+            return DedupMatch("exact", claim_id, 1.0)
+
+        candidates: Set[str] = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            candidates |= bucket.get(key, set())
+        candidates.discard(exclude)
+        best: Optional[DedupMatch] = None
+        for cid in candidates:
+            sim = jaccard_estimate(signature, self._entries[cid][1])
+            if sim >= self.threshold and (best is None or sim > best.similarity):
+                best = DedupMatch("near", cid, sim)
+        return best
+
+    def _stored_exact(self, claim_id: str) -> Optional[str]:
+        entry = self._entries.get(claim_id)
+        if entry is not None:
+            return entry[0]
+        if self._db is not None:
+            row = self._db.execute("SELECT exact FROM claims WHERE claim_id = ?", (claim_id,)).fetchone()
+            if row is not None:
+                return row[0]
+        return None
+
+    def _reserve(self, claim_id: str, exact: str) -> None:
+        """
+        Keep a caller-supplied id from clashing with assigned ones: an
+        "intake-<n>" id the counter hasn't reached yet moves it past n, and
+        one already assigned to a different text is refused (it would
+        overwrite that claim). Caller holds the lock.
+        """
+        m = _ASSIGNED_ID_RE.fullmatch(claim_id)
+        if m is None:
+            return
+        n = int(m.group(1))
+        if n >= self._next_id:
+            self._next_id = n + 1
+            return
+        stored = self._stored_exact(claim_id)
+        if stored is not None and stored != exact:
+            raise ValueError(f"Claim id {claim_id!r} is already assigned to another claim")
+
+    def _prune_disk(self) -> None:
+        """
+        Drop the oldest rows above max_entries. Caller holds the lock.
+        """
+        self._inserts_since_prune = 0
+        (count,) = self._db.execute("SELECT COUNT(*) FROM claims").fetchone()
+        extra = count - self.max_entries
+        if extra > 0:
+            self._db.execute(
+                "DELETE FROM claims WHERE claim_id IN "
+                "(SELECT claim_id FROM claims ORDER BY added ASC, rowid ASC LIMIT ?)",
+                (extra,),
+            )
+
+    def _commit(self, force: bool = False) -> None:
+        self._pending_writes += 1
+        # Committing every insert is slow; a crash loses at most the last few
+        if force or self._pending_writes >= 100:
+            self._db.commit()
+            self._pending_writes = 0
+
+    # ---------------- Public API ----------------
+
+    def check(self, text: str) -> Optional[DedupMatch]:
+        """
+        The earlier claim `text` duplicates, if any (does not add it).
+        """
+        exact = exact_fingerprint(text)
+        signature = self.hasher.signature(text)
+        with self._lock:
+            return self._match(exact, signature)
+
+    def add(self, text: str, claim_id: Optional[str] = None) -> Tuple[str, Optional[DedupMatch]]:
+        """
+        Check `text` against the index, then add it. Returns (claim id, match).
+        Without a claim_id one is assigned ("intake-<n>"). A supplied id
+        replaces the entry of the same id (e.g. a claim processed again), but
+        raises ValueError if it is an assigned id of a different text.
+        """
+        exact = exact_fingerprint(text)
+        signature = self.hasher.signature(text)
+        with self._lock:
+            if claim_id is None:
+                claim_id = f"intake-{self._next_id}"
+                self._next_id += 1
+            else:
+                self._reserve(claim_id, exact)
+            match = self._match(exact, signature, exclude=claim_id)
+            self._insert(claim_id, exact, signature)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO claims (claim_id, exact, signature, state, added) VALUES (?, ?, ?, NULL, ?)",
+                    (claim_id, exact, signature.tobytes(), time.time()),
+                )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_id', ?)", (self._next_id,)
+                )
+                self._inserts_since_prune += 1
+                # Keep the file as bounded as the in-memory index, even if close() is never reached;
+                # counting rows on every insert is wasteful, so prune in small batches
+                if self._inserts_since_prune >= 100:
+                    self._prune_disk()
+                self._commit()
+            return claim_id, match
+
+    def set_state(self, claim_id: str, state: ClaimState) -> None:
+        """
+        Remember the final ClaimState of a claim (only with store_states=True).
+        """
+        if not self.store_states:
+            return
+        data = dumps(state.to_dict())
+        with self._lock:
+            if claim_id not in self._entries:
+                return
+            if self._db is not None:
+                self._db.execute("UPDATE claims SET state = ? WHERE claim_id = ?", (data, claim_id))
+                self._commit()
+            else:
+                self._states[claim_id] = data
+
+    def get_state(self, claim_id: str) -> Optional[ClaimState]:
+        """
+        A fresh copy of the stored final state of `claim_id`, if there is one.
+        """
+        with self._lock:
+            data = self._states.get(claim_id)
+            if data is None and self._db is not None:
+                row = self._db.execute("SELECT state FROM claims WHERE claim_id = ?", (claim_id,)).fetchone()
+                if row is not None:
+                    data = row[0]
+        return ClaimState.from_dict(loads(data)) if data is not None else None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "exact_keys": len(self._exact),
+            "band_buckets": sum(len(b) for b in self._buckets),
+        }
+
+    def flush(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._commit(force=True)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._prune_disk()
+                self._db.commit()
+                self._db.close()
+                self._db = None
@@ -1,21 +1,26 @@
-import json
+import argparse
 import random
 import datetime
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Any, List, Optional, Union
+
+from jsonl_io import JsonlWriter
 
 # --------------------------------------------------------------------
 # Project paths (relative to this file)
 # --------------------------------------------------------------------
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 DATA_DIR = PROJECT_ROOT / "data"
-DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 OUT_PATH = DATA_DIR / "claims.jsonl"
 
+# Seed of the original 10k dataset (main())
+DEFAULT_SEED = 42
+
 # --------------------------------------------------------------------
 # Synthetic data templates
 # --------------------------------------------------------------------
-random.seed(42)
 
 FIRST_NAMES = [
     "John", "Jane", "Mark", "Priya", "Carlos", "Emily",
@@ -76,43 +81,71 @@ PROPERTY_NOTES = [
 
 BASE_DATE = datetime.date(2024, 1, 1)
 
+SEVERITIES = ["low", "medium", "high"]
+SEVERITY_MULTIPLIER = {"low": 0.6, "medium": 1.0, "high": 1.6}
+
+# Per policy type (same order as POLICY_TYPES): events, injury notes, base amount range
+POLICY_TEMPLATES = {
+    "Health": (HEALTH_EVENTS, HEALTH_INJURIES, (600, 9000)),
+    "Auto": (AUTO_EVENTS, AUTO_INJURIES, (800, 15000)),
+    "Property": (PROPERTY_EVENTS, PROPERTY_NOTES, (1000, 20000)),
+}
 
-def random_date() -> str:
+
+def random_date(rng: Any) -> str:
     """Sample a random date in 2024 (YYYY-MM-DD)."""
-    delta_days = random.randint(0, 365)
+    delta_days = rng.randint(0, 365)
     d = BASE_DATE + datetime.timedelta(days=delta_days)
     return d.isoformat()
 
 
-def generate_single_claim(i: int) -> dict:
+def generate_single_claim(i: int, rng: Any) -> dict:
     """
     Generate one synthetic claim record with fields aligned
     to what the pipeline expects.
+    `rng` is any random.Random-like object, e.g. random.Random(DEFAULT_SEED);
+    there is no default, so output never depends on the unseeded global RNG.
     """
     claim_id = f"c{i:05d}"
-    policy_type = random.choice(POLICY_TYPES)
-    first = random.choice(FIRST_NAMES)
-    last = random.choice(LAST_NAMES)
+    policy_type = rng.choice(POLICY_TYPES)
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
     name = f"{first} {last}"
-    incident_date = random_date()
+    incident_date = random_date(rng)
 
     if policy_type == "Health":
-        event = random.choice(HEALTH_EVENTS)
-        injury = random.choice(HEALTH_INJURIES)
-        base_amt = random.randint(600, 9000)
+        event = rng.choice(HEALTH_EVENTS)
+        injury = rng.choice(HEALTH_INJURIES)
+        base_amt = rng.randint(600, 9000)
     elif policy_type == "Auto":
-        event = random.choice(AUTO_EVENTS)
-        injury = random.choice(AUTO_INJURIES)
-        base_amt = random.randint(800, 15000)
+        event = rng.choice(AUTO_EVENTS)
+        injury = rng.choice(AUTO_INJURIES)
+        base_amt = rng.randint(800, 15000)
     else:  # Property
-        event = random.choice(PROPERTY_EVENTS)
-        injury = random.choice(PROPERTY_NOTES)
-        base_amt = random.randint(1000, 20000)
+        event = rng.choice(PROPERTY_EVENTS)
+        injury = rng.choice(PROPERTY_NOTES)
+        base_amt = rng.randint(1000, 20000)
 
-    severity = random.choice(["low", "medium", "high"])
-    multiplier = {"low": 0.6, "medium": 1.0, "high": 1.6}[severity]
+    severity = rng.choice(SEVERITIES)
+    multiplier = SEVERITY_MULTIPLIER[severity]
     claim_amount = round(base_amt * multiplier, 2)
 
+    return build_record(claim_id, name, policy_type, incident_date, event, injury, severity, claim_amount)
+
+
+def build_record(
+    claim_id: str,
+    name: str,
+    policy_type: str,
+    incident_date: str,
+    event: str,
+    injury: str,
+    severity: str,
+    claim_amount: float,
+) -> dict:
+    """
+    Render the claim text, gold priority and gold summary from sampled values.
+    """
     # Priority logic aligned with TriageAgent
     if "fracture" in injury or "surgery" in injury or severity == "high" or claim_amount > 5000:
         priority = "High"
@@ -145,13 +178,142 @@ def generate_single_claim(i: int) -> dict:
 
 
 def main(n_total: int = 10000):
+    """
+    Write the standard n_total-claim dataset to data/claims.jsonl
+    (sequential, seed 42: same field values as the original dataset; the
+    bytes of each line differ when orjson is the JSON codec).
+    """
     print(f"Generating {n_total} synthetic claims...")
-    with OUT_PATH.open("w", encoding="utf-8") as f:
+    rng = random.Random(DEFAULT_SEED)
+    with JsonlWriter(OUT_PATH) as w:
         for i in range(1, n_total + 1):
-            rec = generate_single_claim(i)
-            f.write(json.dumps(rec) + "\n")
+            w.write(generate_single_claim(i, rng))
     print(f"Wrote dataset to: {OUT_PATH.resolve()}")
 
 
+# --------------------------------------------------------------------
+# Parallel, sharded generation for large benchmark corpora
+# --------------------------------------------------------------------
+
+def generate_shard(shard: int, start_id: int, count: int, seed: int = DEFAULT_SEED) -> List[dict]:
+    """
+    Generate `count` claims with ids start_id .. start_id + count - 1.
+
+    Every shard has its own RNG stream derived from (seed, shard), so the
+    output depends only on seed and shard size, never on how many worker
+    processes run the shards. Sampling is vectorized with NumPy when it is
+    installed (stdlib random otherwise; both are deterministic, but they
+    produce different records).
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        rng = random.Random(f"{seed}:{shard}")
+        return [generate_single_claim(start_id + k, rng) for k in range(count)]
+
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(shard,)))
+
+    policy_idx = rng.integers(0, len(POLICY_TYPES), count)
+    first_idx = rng.integers(0, len(FIRST_NAMES), count)
+    last_idx = rng.integers(0, len(LAST_NAMES), count)
+    dates = (np.datetime64(BASE_DATE) + rng.integers(0, 366, count)).astype(str)
+    severity_idx = rng.integers(0, len(SEVERITIES), count)
+
+    # Events / injuries / amount ranges depend on the policy type: sample a
+    # uniform number and scale it by the size of that policy's list / range.
+    templates = [POLICY_TEMPLATES[p] for p in POLICY_TYPES]
+    n_events = np.array([len(t[0]) for t in templates])[policy_idx]
+    n_injuries = np.array([len(t[1]) for t in templates])[policy_idx]
+    lo = np.array([t[2][0] for t in templates])[policy_idx]
+    hi = np.array([t[2][1] for t in templates])[policy_idx]
+    event_idx = (rng.random(count) * n_events).astype(np.int64)
+    injury_idx = (rng.random(count) * n_injuries).astype(np.int64)
+    base_amt = lo + (rng.random(count) * (hi - lo + 1)).astype(np.int64)
+    multipliers = np.array([SEVERITY_MULTIPLIER[s] for s in SEVERITIES])[severity_idx]
+    amounts = np.round(base_amt * multipliers, 2)
+
+    records = []
+    for k in range(count):
+        events, injuries, _ = templates[policy_idx[k]]
+        records.append(build_record(
+            claim_id=f"c{start_id + k:05d}",
+            name=f"{FIRST_NAMES[first_idx[k]]} {LAST_NAMES[last_idx[k]]}",
+            policy_type=POLICY_TYPES[policy_idx[k]],
+            incident_date=str(dates[k]),
+            event=events[event_idx[k]],
+            injury=injuries[injury_idx[k]],
+            severity=SEVERITIES[severity_idx[k]],
+            claim_amount=float(amounts[k]),
+        ))
+    return records
+
+
+def write_records(records: List[dict], path: Path, fmt: str) -> None:
+    """
+    Write one shard as JSONL (fmt 'jsonl', 'jsonl.gz', 'jsonl.zst') or Parquet.
+    """
+    if fmt == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Parquet output needs the 'pyarrow' package") from e
+        pq.write_table(pa.Table.from_pylist(records), str(path), compression="zstd")
+    else:
+        with JsonlWriter(path, buffer_records=10_000) as w:
+            w.write_many(records)
+
+
+def _write_shard(args: tuple) -> str:
+    shard, start_id, count, seed, out_dir, fmt = args
+    path = Path(out_dir) / f"claims-{shard:05d}.{fmt}"
+    write_records(generate_shard(shard, start_id, count, seed), path, fmt)
+    return str(path)
+
+
+def generate_parallel(
+    n_total: int,
+    out_dir: Union[str, Path],
+    workers: Optional[int] = None,
+    shard_size: int = 100_000,
+    seed: int = DEFAULT_SEED,
+    fmt: str = "jsonl.gz",
+) -> List[str]:
+    """
+    Generate n_total claims as shards of `shard_size` records, spread over
+    `workers` processes. Returns the shard paths in id order. The same
+    (n_total, shard_size, seed) always gives the same files.
+    """
+    if fmt not in ("jsonl", "jsonl.gz", "jsonl.zst", "parquet"):
+        raise ValueError(f"Unknown format: {fmt!r}")
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = []
+    for shard, start in enumerate(range(0, n_total, shard_size)):
+        count = min(shard_size, n_total - start)
+        jobs.append((shard, start + 1, count, seed, str(out_dir), fmt))
+
+    print(f"Generating {n_total} synthetic claims in {len(jobs)} shards...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        paths = list(pool.map(_write_shard, jobs))
+    print(f"Wrote {len(paths)} shards to: {out_dir.resolve()}")
+    return paths
+
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate synthetic ClaimCopilot claims.")
+    parser.add_argument("--n", type=int, default=10000, help="number of claims")
+    parser.add_argument("--out-dir", type=Path, default=None,
+                        help="write parallel shards here (default: data/claims.jsonl, sequential)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--shard-size", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--format", default="jsonl.gz",
+                        choices=["jsonl", "jsonl.gz", "jsonl.zst", "parquet"])
+    args = parser.parse_args()
+
+    if args.out_dir is None:
+        main(args.n)
+    else:
+        generate_parallel(args.n, args.out_dir, args.workers, args.shard_size, args.seed, args.format)
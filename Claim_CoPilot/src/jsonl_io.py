@@ -0,0 +1,217 @@
+import gzip
+import io
+import json
+import os
+from pathlib import Path
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Union
+
+PathLike = Union[str, Path]
+
+# ---------------- JSON codec (fastest available) ----------------
+
+_loads: Callable[[bytes], Any]
+_dumps: Callable[[Any], bytes]
+# What _loads raises on malformed input (orjson / json: ValueError subclasses)
+_DecodeError: type = ValueError
+
+try:
+    import orjson  # type: ignore
+
+    JSON_BACKEND = "orjson"
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:
+    try:
+        import msgspec  # type: ignore
+
+        JSON_BACKEND = "msgspec"
+        _loads = msgspec.json.decode
+        _dumps = msgspec.json.encode
+        _DecodeError = msgspec.DecodeError
+    except ImportError:
+        JSON_BACKEND = "json"
+        _loads = json.loads
+
+        def _dumps(obj: Any) -> bytes:
+            return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    One JSON document; malformed input raises ValueError with every codec.
+    """
+    try:
+        return _loads(data)
+    except ValueError:
+        raise
+    except _DecodeError as e:
+        raise ValueError(str(e)) from e
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    One compact JSON document as UTF-8 bytes (no trailing newline).
+    """
+    return _dumps(obj)
+
+# ---------------- Compression by file suffix ----------------
+
+def compression_for(path: PathLike) -> Optional[str]:
+    """
+    'gzip' for *.gz, 'zstd' for *.zst / *.zstd, None for plain files.
+    """
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gz":
+        return "gzip"
+    if suffix in (".zst", ".zstd"):
+        return "zstd"
+    return None
+
+
+def _zstd():
+    try:
+        import zstandard  # type: ignore
+    except ImportError as e:
+        raise ImportError("Reading / writing .zst files needs the 'zstandard' package") from e
+    return zstandard
+
+
+def open_read(path: PathLike) -> BinaryIO:
+    """
+    Open a (possibly compressed) file for reading decompressed bytes line by line.
+    Multi-member gzip and multi-frame zstd files (as written by JsonlWriter.sync)
+    are read as one stream.
+    """
+    kind = compression_for(path)
+    if kind == "gzip":
+        return gzip.open(path, "rb")
+    if kind == "zstd":
+        raw = open(path, "rb")
+        reader = _zstd().ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        return io.BufferedReader(reader)
+    return open(path, "rb")
+
+# ---------------- Reading ----------------
+
+def iter_jsonl(path: PathLike, skip: int = 0) -> Iterator[Dict[str, Any]]:
+    """
+    Stream records from a JSONL file (optionally .gz / .zst), one at a time,
+    so memory stays flat whatever the file size. Blank lines are ignored.
+    The first `skip` records are passed over without being decoded.
+    """
+    with open_read(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            if skip > 0:
+                skip -= 1
+                continue
+            yield _loads(line)
+
+# ---------------- Writing ----------------
+
+class JsonlWriter:
+    """
+    Buffered JSONL writer. Records are encoded as they come in and written to
+    disk in bulk every `buffer_records` records (or on flush / sync / close).
+    Output is gzip / zstd compressed when the path ends in .gz / .zst.
+
+    Usage:
+        with JsonlWriter("outputs/results.jsonl.gz") as w:
+            for rec in records:
+                w.write(rec)
+    """
+
+    def __init__(
+        self,
+        path: PathLike,
+        mode: str = "w",
+        buffer_records: int = 1000,
+        compresslevel: Optional[int] = None,
+    ):
+        if mode not in ("w", "a"):
+            raise ValueError("mode must be 'w' or 'a'")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.kind = compression_for(self.path)
+        self.buffer_records = buffer_records
+        self.compresslevel = compresslevel
+        self.records_written = 0
+
+        self._raw: BinaryIO = open(self.path, mode + "b")
+        self._buffer: list = []
+        self._stream = self._open_stream()
+
+    def _open_stream(self):
+        # Compressed output goes through a stream layered on the raw file
+        if self.kind == "gzip":
+            level = 6 if self.compresslevel is None else self.compresslevel
+            return gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=level)
+        if self.kind == "zstd":
+            zstandard = _zstd()
+            level = 3 if self.compresslevel is None else self.compresslevel
+            return zstandard.ZstdCompressor(level=level).stream_writer(self._raw, closefd=False)
+        return self._raw
+
+    def write(self, record: Any) -> None:
+        self._buffer.append(_dumps(record))
+        if len(self._buffer) >= self.buffer_records:
+            self.flush()
+
+    def write_many(self, records: Iterable[Any]) -> None:
+        for rec in records:
+            self.write(rec)
+
+    def flush(self) -> None:
+        """
+        Write buffered records to the (compressed) stream.
+        """
+        if self._buffer:
+            self._buffer.append(b"")
+            self._stream.write(b"\n".join(self._buffer))
+            self.records_written += len(self._buffer) - 1
+            self._buffer = []
+
+    def sync(self) -> int:
+        """
+        Make everything written so far durable and return the byte size of the
+        file at this point. Truncating the file to that size later always leaves
+        a valid file (for compressed output the current gzip member / zstd frame
+        is finished first), which is what resumable checkpoints rely on.
+        """
+        self.flush()
+        if self.kind == "gzip":
+            self._stream.close()  # writes the member trailer, keeps _raw open
+        elif self.kind == "zstd":
+            self._stream.flush(_zstd().FLUSH_FRAME)
+        self._raw.flush()
+        os.fsync(self._raw.fileno())
+        position = self._raw.tell()
+        if self.kind == "gzip":
+            # Start the next member only after taking the position
+            self._stream = self._open_stream()
+        return position
+
+    def close(self) -> None:
+        if self._raw.closed:
+            return
+        self.flush()
+        if self._stream is not self._raw:
+            self._stream.close()
+        self._raw.close()
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def write_jsonl(path: PathLike, records: Iterable[Any], **kwargs: Any) -> int:
+    """
+    Write an iterable of records to `path`; returns how many were written.
+    """
+    with JsonlWriter(path, **kwargs) as w:
+        w.write_many(records)
+        w.flush()
+        return w.records_written
@@ -0,0 +1,203 @@
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+from model_registry import REGISTRY
+
+# ---------------- Interface ----------------
+
+class LLMBackend(ABC):
+    """
+    Local text generation used by LLMClient instead of the OpenAI API
+    (LLMClient(backend=...) or CLAIMCOPILOT_LLM_BACKEND).
+
+    generate() takes a whole batch of prompts with the same system prompt and
+    returns one reply per prompt, in order. Models are loaded lazily through
+    the process-wide ModelRegistry; warmup() loads them up front.
+    """
+    # Used as LLMClient.model, so cache keys / metrics never mix with API answers
+    model_id: str = "local"
+
+    @abstractmethod
+    def generate(
+        self,
+        prompts: List[str],
+        system: str = "",
+        temperature: float = 0.2,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        ...
+
+    def warmup(self) -> None:
+        """
+        Load the model now (e.g. at CLI / worker startup).
+        """
+        self.generate(["Warm up."])
+
+
+def _set_threads(threads: Optional[int]) -> None:
+    # torch's intra-op thread pool is process-wide
+    if not threads:
+        return
+    try:
+        import torch  # type: ignore
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+# ---------------- Hugging Face seq2seq (e.g. Flan-T5) ----------------
+
+DEFAULT_TEXT2TEXT_MODEL = "google/flan-t5-base"
+
+
+class TransformersBackend(LLMBackend):
+    """
+    CPU seq2seq generation with a Hugging Face text2text pipeline
+    (instruction-tuned models such as Flan-T5 handle both the QA note and the
+    summary prompts). Prompts are sorted by length and generated `batch_size`
+    at a time; inputs longer than the model's limit are truncated.
+
+    Decoding is greedy (deterministic) unless sample=True, in which case the
+    request temperature is used.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_TEXT2TEXT_MODEL,
+        threads: Optional[int] = None,
+        batch_size: int = 8,
+        max_new_tokens: int = 160,
+        sample: bool = False,
+    ):
+        self.model = model
+        self.model_id = f"local:{model}"
+        self.threads = threads
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.sample = sample
+        # One generation at a time: concurrent stages would only fight over the CPU threads
+        self._lock = threading.Lock()
+
+    def _pipeline(self) -> Any:
+        def _load():
+            _set_threads(self.threads)
+            from transformers import pipeline
+            return pipeline("text2text-generation", model=self.model, device=-1)
+
+        return REGISTRY.get(("text2text", self.model), _load)
+
+    def generate(
+        self,
+        prompts: List[str],
+        system: str = "",
+        temperature: float = 0.2,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        if not prompts:
+            return []
+        pipe = self._pipeline()
+        inputs = [f"{system}\n\n{p}" if system else p for p in prompts]
+
+        # Similar lengths in one batch mean less padding
+        order = sorted(range(len(inputs)), key=lambda i: len(inputs[i]), reverse=True)
+        kwargs: Dict[str, Any] = {
+            "batch_size": self.batch_size,
+            "max_new_tokens": self.max_new_tokens,
+            "truncation": True,
+        }
+        if self.sample and temperature > 0:
+            kwargs.update(do_sample=True, temperature=temperature)
+        else:
+            kwargs["do_sample"] = False
+
+        with self._lock:
+            outputs = pipe([inputs[i] for i in order], **kwargs)
+        replies: List[str] = [""] * len(inputs)
+        for i, out in zip(order, outputs):
+            # One dict per input (or a one-element list of dicts)
+            if isinstance(out, list):
+                out = out[0] if out else {}
+            replies[i] = (out.get("generated_text") or "").strip()
+        return replies
+
+# ---------------- llama.cpp (quantized GGUF chat models) ----------------
+
+class LlamaCppBackend(LLMBackend):
+    """
+    Quantized chat model through llama-cpp-python. The model runs one prompt
+    at a time (a Llama object is not thread-safe), using `threads` CPU threads.
+    JSON response_format is passed through (grammar-constrained output).
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        threads: Optional[int] = None,
+        n_ctx: int = 4096,
+        max_tokens: int = 256,
+    ):
+        self.model_path = model_path
+        self.model_id = f"llama_cpp:{os.path.basename(model_path)}"
+        self.threads = threads
+        self.n_ctx = n_ctx
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def _llama(self) -> Any:
+        def _load():
+            from llama_cpp import Llama  # type: ignore
+            return Llama(
+                model_path=self.model_path,
+                n_threads=self.threads or os.cpu_count(),
+                n_ctx=self.n_ctx,
+                verbose=False,
+            )
+
+        return REGISTRY.get(("llama_cpp", self.model_path), _load)
+
+    def generate(
+        self,
+        prompts: List[str],
+        system: str = "",
+        temperature: float = 0.2,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> List[str]:
+        llama = self._llama()
+        replies = []
+        for prompt in prompts:
+            messages = []
+            if system:
+                messages.append({"role": "system", "content": system})
+            messages.append({"role": "user", "content": prompt})
+            kwargs: Dict[str, Any] = {"temperature": temperature, "max_tokens": self.max_tokens}
+            if response_format is not None:
+                kwargs["response_format"] = response_format
+            with self._lock:
+                resp = llama.create_chat_completion(messages=messages, **kwargs)
+            replies.append((resp["choices"][0]["message"]["content"] or "").strip())
+        return replies
+
+# ---------------- Configuration ----------------
+
+def backend_from_env() -> Optional[LLMBackend]:
+    """
+    Backend selected by environment variables, or None (use the OpenAI API):
+      CLAIMCOPILOT_LLM_BACKEND=transformers[:<model name>]
+      CLAIMCOPILOT_LLM_BACKEND=llama_cpp:<path to .gguf>
+      CLAIMCOPILOT_LLM_THREADS=<CPU threads for generation>
+    """
+    spec = os.environ.get("CLAIMCOPILOT_LLM_BACKEND")
+    if not spec:
+        return None
+    kind, _, arg = spec.partition(":")
+    threads_env = os.environ.get("CLAIMCOPILOT_LLM_THREADS")
+    threads = int(threads_env) if threads_env else None
+
+    if kind == "transformers":
+        return TransformersBackend(arg or DEFAULT_TEXT2TEXT_MODEL, threads=threads)
+    if kind == "llama_cpp":
+        if not arg:
+            raise ValueError("CLAIMCOPILOT_LLM_BACKEND=llama_cpp needs a model path: llama_cpp:/path/model.gguf")
+        return LlamaCppBackend(arg, threads=threads)
+    raise ValueError(f"Unknown LLM backend: {kind!r} (use 'transformers' or 'llama_cpp')")
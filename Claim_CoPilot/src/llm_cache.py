@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+class LLMCache:
+    """
+    Content-addressed cache for LLM responses.
+
+    Keys are a SHA-256 of (model, system, prompt, temperature[, response_format]), so the same
+    request always maps to the same entry no matter which agent / run sent it.
+    Two tiers:
+      - in-memory LRU (max_memory_entries)
+      - optional on-disk SQLite file (max_disk_entries), shared across runs
+    Entries older than ttl_seconds (if set) are treated as misses and dropped.
+    """
+
+    def __init__(
+        self,
+        path: Optional[Union[str, Path]] = None,
+        max_memory_entries: int = 1024,
+        max_disk_entries: int = 100_000,
+        ttl_seconds: Optional[float] = None,
+    ):
+        self.path = Path(path) if path else None
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, created)
+        self._lock = threading.Lock()
+        self._inserts_since_prune = 0
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        if self.path is not None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        """
+        Build a disk-backed cache from CLAIMCOPILOT_LLM_CACHE (a .sqlite path)
+        and optional CLAIMCOPILOT_LLM_CACHE_TTL (seconds). None if not configured.
+        """
+        path = os.environ.get("CLAIMCOPILOT_LLM_CACHE")
+        if not path:
+            return None
+        ttl = os.environ.get("CLAIMCOPILOT_LLM_CACHE_TTL")
+        return cls(path, ttl_seconds=float(ttl) if ttl else None)
+
+    @staticmethod
+    def make_key(
+        model: str,
+        system: str,
+        prompt: str,
+        temperature: float,
+        response_format: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        parts: List[Any] = [model, system, prompt, temperature]
+        if response_format is not None:
+            # Only appended when set, so existing cache keys stay valid
+            parts.append(response_format)
+        payload = json.dumps(parts, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            # ---------------- Memory tier ----------------
+            item = self._memory.get(key)
+            if item is not None:
+                value, created = item
+                if not self._expired(created):
+                    self._memory.move_to_end(key)
+                    self.hits_memory += 1
+                    return value
+                del self._memory[key]
+
+            # ---------------- Disk tier ----------------
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    value, created = row
+                    if not self._expired(created):
+                        self._db.execute(
+                            "UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key)
+                        )
+                        self._db.commit()
+                        self._remember(key, value, created)
+                        self.hits_disk += 1
+                        return value
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._inserts_since_prune += 1
+                # Counting rows on every insert is wasteful; prune in small batches
+                if self._inserts_since_prune >= 100:
+                    self._prune_disk()
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, created: float) -> None:
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune_disk(self) -> None:
+        """
+        Drop expired rows, then least recently accessed rows above max_disk_entries.
+        Caller holds the lock.
+        """
+        self._inserts_since_prune = 0
+        if self.ttl_seconds is not None:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM responses").fetchone()
+        extra = count - self.max_disk_entries
+        if extra > 0:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)",
+                (extra,),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.hits_memory + self.hits_disk
+        total = hits + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": 0.0 if total == 0 else hits / total,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._prune_disk()
+                self._db.commit()
+                self._db.close()
+                self._db = None
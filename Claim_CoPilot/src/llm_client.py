@@ -1,35 +1,511 @@
+import asyncio
+import contextvars
 import os
-from typing import Optional
-from openai import OpenAI
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from llm_backends import LLMBackend, backend_from_env
+from llm_cache import LLMCache
+from prompting import count_tokens
+from metrics import record_llm_cached, record_llm_call, record_llm_error, record_llm_retry
+
+if TYPE_CHECKING:
+   # The SDK takes most of a second to import; it's loaded on the first real request
+   from openai import OpenAI
+
+class TokenBucket:
+   """
+   Thread-safe token bucket refilled at `per_minute` units per minute.
+
+   reserve(n) takes n units right away (the balance may go negative) and returns
+   how long the caller should wait before sending, so it works the same for
+   threads (time.sleep) and coroutines (asyncio.sleep).
+   """
+   def __init__(self, per_minute: float):
+       self.rate = per_minute / 60.0
+       self.capacity = float(per_minute)
+       self._tokens = float(per_minute)
+       self._last = time.monotonic()
+       self._lock = threading.Lock()
+
+   def reserve(self, amount: float) -> float:
+       with self._lock:
+           now = time.monotonic()
+           self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+           self._last = now
+           self._tokens -= amount
+           return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+   def refund(self, amount: float) -> None:
+       """
+       Give back (or, if negative, take) units once the real cost is known.
+       """
+       with self._lock:
+           self._tokens = min(self.capacity, self._tokens + amount)
+
 
 class LLMClient:
    """
    Simple wrapper around OpenAI chat completion.
    If OPENAI_API_KEY is not set, it falls back to a debug 'echo' behavior.
+
+   Both the blocking chat() and the async achat() use per-request timeouts,
+   jittered exponential backoff on 429 / 5xx / connection errors, and optional
+   requests-per-minute / tokens-per-minute limits. At most `max_concurrency`
+   requests are in flight per client, across all threads and event loops
+   (concurrent pipeline stages each call chat_many() on their own loop).
+
+   Pass base_url / api_key to point the client at any OpenAI-compatible server
+   (e.g. a local fake server in tests).
+
+   The openai package is imported and the clients are built on first use,
+   so creating an LLMClient (and everything importing this module) is cheap.
+
+   Responses are looked up in / stored to `cache` (an LLMCache) when given;
+   by default one is built from CLAIMCOPILOT_LLM_CACHE if that is set.
+
+   With a `backend` (an llm_backends.LLMBackend, or one configured through
+   CLAIMCOPILOT_LLM_BACKEND) replies are generated locally instead, with no
+   network calls; chat_many() then generates the whole batch in one go.
    """
-   def __init__(self, model: str = "gpt-4o-mini"):
+   # Rough completion size used to reserve TPM budget before we see the real usage
+   EXPECTED_COMPLETION_TOKENS = 256
+
+   def __init__(
+       self,
+       model: str = "gpt-4o-mini",
+       max_concurrency: int = 8,
+       timeout: float = 60.0,
+       max_retries: int = 5,
+       backoff_base: float = 0.5,
+       backoff_max: float = 30.0,
+       requests_per_minute: Optional[float] = None,
+       tokens_per_minute: Optional[float] = None,
+       base_url: Optional[str] = None,
+       api_key: Optional[str] = None,
+       cache: Optional[LLMCache] = None,
+       backend: Optional[LLMBackend] = None,
+   ):
        self.model = model
-       # Check if we actually have an OpenAI key
-       self._has_openai = bool(os.environ.get("OPENAI_API_KEY"))
-       self._client: Optional[OpenAI] = OpenAI() if self._has_openai else None
+       # Upper bound on in-flight requests, shared by chat() / achat() / chat_many()
+       # in every thread
+       self.max_concurrency = max_concurrency
+       self._slots = threading.BoundedSemaphore(max_concurrency)
+       self.timeout = timeout
+       self.max_retries = max_retries
+       self.backoff_base = backoff_base
+       self.backoff_max = backoff_max
+       self.base_url = base_url
+       self._api_key = api_key or os.environ.get("OPENAI_API_KEY")
+       self.cache = cache if cache is not None else LLMCache.from_env()
+
+       self._rpm = TokenBucket(requests_per_minute) if requests_per_minute else None
+       self._tpm = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+       # Local generation instead of the API (rate limits / retries don't apply)
+       self.backend = backend if backend is not None else backend_from_env()
+       self._backend_failed = False
+       if self.backend is not None:
+           self.model = self.backend.model_id
 
-   def chat(self, prompt: str, system: str = "", temperature: float = 0.2) -> str:
+       # Check if we actually have an OpenAI key (and should use it)
+       self._has_openai = bool(self._api_key) and self.backend is None
+       # Built by the `client` property on first use
+       self._client: Optional["OpenAI"] = None
+       self._client_lock = threading.Lock()
+
+       # Async client + semaphore are bound to the event loop they were created on.
+       # Event loops are per thread, so this state is kept per thread too.
+       self._async_local = threading.local()
+
+   @property
+   def client(self) -> Optional["OpenAI"]:
        """
-       Send a chat-style prompt to the LLM and return the response text.
-       If no API key is set, return a debug string instead (so code doesn't crash).
+       The underlying synchronous OpenAI client (None when no API key is set
+       or a local backend is used), created on first access.
        """
-       if not self._has_openai:
-           # Fallback when no key is configured
-           return f"[LLM disabled] Would have answered based on: {prompt[:200]!r}"
+       if self._client is None and self._has_openai:
+           with self._client_lock:
+               if self._client is None:
+                   from openai import OpenAI
+                   # Retries are handled here (with rate-limit awareness), not by the SDK
+                   self._client = OpenAI(
+                       api_key=self._api_key,
+                       base_url=self.base_url,
+                       timeout=self.timeout,
+                       max_retries=0,
+                   )
+       return self._client
 
+   @property
+   def enabled(self) -> bool:
+       """
+       False when replies are placeholders: no API key and no (working) local backend.
+       """
+       if self.backend is not None:
+           return not self._backend_failed
+       return self._has_openai
+
+   def warmup(self) -> None:
+       """
+       Load the local backend's model now, if there is one.
+       """
+       if self.backend is None:
+           return
+       try:
+           self.backend.warmup()
+       except Exception as e:
+           print("[LLMClient] Warning: could not warm up local backend:", e)
+
+   # ---------------- Helpers ----------------
+
+   @staticmethod
+   def _messages(prompt: str, system: str) -> List[Dict[str, str]]:
        messages = []
        if system:
            messages.append({"role": "system", "content": system})
        messages.append({"role": "user", "content": prompt})
+       return messages
+
+   @staticmethod
+   def _disabled_reply(prompt: str) -> str:
+       # Fallback when no key is configured
+       return f"[LLM disabled] Would have answered based on: {prompt[:200]!r}"
+
+   def _estimate_tokens(self, messages: List[Dict[str, str]]) -> int:
+       # Local tokenizer when available (~4 characters per token otherwise)
+       prompt_tokens = sum(count_tokens(m["content"], self.model) for m in messages)
+       return prompt_tokens + self.EXPECTED_COMPLETION_TOKENS
+
+   def _cache_key(
+       self,
+       prompt: str,
+       system: str,
+       temperature: float,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> Optional[str]:
+       if self.cache is None:
+           return None
+       return LLMCache.make_key(self.model, system, prompt, temperature, response_format)
+
+   @staticmethod
+   def _extra_params(response_format: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+       # Optional request fields are only sent when set
+       return {"response_format": response_format} if response_format is not None else {}
+
+   def _rate_limit_delay(self, estimated_tokens: int) -> float:
+       delay = 0.0
+       if self._rpm is not None:
+           delay = max(delay, self._rpm.reserve(1))
+       if self._tpm is not None:
+           delay = max(delay, self._tpm.reserve(estimated_tokens))
+       return delay
+
+   def _settle_tokens(self, resp: Any, estimated_tokens: int) -> None:
+       # Correct the TPM reservation with the real usage reported by the API
+       usage = getattr(resp, "usage", None)
+       if self._tpm is not None and usage is not None and usage.total_tokens is not None:
+           self._tpm.refund(estimated_tokens - usage.total_tokens)
+
+   def _retry_delay(self, exc: Exception, attempt: int) -> Optional[float]:
+       """
+       Seconds to wait before retrying after `exc`, or None if we should give up.
+       Retries 429, 5xx, timeouts and connection errors; honors Retry-After.
+       """
+       if attempt >= self.max_retries:
+           return None
+       import openai
+
+       if isinstance(exc, openai.APIStatusError):
+           if exc.status_code != 429 and exc.status_code < 500:
+               return None
+       elif not isinstance(exc, (openai.APITimeoutError, openai.APIConnectionError)):
+           return None
+
+       # Full jitter: uniform(0, min(max, base * 2^attempt))
+       delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+       response = getattr(exc, "response", None)
+       retry_after = response.headers.get("retry-after") if response is not None else None
+       if retry_after:
+           try:
+               delay = max(delay, min(self.backoff_max, float(retry_after)))
+           except ValueError:
+               pass
+       return delay
+
+   async def _acquire_slot(self) -> None:
+       # The slots are shared with other threads / event loops: poll instead of
+       # blocking this loop
+       delay = 0.001
+       while not self._slots.acquire(blocking=False):
+           await asyncio.sleep(delay)
+           delay = min(delay * 2, 0.05)
+
+   async def _acreate(self, client: Any, **kwargs: Any) -> Any:
+       # One request on the async client, holding one of the shared slots
+       await self._acquire_slot()
+       try:
+           return await client.chat.completions.create(**kwargs)
+       finally:
+           self._slots.release()
+
+   def _get_async(self):
+       """
+       AsyncOpenAI client and semaphore for the running event loop
+       (recreated if chat_many() / asyncio.run() started a new loop).
+       """
+       local = self._async_local
+       loop = asyncio.get_running_loop()
+       if getattr(local, "loop", None) is not loop:
+           from openai import AsyncOpenAI
+
+           local.loop = loop
+           local.client = AsyncOpenAI(
+               api_key=self._api_key,
+               base_url=self.base_url,
+               timeout=self.timeout,
+               max_retries=0,
+           )
+           local.semaphore = asyncio.Semaphore(self.max_concurrency)
+       return local.client, local.semaphore
+
+   def _backend_generate(
+       self,
+       prompts: List[str],
+       system: str,
+       temperature: float,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> List[str]:
+       # Cached prompts are answered directly; the rest go to the backend as one batch
+       replies: List[Optional[str]] = [None] * len(prompts)
+       keys = [self._cache_key(p, system, temperature, response_format) for p in prompts]
+       todo = []
+       for i, key in enumerate(keys):
+           cached = self.cache.get(key) if key is not None else None
+           if cached is not None:
+               record_llm_cached(self.model)
+               replies[i] = cached
+           else:
+               todo.append(i)
+       if not todo:
+           return replies
+
+       generated = None
+       if not self._backend_failed:
+           started = time.perf_counter()
+           try:
+               generated = self.backend.generate(
+                   [prompts[i] for i in todo], system=system,
+                   temperature=temperature, response_format=response_format,
+               )
+           except Exception as e:
+               # Fallback: behave like the disabled client instead of crashing
+               print("[LLMClient] Warning: local backend failed:", e)
+               self._backend_failed = True
+               record_llm_error(self.model)
+           else:
+               per_reply = (time.perf_counter() - started) / len(todo)
+               for _ in todo:
+                   record_llm_call(self.model, per_reply)
+
+       for n, i in enumerate(todo):
+           if generated is None:
+               replies[i] = self._disabled_reply(prompts[i])
+               continue
+           replies[i] = generated[n]
+           if keys[i] is not None:
+               self.cache.set(keys[i], generated[n])
+       return replies
+
+   async def _achat_many_and_close(
+       self,
+       prompts: List[str],
+       system: str,
+       temperature: float,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> List[str]:
+       # Used with asyncio.run(): close the async client before its loop goes away
+       try:
+           return await self.achat_many(
+               prompts, system=system, temperature=temperature, response_format=response_format
+           )
+       finally:
+           client = getattr(self._async_local, "client", None)
+           self._async_local.loop = None
+           self._async_local.client = None
+           if client is not None:
+               await client.close()
+
+   # ---------------- Public API ----------------
+
+   def chat(
+       self,
+       prompt: str,
+       system: str = "",
+       temperature: float = 0.2,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> str:
+       """
+       Send a chat-style prompt to the LLM and return the response text.
+       If no API key is set, return a debug string instead (so code doesn't crash).
+       response_format is passed through to the API, e.g. {"type": "json_object"}.
+       """
+       if self.backend is not None:
+           return self._backend_generate([prompt], system, temperature, response_format)[0]
+       if not self._has_openai:
+           return self._disabled_reply(prompt)
+
+       key = self._cache_key(prompt, system, temperature, response_format)
+       if key is not None:
+           cached = self.cache.get(key)
+           if cached is not None:
+               record_llm_cached(self.model)
+               return cached
+
+       messages = self._messages(prompt, system)
+       estimated = self._estimate_tokens(messages)
+       attempt = 0
+       started = time.perf_counter()
+       while True:
+           delay = self._rate_limit_delay(estimated)
+           if delay:
+               time.sleep(delay)
+           try:
+               with self._slots:
+                   resp = self.client.chat.completions.create(
+                       model=self.model,
+                       messages=messages,
+                       temperature=temperature,
+                       **self._extra_params(response_format),
+                   )
+           except Exception as e:
+               delay = self._retry_delay(e, attempt)
+               if delay is None:
+                   record_llm_error(self.model)
+                   raise
+               record_llm_retry(self.model)
+               attempt += 1
+               time.sleep(delay)
+               continue
+           self._settle_tokens(resp, estimated)
+           record_llm_call(self.model, time.perf_counter() - started, getattr(resp, "usage", None))
+           content = resp.choices[0].message.content
+           if key is not None and content is not None:
+               self.cache.set(key, content)
+           return content
+
+   async def achat(
+       self,
+       prompt: str,
+       system: str = "",
+       temperature: float = 0.2,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> str:
+       """
+       Async version of chat(). At most `max_concurrency` requests are in flight
+       at once (for the whole client); rate limits and retries work as in chat().
+       """
+       if self.backend is not None:
+           # Local generation is blocking: keep the event loop free
+           replies = await asyncio.to_thread(
+               self._backend_generate, [prompt], system, temperature, response_format
+           )
+           return replies[0]
+       if not self._has_openai:
+           return self._disabled_reply(prompt)
+
+       key = self._cache_key(prompt, system, temperature, response_format)
+       if key is not None:
+           cached = self.cache.get(key)
+           if cached is not None:
+               record_llm_cached(self.model)
+               return cached
+
+       client, semaphore = self._get_async()
+       messages = self._messages(prompt, system)
+       estimated = self._estimate_tokens(messages)
+       async with semaphore:
+           attempt = 0
+           started = time.perf_counter()
+           while True:
+               delay = self._rate_limit_delay(estimated)
+               if delay:
+                   await asyncio.sleep(delay)
+               try:
+                   resp = await self._acreate(
+                       client,
+                       model=self.model,
+                       messages=messages,
+                       temperature=temperature,
+                       **self._extra_params(response_format),
+                   )
+               except Exception as e:
+                   delay = self._retry_delay(e, attempt)
+                   if delay is None:
+                       record_llm_error(self.model)
+                       raise
+                   record_llm_retry(self.model)
+                   attempt += 1
+                   await asyncio.sleep(delay)
+                   continue
+               self._settle_tokens(resp, estimated)
+               record_llm_call(self.model, time.perf_counter() - started, getattr(resp, "usage", None))
+               content = resp.choices[0].message.content
+               if key is not None and content is not None:
+                   self.cache.set(key, content)
+               return content
+
+   async def achat_many(
+       self,
+       prompts: List[str],
+       system: str = "",
+       temperature: float = 0.2,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> List[str]:
+       """
+       Run achat() for every prompt concurrently; replies keep the input order.
+       """
+       return list(await asyncio.gather(
+           *(self.achat(p, system=system, temperature=temperature, response_format=response_format)
+             for p in prompts)
+       ))
+
+   def chat_many(
+       self,
+       prompts: List[str],
+       system: str = "",
+       temperature: float = 0.2,
+       response_format: Optional[Dict[str, Any]] = None,
+   ) -> List[str]:
+       """
+       Send many prompts (same system / temperature) concurrently.
+       Returns the replies in the same order as `prompts`.
+       """
+       if not prompts:
+           return []
+       if self.backend is not None:
+           return self._backend_generate(prompts, system, temperature, response_format)
+       if not self._has_openai:
+           return [self._disabled_reply(p) for p in prompts]
+
+       try:
+           asyncio.get_running_loop()
+       except RuntimeError:
+           # No loop in this thread (normal scripts / worker threads): use asyncio
+           return asyncio.run(self._achat_many_and_close(prompts, system, temperature, response_format))
 
-       resp = self._client.chat.completions.create(
-           model=self.model,
-           messages=messages,
-           temperature=temperature,
-       )
-       return resp.choices[0].message.content
+       # Already inside an event loop (e.g. Jupyter): fall back to threads.
+       # Each call runs in a copy of our context so per-stage metrics still apply.
+       workers = min(self.max_concurrency, len(prompts))
+       contexts = [contextvars.copy_context() for _ in prompts]
+       with ThreadPoolExecutor(max_workers=workers) as pool:
+           return list(pool.map(
+               lambda ctx, p: ctx.run(
+                   self.chat, p, system=system, temperature=temperature, response_format=response_format
+               ),
+               contexts, prompts,
+           ))
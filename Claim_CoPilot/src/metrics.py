@@ -0,0 +1,440 @@
+import atexit
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# ---------------- Metric types ----------------
+
+LabelValues = Tuple[str, ...]
+
+# Seconds; covers regex-only stages (sub-ms) up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """
+    Monotonically increasing value per label combination.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(str(labels.get(n, "")) for n in self.labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labels, key)} {_format_value(v)}"
+            for key, v in items
+        ]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {",".join(k): v for k, v in self._values.items()}
+
+
+class Gauge(Counter):
+    """
+    Value per label combination that can go up and down (queue depth, ...).
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram (Prometheus style) per label combination.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(n, "")) for n in self.labels)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._values.items())
+        lines = []
+        for key, row in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {_format_value(cumulative)}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(row[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {_format_value(row[-1])}")
+        return lines
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                ",".join(k): {"count": v[-1], "sum": v[-2]}
+                for k, v in self._values.items()
+            }
+
+# ---------------- Registry ----------------
+
+class MetricsRegistry:
+    """
+    In-process registry of counters / histograms.
+    render() produces the Prometheus text exposition format; snapshot()
+    returns the same numbers as plain dicts.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Any) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: m.snapshot() for name, m in list(self._metrics.items())}
+
+
+# Single shared registry for the whole process
+METRICS = MetricsRegistry()
+
+AGENT_RUNS = METRICS.counter(
+    "claimcopilot_agent_claims_total", "Claims processed per agent", ("agent", "mode"))
+AGENT_ERRORS = METRICS.counter(
+    "claimcopilot_agent_errors_total", "Agent calls that raised", ("agent", "mode"))
+AGENT_SECONDS = METRICS.histogram(
+    "claimcopilot_agent_seconds", "Wall time per agent call (one claim or one batch)", ("agent", "mode"))
+LLM_REQUESTS = METRICS.counter(
+    "claimcopilot_llm_requests_total", "LLM completions by outcome (ok / cached / batch / error)", ("model", "outcome"))
+LLM_RETRIES = METRICS.counter(
+    "claimcopilot_llm_retries_total", "Retried LLM attempts (429 / 5xx / timeouts)", ("model",))
+LLM_SECONDS = METRICS.histogram(
+    "claimcopilot_llm_seconds", "LLM request latency including retries", ("model",))
+LLM_TOKENS = METRICS.counter(
+    "claimcopilot_llm_tokens_total", "Tokens reported by the LLM API", ("model", "kind"))
+
+
+def render_prometheus() -> str:
+    return METRICS.render()
+
+# ---------------- Per-stage LLM usage ----------------
+
+class StageUsage:
+    """
+    LLM usage accumulated while one agent call is running. LLMClient adds to
+    the usage of the current stage (a contextvar, so concurrent stages on
+    other threads / tasks don't mix their numbers).
+    """
+    __slots__ = ("requests", "cached", "prompt_tokens", "completion_tokens", "seconds", "_lock")
+
+    def __init__(self):
+        self.requests = 0
+        self.cached = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "llm_requests": self.requests,
+            "llm_cached": self.cached,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "llm_ms": round(self.seconds * 1000.0, 3),
+        }
+
+
+_STAGE: contextvars.ContextVar[Optional[Tuple[Any, StageUsage]]] = contextvars.ContextVar(
+    "claimcopilot_stage", default=None
+)
+
+
+def current_usage() -> Optional[StageUsage]:
+    stage = _STAGE.get()
+    return None if stage is None else stage[1]
+
+
+def record_llm_call(model: str, seconds: float, usage: Any = None) -> None:
+    """
+    Called by LLMClient after a successful completion. `usage` is the API
+    response's usage object (prompt_tokens / completion_tokens), if any.
+    """
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+    LLM_REQUESTS.inc(model=model, outcome="ok")
+    LLM_SECONDS.observe(seconds, model=model)
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+    stage = current_usage()
+    if stage is not None:
+        with stage._lock:
+            stage.requests += 1
+            stage.prompt_tokens += prompt_tokens
+            stage.completion_tokens += completion_tokens
+            stage.seconds += seconds
+
+
+def record_llm_batch_result(model: str, usage: Any = None) -> None:
+    """
+    Called for every answer that came back through the Batch API. `usage` is
+    the usage dict of that answer (latency is meaningless here, so not recorded).
+    """
+    usage = usage or {}
+    LLM_REQUESTS.inc(model=model, outcome="batch")
+    LLM_TOKENS.inc(int(usage.get("prompt_tokens") or 0), model=model, kind="prompt")
+    LLM_TOKENS.inc(int(usage.get("completion_tokens") or 0), model=model, kind="completion")
+
+
+def record_llm_cached(model: str) -> None:
+    LLM_REQUESTS.inc(model=model, outcome="cached")
+    stage = current_usage()
+    if stage is not None:
+        with stage._lock:
+            stage.cached += 1
+
+
+def record_llm_error(model: str) -> None:
+    LLM_REQUESTS.inc(model=model, outcome="error")
+
+
+def record_llm_retry(model: str) -> None:
+    LLM_RETRIES.inc(model=model)
+
+# ---------------- Optional per-stage profiler ----------------
+
+class StageProfiler:
+    """
+    Profiles agent calls with cProfile or pyinstrument and writes one report per
+    agent to `output_dir` (<agent>.prof for cProfile, <agent>.txt for pyinstrument).
+
+    Profiled calls are serialized (only one profiler can be active at a time),
+    so turn this on for diagnosis, not in production.
+    """
+
+    def __init__(self, kind: str = "cprofile", output_dir: str = "outputs/profiles", agents: Optional[Sequence[str]] = None):
+        if kind not in ("cprofile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler: {kind!r} (use 'cprofile' or 'pyinstrument')")
+        self.kind = kind
+        self.output_dir = Path(output_dir)
+        self.agents = set(agents) if agents else None
+        self._stats: Dict[str, Any] = {}
+        self._lock = threading.RLock()
+
+    def wants(self, agent_name: str) -> bool:
+        return self.agents is None or agent_name in self.agents
+
+    @contextmanager
+    def profile(self, agent_name: str) -> Iterator[None]:
+        with self._lock:
+            if self.kind == "cprofile":
+                import cProfile
+                import pstats
+
+                prof = cProfile.Profile()
+                prof.enable()
+                try:
+                    yield
+                finally:
+                    prof.disable()
+                    existing = self._stats.get(agent_name)
+                    if existing is None:
+                        self._stats[agent_name] = pstats.Stats(prof)
+                    else:
+                        existing.add(prof)
+            else:
+                from pyinstrument import Profiler  # type: ignore
+
+                prof = Profiler()
+                prof.start()
+                try:
+                    yield
+                finally:
+                    prof.stop()
+                    self._stats.setdefault(agent_name, []).append(prof.output_text())
+
+    def dump(self) -> List[str]:
+        """
+        Write the collected reports; returns the written paths.
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        with self._lock:
+            for agent_name, stats in self._stats.items():
+                if self.kind == "cprofile":
+                    path = self.output_dir / f"{agent_name}.prof"
+                    stats.dump_stats(str(path))
+                else:
+                    path = self.output_dir / f"{agent_name}.txt"
+                    path.write_text("\n".join(stats), encoding="utf-8")
+                paths.append(str(path))
+        return paths
+
+
+_PROFILER: Optional[StageProfiler] = None
+
+
+def set_stage_profiler(profiler: Optional[StageProfiler]) -> None:
+    """
+    Install (or with None, remove) the profiler used for every agent call.
+    """
+    global _PROFILER
+    _PROFILER = profiler
+
+
+def get_stage_profiler() -> Optional[StageProfiler]:
+    return _PROFILER
+
+
+def profiler_from_env() -> Optional[StageProfiler]:
+    """
+    CLAIMCOPILOT_PROFILE=cprofile|pyinstrument[:output_dir] turns profiling on.
+    """
+    spec = os.environ.get("CLAIMCOPILOT_PROFILE")
+    if not spec:
+        return None
+    kind, _, output_dir = spec.partition(":")
+    return StageProfiler(kind, output_dir or "outputs/profiles")
+
+# ---------------- Agent instrumentation ----------------
+
+def _annotate(states: Sequence[Any], starts: Sequence[int], agent_name: str, info: Dict[str, Any]) -> None:
+    # Attach the numbers to the trace entries this agent call added
+    for state, start in zip(states, starts):
+        for entry in state.trace[start:]:
+            if entry.agent == agent_name:
+                entry.metrics = info
+
+
+@contextmanager
+def instrument_stage(agent: Any, mode: str, states: Sequence[Any]) -> Iterator[None]:
+    """
+    Time one agent call over `states` (run: one state, run_batch: many) and
+    record it: agent metrics in METRICS, and duration / LLM usage on the trace
+    entries the call added ("metrics" key). Nested calls of the same agent
+    (e.g. a run_batch that falls back to run per claim) are recorded once,
+    by the outermost call.
+    """
+    current = _STAGE.get()
+    if current is not None and current[0] is agent:
+        yield
+        return
+
+    usage = StageUsage()
+    token = _STAGE.set((agent, usage))
+    starts = [len(s.trace) for s in states]
+    profiler = _PROFILER
+    t0 = time.perf_counter()
+    try:
+        if profiler is not None and profiler.wants(agent.name):
+            with profiler.profile(agent.name):
+                yield
+        else:
+            yield
+    except BaseException:
+        AGENT_ERRORS.inc(agent=agent.name, mode=mode)
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        _STAGE.reset(token)
+
+    AGENT_RUNS.inc(len(states), agent=agent.name, mode=mode)
+    AGENT_SECONDS.observe(elapsed, agent=agent.name, mode=mode)
+    info = {"duration_ms": round(elapsed * 1000.0, 3)}
+    if mode == "batch":
+        # Batch numbers cover the whole batch, not one claim
+        info["batch_size"] = len(states)
+    if usage.requests or usage.cached:
+        info.update(usage.to_dict())
+    _annotate(states, starts, agent.name, info)
+
+
+# Profiling requested through the environment is written out at exit
+_ENV_PROFILER = profiler_from_env()
+if _ENV_PROFILER is not None:
+    set_stage_profiler(_ENV_PROFILER)
+    atexit.register(_ENV_PROFILER.dump)
@@ -0,0 +1,217 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from metrics import METRICS
+
+# ---------------- Metrics ----------------
+
+QUEUE_DEPTH = METRICS.gauge(
+    "claimcopilot_service_queue_depth", "Requests waiting for a micro-batch")
+QUEUE_SECONDS = METRICS.histogram(
+    "claimcopilot_service_queue_seconds", "Time a request waited in the queue before its batch started")
+BATCH_SIZE = METRICS.histogram(
+    "claimcopilot_service_batch_size", "Claims per micro-batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256))
+BATCH_SECONDS = METRICS.histogram(
+    "claimcopilot_service_batch_seconds", "Pipeline time per micro-batch")
+REJECTED = METRICS.counter(
+    "claimcopilot_service_rejected_total", "Requests refused because the queue was full")
+SPLIT_BATCHES = METRICS.counter(
+    "claimcopilot_service_split_batches_total", "Failed micro-batches re-run one item at a time")
+
+# ---------------- Scheduler ----------------
+
+class QueueFullError(RuntimeError):
+    """
+    The request queue has no room; the caller should retry later.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Request queue is full, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class MicroBatcher:
+    """
+    Groups items submitted concurrently (e.g. by HTTP requests) into batches
+    for one blocking batch function, such as Orchestrator.run_many, so the
+    NER model and the LLM stages see whole batches instead of single claims.
+
+    A batch starts as soon as `max_batch_size` items are waiting, or
+    `max_wait` seconds after its first item arrived, whichever comes first.
+    `workers` batches can run at once (each in its own thread); while they
+    run, new items collect in the queue and form the next batch.
+
+    The queue holds at most `max_queue` items. submit() refuses new items
+    beyond that with QueueFullError (backpressure) instead of letting
+    latency grow without bound.
+
+    If process_batch raises, the items of that batch are re-run one at a
+    time, so an item that breaks the pipeline fails only its own future.
+    """
+
+    def __init__(
+        self,
+        process_batch: Callable[[List[Any]], Sequence[Any]],
+        max_batch_size: int = 32,
+        max_wait: float = 0.02,
+        max_queue: int = 256,
+        workers: int = 1,
+    ):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue = max_queue
+        self.workers = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        # Smoothed batch duration, for Retry-After
+        self._batch_seconds = 1.0
+
+    async def start(self) -> None:
+        """
+        Start the scheduler tasks (call from the event loop that submits).
+        """
+        self._queue = asyncio.Queue(self.max_queue)
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="microbatch")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+
+    # ---------------- Submitting ----------------
+
+    def room(self) -> int:
+        """
+        Free places in the queue.
+        """
+        return self.max_queue - self._queue.qsize()
+
+    def retry_after(self) -> float:
+        """
+        Rough time until the queue has drained enough to take new requests.
+        """
+        batches = self._queue.qsize() / max(1, self.max_batch_size * self.workers)
+        return max(1.0, batches * self._batch_seconds)
+
+    def submit_many(self, items: Sequence[Any]) -> List["asyncio.Future[Any]"]:
+        """
+        Queue all `items` (or none of them, raising QueueFullError) and return
+        one future per item with its result.
+        """
+        if len(items) > self.room():
+            REJECTED.inc(len(items))
+            raise QueueFullError(self.retry_after())
+        loop = asyncio.get_running_loop()
+        futures = []
+        now = time.perf_counter()
+        for item in items:
+            future = loop.create_future()
+            self._queue.put_nowait((item, future, now))
+            futures.append(future)
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return futures
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Result of `item` once its batch has run.
+        """
+        return await self.submit_many([item])[0]
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "running_batches": self._running,
+            "workers": self.workers,
+        }
+
+    # ---------------- Scheduling ----------------
+
+    async def _collect(self) -> List[Tuple[Any, "asyncio.Future[Any]", float]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            # Not wait_for(): on a timeout it can drop an item get() already took
+            getter = asyncio.ensure_future(self._queue.get())
+            try:
+                await asyncio.wait({getter}, timeout=timeout)
+            finally:
+                # Also when this task is cancelled: no stray get() may take an item later
+                getter.cancel()
+            await asyncio.wait({getter})
+            if getter.cancelled():
+                break
+            # Completed before the cancel took effect: the item is ours
+            batch.append(getter.result())
+        QUEUE_DEPTH.set(self._queue.qsize())
+        # Requests whose client went away in the meantime
+        return [entry for entry in batch if not entry[1].done()]
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            if not batch:
+                continue
+            start = time.perf_counter()
+            for _, _, queued in batch:
+                QUEUE_SECONDS.observe(start - queued)
+            BATCH_SIZE.observe(len(batch))
+
+            self._running += 1
+            try:
+                outcomes = await self._run(loop, [item for item, _, _ in batch])
+            finally:
+                self._running -= 1
+            seconds = time.perf_counter() - start
+            BATCH_SECONDS.observe(seconds)
+            self._batch_seconds = 0.8 * self._batch_seconds + 0.2 * seconds
+
+            for (_, future, _), (result, error) in zip(batch, outcomes):
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    async def _run(self, loop: asyncio.AbstractEventLoop, items: List[Any]) -> List[Tuple[Any, Optional[BaseException]]]:
+        """
+        (result, error) per item. If the batch fails, its items are run again
+        one at a time, so one bad item only fails its own request.
+        """
+        try:
+            results = await loop.run_in_executor(self._executor, self.process_batch, items)
+            return [(r, None) for r in results]
+        except Exception as e:
+            if len(items) == 1:
+                return [(None, e)]
+            SPLIT_BATCHES.inc()
+
+        outcomes: List[Tuple[Any, Optional[BaseException]]] = []
+        for item in items:
+            try:
+                result = await loop.run_in_executor(self._executor, self.process_batch, [item])
+                outcomes.append((result[0], None))
+            except Exception as e:
+                outcomes.append((None, e))
+        return outcomes
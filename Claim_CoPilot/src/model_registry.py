@@ -0,0 +1,192 @@
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+# ---------------- Memory helpers ----------------
+
+def current_rss_mb() -> Optional[float]:
+    """
+    Resident set size of this process in MB, or None if it can't be read.
+    Uses psutil when installed, then /proc (Linux), then ru_maxrss as a last resort.
+    """
+    try:
+        import psutil  # type: ignore
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/statm", "r") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except Exception:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size of this process in MB (None on platforms without `resource`).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+# ---------------- Registry ----------------
+
+class ModelRegistry:
+    """
+    Process-wide cache of heavy models (NER pipelines, tokenizers, ...).
+
+    Each model is identified by a hashable key and built at most once per process
+    by the loader passed to get(). Loading is thread-safe: concurrent callers asking
+    for the same key wait for the first load instead of loading it again.
+    Load time and RSS growth are recorded for every model.
+    """
+
+    def __init__(self):
+        self._models: Dict[Hashable, Any] = {}
+        self._stats: Dict[Hashable, Dict[str, Any]] = {}
+        self._locks: Dict[Hashable, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        Return the model stored under `key`, calling `loader()` the first time.
+        Exceptions from the loader propagate and nothing is cached, so a later
+        call can retry.
+        """
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock_for(key):
+            # Another thread may have finished loading while we waited
+            model = self._models.get(key)
+            if model is not None:
+                return model
+
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            model = loader()
+            load_seconds = time.perf_counter() - start
+            rss_after = current_rss_mb()
+
+            self._stats[key] = {
+                "load_seconds": round(load_seconds, 3),
+                "rss_before_mb": None if rss_before is None else round(rss_before, 1),
+                "rss_after_mb": None if rss_after is None else round(rss_after, 1),
+                "rss_delta_mb": (
+                    None if rss_before is None or rss_after is None
+                    else round(rss_after - rss_before, 1)
+                ),
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            self._models[key] = model
+            return model
+
+    def is_loaded(self, key: Hashable) -> bool:
+        return key in self._models
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Load time / memory report for every model loaded so far.
+        """
+        return {str(k): dict(v) for k, v in self._stats.items()}
+
+    def clear(self) -> None:
+        """
+        Drop all cached models (mainly useful for tests and notebooks).
+        """
+        with self._guard:
+            self._models.clear()
+            self._stats.clear()
+            self._locks.clear()
+
+
+# Single shared registry for the whole process
+REGISTRY = ModelRegistry()
+
+
+# ---------------- Known models ----------------
+
+NER_MODEL = "dslim/bert-base-NER"
+
+
+def get_ner_pipeline(model: str = NER_MODEL, aggregation_strategy: str = "simple") -> Any:
+    """
+    Shared Hugging Face NER pipeline. The first call loads the weights,
+    every later call (from any agent / Orchestrator / thread) reuses them.
+    """
+    def _load():
+        from transformers import pipeline
+        return pipeline(
+            "ner",
+            model=model,
+            aggregation_strategy=aggregation_strategy,
+        )
+
+    return REGISTRY.get(("ner", model, aggregation_strategy), _load)
+
+
+def ner_loaded(model: str = NER_MODEL, aggregation_strategy: str = "simple") -> bool:
+    """
+    True if get_ner_pipeline() with these arguments has loaded successfully
+    (never triggers a load itself).
+    """
+    return REGISTRY.is_loaded(("ner", model, aggregation_strategy))
+
+
+def warmup_local_llm() -> None:
+    """
+    Load the local LLM backend configured via CLAIMCOPILOT_LLM_BACKEND, if any.
+    """
+    from llm_backends import backend_from_env
+
+    backend = backend_from_env()
+    if backend is not None:
+        backend.warmup()
+
+
+def warmup(models: Iterable[str] = ("ner", "llm"), verbose: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the given models up front (e.g. at CLI / worker startup) so the
+    first claim doesn't pay the loading cost. Returns REGISTRY.stats().
+    Failures are reported, not raised, so callers can fall back gracefully.
+    "llm" is the local backend from CLAIMCOPILOT_LLM_BACKEND (no-op when unset).
+    """
+    loaders = {
+        "ner": get_ner_pipeline,
+        "llm": warmup_local_llm,
+    }
+    for name in models:
+        loader = loaders.get(name)
+        if loader is None:
+            raise ValueError(f"Unknown model for warmup: {name!r} (known: {sorted(loaders)})")
+        try:
+            loader()
+        except Exception as e:
+            if verbose:
+                print(f"[ModelRegistry] Warning: could not warm up {name!r}:", e)
+
+    stats = REGISTRY.stats()
+    if verbose:
+        for key, s in stats.items():
+            print(f"[ModelRegistry] {key}: loaded in {s['load_seconds']}s, "
+                  f"RSS +{s['rss_delta_mb']} MB")
+    return stats
@@ -1,31 +1,217 @@
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
 from llm_client import LLMClient
-from state import ClaimState
+from state import ClaimInput, ClaimState
+from stage_graph import StageGraph
+from agents.base import BaseAgent
 from agents.extraction import ExtractionAgent
 from agents.validation import ValidationAgent
 from agents.triage import TriageAgent
 from agents.summarization import SummarizationAgent
+from agents.review import ReviewAgent
+
+
+def default_agent_classes(combined_llm: bool = False) -> List[Type[BaseAgent]]:
+    """
+    Agent classes of the default pipeline, in run order (see Orchestrator).
+    """
+    if combined_llm:
+        return [ExtractionAgent, TriageAgent, ReviewAgent]
+    return [ExtractionAgent, ValidationAgent, TriageAgent, SummarizationAgent]
+
 
 class Orchestrator:
     """
-    Runs a list of agents over a claim until it is 'complete'.
+    Runs a set of agents over a claim.
+
+    The agents form a dependency graph (see StageGraph) built from the
+    ClaimState fields each one reads / writes. With parallel=True, agents
+    whose inputs are ready run concurrently on a small thread pool, e.g. the
+    ValidationAgent LLM call overlaps with Triage + Summarization.
+    With parallel=False agents run one by one in list order until the
+    claim is 'complete' (the original behavior).
+
+    fast_path=True makes extraction try cheap regex rules first and only call
+    the BERT NER model for claims the rules can't handle confidently.
+
+    combined_llm=True replaces the ValidationAgent + SummarizationAgent pair
+    with one ReviewAgent, which gets the QA note and the summary from a single
+    JSON-structured LLM call (falling back to the two calls when the reply
+    doesn't parse).
+
+    dedup (a dedup.IntakeIndex) checks every claim against the claims seen
+    before: duplicates / near-duplicates get an issue and a trace entry, and
+    with reuse_duplicates=True an exact duplicate whose final state the index
+    stored is answered from it without running any agent.
     """
-    def __init__(self, llm: Optional[LLMClient] = None):
+    def __init__(
+        self,
+        llm: Optional[LLMClient] = None,
+        agents: Optional[Sequence[BaseAgent]] = None,
+        parallel: bool = True,
+        fast_path: bool = False,
+        combined_llm: bool = False,
+        dedup: Optional[Any] = None,
+        reuse_duplicates: bool = False,
+    ):
         self.llm = llm or LLMClient()
-        self.agents = [
-            ExtractionAgent(self.llm),
-            ValidationAgent(self.llm),
-            TriageAgent(self.llm),
-            SummarizationAgent(self.llm),
-        ]
+        self.dedup = dedup
+        self.reuse_duplicates = reuse_duplicates
+        if agents is not None:
+            self.agents = list(agents)
+        else:
+            self.agents = [
+                cls(self.llm, fast_path=fast_path) if cls is ExtractionAgent else cls(self.llm)
+                for cls in default_agent_classes(combined_llm)
+            ]
+        self.parallel = parallel
+        self.graph = StageGraph(self.agents)
+        # Shared by every run(); stages never wait on each other inside the pool.
+        # Created by the first parallel run, shut down by close()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(
+                    max_workers=max(1, len(self.agents)),
+                    thread_name_prefix="claim-stage",
+                )
+            return self._pool
+
+    def close(self) -> None:
+        """
+        Shut down the stage thread pool (a later run starts a new one).
+        The dedup index belongs to the caller and stays open.
+        """
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def __enter__(self) -> "Orchestrator":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _intake(self, text: ClaimInput, claim_id: Optional[str]) -> Tuple[Optional[str], ClaimState, bool]:
+        """
+        New ClaimState for `text` (one text or a list of documents), checked
+        against the dedup index (if any).
+        Returns (claim id in the index, state, reused?); a reused state is final.
+        """
+        state = ClaimState.from_documents(text)
+        if self.dedup is None:
+            return claim_id, state, False
 
-    def run(self, text: str) -> ClaimState:
+        claim_id, match = self.dedup.add("\n\n".join(state.raw_texts), claim_id)
+        if match is None:
+            return claim_id, state, False
+        if match.kind == "exact" and self.reuse_duplicates:
+            stored = self.dedup.get_state(match.claim_id)
+            if stored is not None:
+                stored.raw_texts = state.raw_texts
+                # The newest copy is what later exact duplicates resolve to
+                self.dedup.set_state(claim_id, stored)
+                stored.issues.append(match.issue())
+                stored.add_trace("IntakeIndex", "reuse_duplicate", match.to_dict())
+                return claim_id, stored, True
+        state.issues.append(match.issue())
+        state.add_trace("IntakeIndex", "dedup_check", match.to_dict())
+        return claim_id, state, False
+
+    def run(self, text: ClaimInput, claim_id: Optional[str] = None) -> ClaimState:
         """
         Create a ClaimState, pass it through agents, and return the final state.
+        `text` is the claim text, or a list of its documents.
+        `claim_id` names the claim in the dedup index (one is assigned otherwise).
         """
-        state = ClaimState.from_single_text(text)
-        for agent in self.agents:
-            agent.run(state)
-            if state.is_complete():
-                break
+        claim_id, state, reused = self._intake(text, claim_id)
+        if reused:
+            return state
+
+        if self.parallel:
+            self.graph.execute(lambda agent: agent.run(state), self._get_pool())
+        else:
+            for agent in self.agents:
+                agent.run(state)
+                if state.is_complete():
+                    break
+        if self.dedup is not None:
+            self.dedup.set_state(claim_id, state)
         return state
+
+    def run_many(
+        self,
+        texts: Iterable[ClaimInput],
+        chunk_size: int = 64,
+        claim_ids: Optional[Iterable[Optional[str]]] = None,
+    ) -> List[ClaimState]:
+        """
+        Run many claims through the pipeline; see iter_run().
+        Returns the final states in input order.
+        """
+        return list(self.iter_run(texts, chunk_size=chunk_size, claim_ids=claim_ids))
+
+    def run_deferred(
+        self,
+        texts: Iterable[ClaimInput],
+        claim_ids: Optional[Iterable[Optional[str]]] = None,
+        **submitter_kwargs,
+    ) -> List[ClaimState]:
+        """
+        Like run_many(), but the LLM prompts are answered through the OpenAI
+        Batch API (cheaper, no rate-limit pressure, results within hours).
+        Keyword arguments go to batch_api.BatchSubmitter (work_dir, poll_interval, ...).
+        """
+        from batch_api import BatchSubmitter, run_deferred
+
+        return run_deferred(
+            self,
+            list(texts),
+            BatchSubmitter(self.llm, **submitter_kwargs),
+            claim_ids=None if claim_ids is None else list(claim_ids),
+        )
+
+    def iter_run(
+        self,
+        texts: Iterable[ClaimInput],
+        chunk_size: int = 64,
+        claim_ids: Optional[Iterable[Optional[str]]] = None,
+    ) -> Iterator[ClaimState]:
+        """
+        Streaming version of run_many(): reads `texts` lazily, `chunk_size` claims
+        at a time, and yields final states in input order.
+
+        Each stage runs over the whole chunk before the stages that depend on it
+        start, so extraction can batch its NER calls and the LLM stages can send
+        their requests concurrently (agent.run_batch).
+
+        `claim_ids` (parallel to `texts`) name the claims in the dedup index.
+        """
+        it = iter(texts)
+        ids = iter(claim_ids) if claim_ids is not None else None
+        while True:
+            chunk = list(islice(it, chunk_size))
+            if not chunk:
+                return
+            intake = [self._intake(t, next(ids, None) if ids is not None else None) for t in chunk]
+            states = [state for _, state, _ in intake]
+            todo = [state for _, state, reused in intake if not reused]
+            if todo and self.parallel:
+                self.graph.execute(lambda agent: agent.run_batch(todo), self._get_pool())
+            elif todo:
+                for agent in self.agents:
+                    pending = [s for s in todo if not s.is_complete()]
+                    if not pending:
+                        break
+                    agent.run_batch(pending)
+            if self.dedup is not None:
+                for claim_id, state, reused in intake:
+                    if not reused:
+                        self.dedup.set_state(claim_id, state)
+            yield from states
@@ -0,0 +1,189 @@
+import json
+from functools import lru_cache
+from typing import Any, List, Optional, Sequence, Tuple
+
+# ---------------- Shared system preamble ----------------
+
+# Identical, static prefix of every LLM agent's system prompt. Keeping it
+# first (and byte-for-byte stable) lets provider-side prompt caching reuse it;
+# everything claim-specific goes into the user message, last.
+SHARED_PREAMBLE = (
+    "You are ClaimCopilot, an assistant for insurance claim intake. "
+    "You only use the claim documents and extracted fields given in the user message "
+    "and never add facts they do not support. "
+    "Required claim fields: claimant_name, policy_type, claim_amount, incident_date. "
+    "Extracted fields are compact JSON; a missing key means the field was not found."
+)
+
+
+def system_prompt(task: str) -> str:
+    """
+    System prompt for one agent: the shared preamble, then its static task text.
+    """
+    return f"{SHARED_PREAMBLE}\n\n{task}"
+
+# ---------------- Token counting ----------------
+
+# Used when tiktoken isn't installed (or doesn't know the model)
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: Optional[str]) -> Any:
+    try:
+        import tiktoken  # type: ignore
+    except ImportError:
+        return None
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except Exception:
+            pass
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """
+    Number of tokens in `text` for `model`: exact with tiktoken, otherwise
+    estimated as ~4 characters per token.
+    """
+    if not text:
+        return 0
+    enc = _encoding(model)
+    if enc is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """
+    Shorten `text` to about `max_tokens` tokens, keeping the beginning (most of
+    the budget) and the end, with a marker where text was cut.
+    """
+    if max_tokens <= 0:
+        return ""
+    enc = _encoding(model)
+    if enc is None:
+        if len(text) <= max_tokens * CHARS_PER_TOKEN:
+            return text
+        pieces: Sequence[Any] = text
+        unit = CHARS_PER_TOKEN
+    else:
+        pieces = enc.encode(text, disallowed_special=())
+        if len(pieces) <= max_tokens:
+            return text
+        unit = 1
+
+    keep = max_tokens * unit
+    head_len = keep * 3 // 4
+    tail_len = keep - head_len
+    cut = (len(pieces) - keep) // unit
+    head, tail = pieces[:head_len], pieces[len(pieces) - tail_len:] if tail_len else pieces[:0]
+    if enc is not None:
+        head, tail = enc.decode(head), enc.decode(tail)
+    return f"{head} [... {cut} tokens omitted ...] {tail}"
+
+
+def split_to_tokens(text: str, max_tokens: int, model: Optional[str] = None) -> List[str]:
+    """
+    Cut `text` into consecutive parts of at most about `max_tokens` tokens,
+    preferring paragraph / line / word breaks near the end of each part.
+    """
+    if max_tokens <= 0 or count_tokens(text, model) <= max_tokens:
+        return [text]
+    enc = _encoding(model)
+    if enc is not None:
+        ids = enc.encode(text, disallowed_special=())
+        return [enc.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)]
+
+    size = max_tokens * CHARS_PER_TOKEN
+    parts = []
+    start = 0
+    while len(text) - start > size:
+        end = start + size
+        # Break at the last separator in the final quarter of the window, if any
+        for sep in ("\n\n", "\n", " "):
+            cut = text.rfind(sep, start + size * 3 // 4, end)
+            if cut > start:
+                end = cut + len(sep)
+                break
+        parts.append(text[start:end])
+        start = end
+    parts.append(text[start:])
+    return parts
+
+
+def fit_documents(texts: Sequence[str], budget: int, model: Optional[str] = None) -> Tuple[List[str], bool]:
+    """
+    Fit several documents into `budget` tokens. Short documents are kept whole;
+    the remaining budget is split evenly between the longer ones, which are
+    truncated. Returns (texts, truncated?).
+    """
+    sizes = [count_tokens(t, model) for t in texts]
+    if sum(sizes) <= budget:
+        return list(texts), False
+
+    # Water-filling: give every document an equal share, hand unused share
+    # of short documents to the others
+    limits = [0] * len(texts)
+    remaining = sorted(range(len(texts)), key=lambda i: sizes[i])
+    left = max(budget, 0)
+    while remaining:
+        share = left // len(remaining)
+        i = remaining[0]
+        if sizes[i] <= share:
+            limits[i] = sizes[i]
+            left -= sizes[i]
+            remaining.pop(0)
+        else:
+            for j in remaining:
+                limits[j] = share
+            break
+
+    fitted = [t if limits[i] >= sizes[i] else truncate_to_tokens(t, limits[i], model) for i, t in enumerate(texts)]
+    return fitted, True
+
+# ---------------- Compact serialization ----------------
+
+def compact_json(obj: Any) -> str:
+    """
+    Minimal JSON (no spaces, non-ASCII kept, None values in dicts dropped).
+    """
+    if isinstance(obj, dict):
+        obj = {k: v for k, v in obj.items() if v is not None}
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+# ---------------- Prompt building ----------------
+
+# The claim text never gets less than this, however large the other sections are
+MIN_TEXT_TOKENS = 64
+
+
+def claim_prompt(
+    texts: Sequence[str],
+    sections: Sequence[Tuple[str, Any]],
+    budget: int,
+    model: Optional[str] = None,
+) -> Tuple[str, int, bool]:
+    """
+    User message for one claim: the documents, then one compact-JSON line per
+    (label, value) section. The documents are truncated so the whole message
+    stays within `budget` tokens.
+
+    Returns (prompt, token count, truncated?).
+    """
+    data = "\n".join(f"{label}: {compact_json(value)}" for label, value in sections)
+    several = len(texts) > 1
+    # Labels / separators around the documents cost a few tokens each
+    overhead = count_tokens(data, model) + 4 + (6 * len(texts) if several else 0)
+    docs, truncated = fit_documents(texts, max(MIN_TEXT_TOKENS, budget - overhead), model)
+
+    if several:
+        body = "\n\n".join(f"[Document {i}]\n{t}" for i, t in enumerate(docs, 1))
+    else:
+        body = docs[0] if docs else ""
+    prompt = f"Claim text:\n{body}\n\n{data}"
+    return prompt, count_tokens(prompt, model), truncated
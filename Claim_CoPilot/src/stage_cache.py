@@ -0,0 +1,258 @@
+import hashlib
+import inspect
+import json
+import sqlite3
+import sys
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Type, Union
+
+from agents.base import BaseAgent
+from jsonl_io import dumps, loads
+from state import ClaimInput, ClaimState, TraceEntry
+
+# ---------------- Agent fingerprints ----------------
+
+# Plumbing that doesn't change what an agent produces; editing it must not
+# invalidate every cached stage
+INFRA_MODULES = {"llm_client", "llm_cache", "llm_backends", "metrics", "model_registry", "state", "jsonl_io"}
+
+SRC_DIR = Path(__file__).resolve().parent
+
+
+def _is_project_module(module: Optional[ModuleType]) -> bool:
+    path = getattr(module, "__file__", None)
+    return path is not None and SRC_DIR in Path(path).resolve().parents
+
+
+def _code_modules(agent_cls: Type[BaseAgent]) -> List[ModuleType]:
+    """
+    Modules whose source determines the agent's behavior: the modules of its
+    class hierarchy plus the project modules they use directly (e.g. the
+    text_analysis helpers or the prompting module).
+    """
+    modules: Dict[str, ModuleType] = {}
+    for cls in agent_cls.__mro__:
+        module = sys.modules.get(cls.__module__)
+        if _is_project_module(module):
+            modules[module.__name__] = module
+    for module in list(modules.values()):
+        for value in vars(module).values():
+            used = value if isinstance(value, ModuleType) else sys.modules.get(getattr(value, "__module__", "") or "")
+            if _is_project_module(used) and used.__name__ not in INFRA_MODULES:
+                modules.setdefault(used.__name__, used)
+    return [modules[name] for name in sorted(modules)]
+
+
+def _class_settings(agent_cls: Type[BaseAgent]) -> Dict[str, Any]:
+    """
+    Public, data-like class attributes of the agent: prompts, temperature,
+    model names, triage rules, ...
+    """
+    settings: Dict[str, Any] = {}
+    for cls in reversed(agent_cls.__mro__):
+        for name, value in vars(cls).items():
+            if not name.startswith("_") and not callable(value) and not isinstance(value, (property, staticmethod, classmethod)):
+                settings[name] = value
+    return settings
+
+
+def _settings(agent: BaseAgent) -> Dict[str, Any]:
+    """
+    _class_settings() plus the public instance attributes of the agent.
+    """
+    settings = _class_settings(type(agent))
+    for name, value in vars(agent).items():
+        if name.startswith("_") or name == "llm":
+            continue
+        # Sub-agents (e.g. the fallback agents of ReviewAgent) by their own fingerprint
+        settings[name] = agent_fingerprint(value) if isinstance(value, BaseAgent) else value
+    return settings
+
+
+def _fingerprint(agent_cls: Type[BaseAgent], model: Optional[str], settings: Dict[str, Any]) -> str:
+    h = hashlib.sha256()
+    h.update(agent_cls.__qualname__.encode("utf-8"))
+    for module in _code_modules(agent_cls):
+        try:
+            source = inspect.getsource(module)
+        except (OSError, TypeError):
+            source = ""
+        h.update(module.__name__.encode("utf-8"))
+        h.update(hashlib.sha256(source.encode("utf-8")).digest())
+    h.update(json.dumps([model, settings], sort_keys=True, default=str).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+
+def agent_fingerprint(agent: BaseAgent) -> str:
+    """
+    Version of an agent: a hash of its code (see _code_modules), its settings
+    and the LLM model it uses. Changes whenever any of those changes.
+    """
+    model = getattr(getattr(agent, "llm", None), "model", None)
+    return _fingerprint(type(agent), model, _settings(agent))
+
+
+def agent_class_fingerprint(agent_cls: Type[BaseAgent], model: Optional[str] = None) -> str:
+    """
+    Like agent_fingerprint(), without building the agent: code and
+    class-level settings only. Constructor arguments (e.g. fast_path) are
+    up to the caller to record.
+    """
+    return _fingerprint(agent_cls, model, _class_settings(agent_cls))
+
+# ---------------- Stage inputs / outputs ----------------
+
+try:
+    import orjson  # type: ignore
+
+    def _canonical(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS, default=str)
+except ImportError:
+    def _canonical(obj: Any) -> bytes:
+        return json.dumps(obj, sort_keys=True, default=str).encode("utf-8")
+
+
+def _field_value(state: ClaimState, field: str) -> Any:
+    return getattr(state, field)
+
+
+def stage_key(fingerprint: str, agent: BaseAgent, state: ClaimState) -> str:
+    """
+    Cache key of running `agent` on `state` now: the agent fingerprint plus
+    the current content of every field the agent reads or writes.
+    """
+    fields = sorted((set(agent.reads) | set(agent.writes)) - {"trace"})
+    inputs = {f: _field_value(state, f) for f in fields}
+    return hashlib.sha256(_canonical([fingerprint, inputs])).hexdigest()
+
+
+def stage_output(agent: BaseAgent, state: ClaimState, trace_start: int) -> bytes:
+    """
+    What the stage produced: the new value of every field it writes and the
+    trace entries it added.
+    """
+    return dumps({
+        "fields": {f: _field_value(state, f) for f in agent.writes if f != "trace"},
+        "trace": [t.to_dict() for t in state.trace[trace_start:]],
+    })
+
+
+def apply_output(state: ClaimState, output: bytes) -> None:
+    data = loads(output)
+    for field, value in data["fields"].items():
+        setattr(state, field, value)
+    state.trace.extend(TraceEntry.from_dict(t) for t in data["trace"])
+
+# ---------------- Cache ----------------
+
+class StageCache:
+    """
+    SQLite store of per-agent outputs, keyed by stage_key(). Lets a pipeline
+    re-run only the stages whose code, settings or inputs changed: after a
+    triage rule tweak only TriageAgent (and whatever reads its output) runs
+    again, and extraction / LLM stages are served from here.
+    """
+
+    def __init__(self, path: Union[str, Path] = "outputs/stage_cache.sqlite"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS stage_outputs ("
+            " key TEXT PRIMARY KEY, agent TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+            " value BLOB NOT NULL, created REAL NOT NULL)"
+        )
+        self._db.commit()
+        # agent name -> [hits, misses]
+        self.counts: Dict[str, List[int]] = {}
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, bytes]:
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for key, value in self._db.execute(
+                    f"SELECT key, value FROM stage_outputs WHERE key IN ({marks})", part
+                ):
+                    found[key] = value
+        return found
+
+    def set_many(self, agent: str, fingerprint: str, items: Iterable[Tuple[str, bytes]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO stage_outputs (key, agent, fingerprint, value, created) VALUES (?, ?, ?, ?, ?)",
+                [(key, agent, fingerprint, value, now) for key, value in items],
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM stage_outputs")
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {agent: {"hits": h, "misses": m} for agent, (h, m) in self.counts.items()}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def run_incremental(
+    orchestrator: Any,
+    texts: Iterable[ClaimInput],
+    cache: StageCache,
+    chunk_size: int = 256,
+) -> Iterator[ClaimState]:
+    """
+    Orchestrator.iter_run() through a StageCache: for each chunk, every agent
+    (in graph order) is applied from the cache where its key is known and run
+    with run_batch() on the remaining claims only, whose outputs are stored.
+    Yields the final states in input order.
+
+    Stages run one after the other (not in parallel) so the trace entries of
+    each stage can be captured for the cache. Outputs of agents running in
+    fallback mode (agent.degraded()) are not stored.
+    """
+    fingerprints = [agent_fingerprint(agent) for agent in orchestrator.agents]
+    it = iter(texts)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        states = [ClaimState.from_documents(t) for t in chunk]
+
+        for agent, fingerprint in zip(orchestrator.agents, fingerprints):
+            keys = [stage_key(fingerprint, agent, s) for s in states]
+            found = cache.get_many(keys)
+            todo = [i for i, key in enumerate(keys) if key not in found]
+            counts = cache.counts.setdefault(agent.name, [0, 0])
+            counts[0] += len(states) - len(todo)
+            counts[1] += len(todo)
+
+            for state, key in zip(states, keys):
+                if key in found:
+                    apply_output(state, found[key])
+            if not todo:
+                continue
+
+            starts = [len(states[i].trace) for i in todo]
+            agent.run_batch([states[i] for i in todo])
+            # Fallback output (no API key, NER not loadable) would be replayed
+            # once the model is available again
+            if agent.degraded():
+                continue
+            cache.set_many(agent.name, fingerprint, (
+                (keys[i], stage_output(agent, states[i], start)) for i, start in zip(todo, starts)
+            ))
+
+        yield from states
@@ -0,0 +1,82 @@
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, wait
+from typing import Callable, Dict, List, Sequence, Set
+
+from agents.base import BaseAgent
+
+# Append-only log every agent writes to; it never orders stages
+IGNORED_FIELDS = {"trace"}
+
+
+class StageGraph:
+    """
+    Dependency graph over a list of agents, derived from the ClaimState
+    fields each agent declares in `reads` / `writes`.
+
+    Agent B depends on an earlier agent A (in list order) when
+      - B reads a field A writes (read-after-write),
+      - B writes a field A reads (write-after-read), or
+      - both write the same field (write-after-write).
+    Everything else may run concurrently.
+    """
+
+    def __init__(self, agents: Sequence[BaseAgent]):
+        self.agents = list(agents)
+        self.deps: Dict[int, Set[int]] = {}
+        for j, later in enumerate(self.agents):
+            r_j = set(later.reads) - IGNORED_FIELDS
+            w_j = set(later.writes) - IGNORED_FIELDS
+            self.deps[j] = set()
+            for i in range(j):
+                r_i = set(self.agents[i].reads) - IGNORED_FIELDS
+                w_i = set(self.agents[i].writes) - IGNORED_FIELDS
+                if (w_i & r_j) or (w_j & r_i) or (w_i & w_j):
+                    self.deps[j].add(i)
+
+    def describe(self) -> Dict[str, List[str]]:
+        """
+        {agent name: [names of agents it waits for]} (handy for logging / notebooks).
+        """
+        return {
+            self.agents[j].name: [self.agents[i].name for i in sorted(deps)]
+            for j, deps in self.deps.items()
+        }
+
+    def execute(self, call: Callable[[BaseAgent], None], executor: Executor) -> None:
+        """
+        Run `call(agent)` for every agent, each as soon as all its dependencies
+        finished. Independent agents run concurrently on `executor`; when only one
+        agent is ready and nothing else is running it runs inline in this thread.
+        The first exception raised by any stage is re-raised here, once the
+        stages still running (on the same state) have finished; stages that
+        haven't started yet are cancelled.
+        """
+        done: Set[int] = set()
+        started: Set[int] = set()
+        running: Dict[Future, int] = {}
+
+        while len(done) < len(self.agents):
+            ready = [
+                j for j in range(len(self.agents))
+                if j not in started and self.deps[j] <= done
+            ]
+
+            if len(ready) == 1 and not running:
+                j = ready[0]
+                started.add(j)
+                call(self.agents[j])
+                done.add(j)
+                continue
+
+            for j in ready:
+                started.add(j)
+                running[executor.submit(call, self.agents[j])] = j
+
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for fut in finished:
+                j = running.pop(fut)
+                if fut.exception() is not None:
+                    for other in running:
+                        other.cancel()
+                    wait(list(running))
+                    fut.result()  # re-raise the stage error
+                done.add(j)
@@ -1,11 +1,100 @@
 import json
+import math
+import sys
 import time
-from typing import Any, Dict, List, Optional
+from array import array
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from text_analysis import TextAnalysis
+
+# Fields every complete claim needs (interned: used as dict keys on every claim)
+REQUIRED_FIELDS = tuple(
+    sys.intern(f) for f in ("claimant_name", "policy_type", "claim_amount", "incident_date")
+)
+
+# One claim as given to the pipeline: a single text or a list of documents
+ClaimInput = Union[str, Sequence[str]]
+
+# Wall-clock time of monotonic() == 0, taken once per process. Trace entries
+# store a cheap monotonic reading and only format a timestamp when asked.
+_WALL_ANCHOR = time.time() - time.monotonic()
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+@lru_cache(maxsize=4096)
+def _parse_timestamp(timestamp: str) -> float:
+    # Trace entries of a run share few distinct timestamps; strptime is slow
+    return time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT))
+
+
+class TraceEntry:
+    """
+    One step in ClaimState.trace. Behaves like the old trace dicts
+    (entry["timestamp"], entry["agent"], ...) but stores the time as a
+    monotonic reading and renders the timestamp string lazily.
+
+    `metrics` is filled in by the agent instrumentation (see metrics.py):
+    duration_ms of the agent call and, for LLM agents, requests / tokens.
+    """
+    __slots__ = ("agent", "action", "info", "mono", "metrics")
+
+    KEYS = ("timestamp", "agent", "action", "info")
+
+    def __init__(
+        self,
+        agent: str,
+        action: str,
+        info: Dict[str, Any],
+        mono: Optional[float] = None,
+        metrics: Optional[Dict[str, Any]] = None,
+    ):
+        self.agent = sys.intern(agent)
+        self.action = sys.intern(action)
+        self.info = info
+        self.mono = time.monotonic() if mono is None else mono
+        self.metrics = metrics
+
+    @property
+    def timestamp(self) -> str:
+        return time.strftime(TIMESTAMP_FORMAT, time.localtime(_WALL_ANCHOR + self.mono))
+
+    def keys(self):
+        return self.KEYS if self.metrics is None else self.KEYS + ("metrics",)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.keys():
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self.keys() else default
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: getattr(self, k) for k in self.keys()}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TraceEntry":
+        """
+        Inverse of to_dict() (the timestamp has one-second resolution).
+        """
+        mono = None
+        if data.get("timestamp"):
+            mono = _parse_timestamp(data["timestamp"]) - _WALL_ANCHOR
+        return cls(data["agent"], data["action"], data.get("info") or {}, mono, data.get("metrics"))
+
+    def __repr__(self) -> str:
+        return f"TraceEntry({self.to_dict()!r})"
+
 
 class ClaimState:
     """
     Shared state for one insurance claim as it moves through the agents.
+    Uses __slots__ so hundreds of thousands of in-flight states stay small.
     """
+    __slots__ = ("raw_texts", "extracted_fields", "triage", "summary", "issues", "trace", "_analysis")
+
     def __init__(self, raw_texts: List[str]):
         # Original text(s) for this claim (e.g., combined from multiple docs)
         self.raw_texts: List[str] = raw_texts
@@ -23,7 +112,10 @@ class ClaimState:
         self.issues: List[str] = []
 
         # Trace of what each agent did (for explainability)
-        self.trace: List[Dict[str, Any]] = []
+        self.trace: List[TraceEntry] = []
+
+        # Cached TextAnalysis per document index (None = all documents joined)
+        self._analysis: Dict[Optional[int], Any] = {}
 
     @classmethod
     def from_single_text(cls, text: str) -> "ClaimState":
@@ -32,16 +124,52 @@ class ClaimState:
         """
         return cls([text])
 
+    @classmethod
+    def from_documents(cls, documents: "ClaimInput") -> "ClaimState":
+        """
+        ClaimState for one claim given as a text or as a list of documents
+        (claim form, police report, medical bills, ...).
+        """
+        return cls([documents] if isinstance(documents, str) else list(documents))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClaimState":
+        """
+        Rebuild a ClaimState from to_dict() output (e.g. a result sent back by
+        the claim daemon or read from a results file).
+        """
+        state = cls(list(data.get("raw_texts") or []))
+        state.extracted_fields = dict(data.get("extracted_fields") or {})
+        state.triage = dict(data.get("triage") or {})
+        state.summary = data.get("summary")
+        state.issues = list(data.get("issues") or [])
+        state.trace = [TraceEntry.from_dict(t) for t in data.get("trace") or []]
+        return state
+
+    def analysis(self, doc: Optional[int] = None) -> TextAnalysis:
+        """
+        Lowercased text, keyword hits, amount and date for one document
+        (doc=index) or for all documents joined with spaces (doc=None).
+        Computed on first use and shared by every agent afterwards; recomputed
+        if raw_texts was replaced or edited in the meantime.
+        """
+        sources = tuple(self.raw_texts) if doc is None else tuple(self.raw_texts[doc:doc + 1])
+        cached = self._analysis.get(doc)
+        if cached is not None:
+            old_sources, result = cached
+            if len(old_sources) == len(sources) and all(a is b for a, b in zip(old_sources, sources)):
+                return result
+
+        text = " ".join(sources)
+        result = TextAnalysis(text)
+        self._analysis[doc] = (sources, result)
+        return result
+
     def add_trace(self, agent: str, action: str, info: Optional[Dict[str, Any]] = None) -> None:
         """
         Record what an agent did, when, and what it produced.
         """
-        self.trace.append({
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-            "agent": agent,
-            "action": action,
-            "info": info or {}
-        })
+        self.trace.append(TraceEntry(agent, action, info or {}))
 
     def is_complete(self) -> bool:
         """
@@ -49,19 +177,92 @@ class ClaimState:
         - Required fields exist
         - Summary is not None
         """
-        required = ["claimant_name", "policy_type", "claim_amount", "incident_date"]
-        missing = [f for f in required if f not in self.extracted_fields]
+        missing = [f for f in REQUIRED_FIELDS if f not in self.extracted_fields]
         return len(missing) == 0 and self.summary is not None
 
-    def to_json(self) -> str:
-        """
-        Serialize the entire state to pretty JSON (for saving / debugging).
-        """
-        return json.dumps({
+    def to_dict(self) -> Dict[str, Any]:
+        return {
             "raw_texts": self.raw_texts,
             "extracted_fields": self.extracted_fields,
             "triage": self.triage,
             "summary": self.summary,
             "issues": self.issues,
-            "trace": self.trace,
-        }, indent=2)
+            "trace": [t.to_dict() for t in self.trace],
+        }
+
+    def to_json(self) -> str:
+        """
+        Serialize the entire state to pretty JSON (for saving / debugging).
+        """
+        return json.dumps(self.to_dict(), indent=2)
+
+
+class ClaimBatch:
+    """
+    Columnar view of the extracted fields and triage of N claims.
+
+    Each field is one column (claim_amount is a float array with NaN for
+    missing values, the others are lists with None), so batch stages and
+    metrics can work on whole columns instead of one dict per claim.
+    The underlying ClaimState objects are kept in `states`.
+    """
+    TRIAGE_COLUMNS = ("priority", "claim_type")
+
+    def __init__(self, states: Sequence[ClaimState]):
+        self.states: List[ClaimState] = list(states)
+        self.refresh()
+
+    @classmethod
+    def from_states(cls, states: Iterable[ClaimState]) -> "ClaimBatch":
+        return cls(list(states))
+
+    def refresh(self) -> None:
+        """
+        (Re)build the columns from the current ClaimStates.
+        """
+        states = self.states
+        self.claimant_name: List[Optional[str]] = [s.extracted_fields.get("claimant_name") for s in states]
+        self.policy_type: List[Optional[str]] = [s.extracted_fields.get("policy_type") for s in states]
+        self.incident_date: List[Optional[str]] = [s.extracted_fields.get("incident_date") for s in states]
+        self.claim_amount = array("d", (
+            math.nan if s.extracted_fields.get("claim_amount") is None
+            else float(s.extracted_fields["claim_amount"])
+            for s in states
+        ))
+        self.priority: List[Optional[str]] = [s.triage.get("priority") for s in states]
+        self.claim_type: List[Optional[str]] = [s.triage.get("claim_type") for s in states]
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    def __iter__(self) -> Iterator[ClaimState]:
+        return iter(self.states)
+
+    def column(self, name: str) -> Sequence[Any]:
+        if name not in REQUIRED_FIELDS and name not in self.TRIAGE_COLUMNS:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def write_triage(self) -> None:
+        """
+        Copy the triage columns back into each ClaimState.triage.
+        """
+        for state, priority, claim_type in zip(self.states, self.priority, self.claim_type):
+            state.triage["priority"] = priority
+            state.triage["claim_type"] = claim_type
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """
+        One flat dict per claim (fields + triage), e.g. for evaluation.
+        """
+        return [
+            {
+                "claimant_name": self.claimant_name[i],
+                "policy_type": self.policy_type[i],
+                "claim_amount": None if math.isnan(self.claim_amount[i]) else self.claim_amount[i],
+                "incident_date": self.incident_date[i],
+                "priority": self.priority[i],
+                "claim_type": self.claim_type[i],
+            }
+            for i in range(len(self.states))
+        ]
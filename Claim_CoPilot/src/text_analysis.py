@@ -0,0 +1,164 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+# ---------------- Vocabulary ----------------
+
+POLICY_TYPES = ("Health", "Auto", "Property")
+
+# Substrings that mark a claim as injury-related (TriageAgent priority rule)
+INJURY_KEYWORDS = ("fracture", "injur", "hospital")
+
+MONTH_MAP = {
+    "january": 1,
+    "february": 2,
+    "march": 3,
+    "april": 4,
+    "may": 5,
+    "june": 6,
+    "july": 7,
+    "august": 8,
+    "september": 9,
+    "october": 10,
+    "november": 11,
+    "december": 12,
+}
+
+# ---------------- Precompiled patterns ----------------
+
+ISO_DATE_RE = re.compile(r"\b(20\d{2}-\d{2}-\d{2})\b")
+LONG_DATE_RE = re.compile(
+    r"\b(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{1,2}),\s*(\d{4})"
+)
+# Things like $3,750 or $280 or $1200.50
+AMOUNT_RE = re.compile(r"\$\s*([\d,]+(?:\.\d+)?)")
+
+
+class KeywordScanner:
+    """
+    Finds which of a fixed set of keywords occur (as substrings) in a lowercased
+    text with a single regex pass, instead of one `kw in text` scan per keyword.
+
+    The pattern is a lookahead alternation (longest keywords first) so matches
+    may overlap; keywords that are prefixes of a longer match at the same
+    position are added afterwards, so the result equals
+    {kw for kw in keywords if kw in text}.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: FrozenSet[str] = frozenset(k.lower() for k in keywords if k)
+        ordered = sorted(self.keywords, key=len, reverse=True)
+        self._pattern = re.compile("(?=(" + "|".join(re.escape(k) for k in ordered) + "))")
+        # keyword -> shorter keywords that are its prefixes
+        self._prefixes: Dict[str, List[str]] = {
+            k: [p for p in self.keywords if p != k and k.startswith(p)] for k in self.keywords
+        }
+
+    def scan(self, lowered: str) -> FrozenSet[str]:
+        found = set()
+        for m in self._pattern.finditer(lowered):
+            kw = m.group(1)
+            if kw not in found:
+                found.add(kw)
+                found.update(self._prefixes[kw])
+        return frozenset(found)
+
+
+DEFAULT_SCANNER = KeywordScanner([p.lower() for p in POLICY_TYPES] + list(INJURY_KEYWORDS))
+
+# ---------------- Date & Amount Helpers ----------------
+
+def extract_incident_date(text: str) -> Optional[str]:
+    """
+    Return incident date as 'YYYY-MM-DD' if we can find one, else None.
+
+    Supports:
+      - ISO dates: 2024-06-05
+      - Natural dates: November 22, 2024  ->  2024-11-22
+    """
+
+    # 1) ISO-style dates like 2024-06-05
+    m_iso = ISO_DATE_RE.search(text)
+    if m_iso:
+        return m_iso.group(1)
+
+    # 2) Long-form dates like 'November 22, 2024'
+    m_long = LONG_DATE_RE.search(text)
+    if m_long:
+        month_name = m_long.group(1).lower()
+        day = int(m_long.group(2))
+        year = int(m_long.group(3))
+        month_num = MONTH_MAP.get(month_name)
+        if month_num:
+            return f"{year:04d}-{month_num:02d}-{day:02d}"
+
+    # Nothing found
+    return None
+
+
+def extract_claim_amount(text: str) -> Optional[float]:
+    """
+    Extract the main monetary amount from the claim text.
+
+    Strategy:
+      - Only consider numbers prefixed with '$' to avoid confusing years (e.g., 2024).
+      - Remove commas and parse as float.
+      - If multiple amounts exist (repairs + medical), pick the largest
+        as the main claim amount.
+    """
+    matches = AMOUNT_RE.findall(text)
+    if not matches:
+        return None
+
+    amounts: List[float] = []
+    for m in matches:
+        cleaned = m.replace(",", "")
+        try:
+            amounts.append(float(cleaned))
+        except ValueError:
+            continue
+
+    if not amounts:
+        return None
+
+    # Heuristic: main claim amount = largest value
+    return max(amounts)
+
+
+# ---------------- Per-text analysis ----------------
+
+class TextAnalysis:
+    """
+    Everything the agents need from a claim text, computed once:
+    lowercased text, keyword hits (policy + injury words), amount and date.
+    Get it through ClaimState.analysis() so every agent shares the same object.
+    """
+    __slots__ = ("text", "lowered", "vocabulary", "keywords", "claim_amount", "incident_date")
+
+    def __init__(self, text: str, scanner: KeywordScanner = DEFAULT_SCANNER):
+        self.text = text
+        self.lowered = text.lower()
+        self.vocabulary = scanner.keywords
+        self.keywords = scanner.scan(self.lowered)
+        self.claim_amount = extract_claim_amount(text)
+        self.incident_date = extract_incident_date(text)
+
+    def contains(self, keyword: str) -> bool:
+        """
+        Same as `keyword.lower() in text.lower()`, answered from the scan when possible.
+        """
+        kw = keyword.lower()
+        if kw in self.keywords:
+            return True
+        if kw in self.vocabulary:
+            return False
+        # Not in the scanner vocabulary: plain substring check
+        return kw in self.lowered
+
+    def has_any(self, keywords: Sequence[str]) -> bool:
+        return any(self.contains(k) for k in keywords)
+
+    def policies(self) -> List[str]:
+        """
+        Policy types mentioned in the text, in POLICY_TYPES order.
+        """
+        return [p for p in POLICY_TYPES if self.contains(p)]
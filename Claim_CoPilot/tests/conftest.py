@@ -0,0 +1,27 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE = Path(__file__).resolve().parent.parent
+TESTS = BASE / "tests"
+
+for path in (BASE / "src", BASE, TESTS):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+from fake_openai import FakeOpenAI  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _isolated_env(monkeypatch):
+    # No real API key, shared response cache or local backend leaks into a test
+    for name in ("OPENAI_API_KEY", "CLAIMCOPILOT_LLM_CACHE", "CLAIMCOPILOT_LLM_BACKEND"):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.fixture
+def fake_openai():
+    server = FakeOpenAI().start()
+    yield server
+    server.stop()
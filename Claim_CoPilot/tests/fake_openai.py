@@ -0,0 +1,186 @@
+"""
+Minimal OpenAI-compatible HTTP server (standard library only) for tests.
+
+Serves the endpoints LLMClient and batch_api.BatchSubmitter use:
+  POST /v1/chat/completions       echo reply ("echo:<prompt>"), or JSON for
+                                  response_format requests; `failures` scripts
+                                  error statuses (and headers) for the next calls
+  POST /v1/files                  multipart upload (purpose=batch)
+  POST /v1/batches                create a batch over an uploaded request file
+  GET  /v1/batches/<id>           in_progress until polled `batch_polls` times,
+                                  then completed with an output file
+  GET  /v1/files/<id>/content     download a file
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+
+def completion(content: str, model: str = "gpt-4o-mini", total_tokens: int = 8) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": 0,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "finish_reason": "stop",
+            "message": {"role": "assistant", "content": content},
+        }],
+        "usage": {"prompt_tokens": total_tokens - 3, "completion_tokens": 3, "total_tokens": total_tokens},
+    }
+
+
+def reply_for(body: Dict[str, Any]) -> str:
+    prompt = body["messages"][-1]["content"]
+    if body.get("response_format"):
+        return json.dumps({"issues": ["fake issue"], "summary": "fake summary: " + prompt[:40]})
+    return "echo:" + prompt[:40]
+
+
+class FakeOpenAI:
+    def __init__(self, delay: float = 0.0, batch_polls: int = 2):
+        # Seconds each chat completion takes
+        self.delay = delay
+        self.batch_polls = batch_polls
+        # (status, headers) returned by the next chat completion calls
+        self.failures: Deque[Tuple[int, Dict[str, str]]] = deque()
+        # custom_ids answered with an error line in batch output files
+        self.batch_failures: Set[str] = set()
+
+        self.requests: List[Tuple[float, str, str]] = []
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAI":
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(self))
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.05,), daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def calls(self, method: str, path_part: str) -> int:
+        return sum(1 for _, m, p in self.requests if m == method and path_part in p)
+
+    # ---------------- Endpoints ----------------
+
+    def chat(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, str], Any]:
+        with self._lock:
+            failure = self.failures.popleft() if self.failures else None
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if failure is not None:
+            status, headers = failure
+            return status, headers, {"error": {"message": f"fake error {status}", "type": "fake", "code": None}}
+        return 200, {}, completion(reply_for(body), body.get("model", "gpt-4o-mini"))
+
+    def upload(self, content_type: str, data: bytes) -> Dict[str, Any]:
+        boundary = content_type.split("boundary=", 1)[1].strip('"').encode()
+        content = b""
+        for part in data.split(b"--" + boundary):
+            head, _, rest = part.partition(b"\r\n\r\n")
+            if b'name="file"' in head:
+                content = rest[:-2] if rest.endswith(b"\r\n") else rest
+        fid = f"file-{next(self._ids)}"
+        self.files[fid] = content
+        return {"id": fid, "object": "file", "bytes": len(content), "created_at": 0,
+                "filename": "requests.jsonl", "purpose": "batch", "status": "processed"}
+
+    def create_batch(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        lines = [json.loads(l) for l in self.files[body["input_file_id"]].splitlines() if l.strip()]
+        bid = f"batch_{next(self._ids)}"
+        self.batches[bid] = {"id": bid, "input": body["input_file_id"], "status": "validating",
+                             "lines": lines, "polls": 0, "output": None}
+        return self._batch_obj(self.batches[bid])
+
+    def retrieve_batch(self, bid: str) -> Dict[str, Any]:
+        batch = self.batches[bid]
+        batch["polls"] += 1
+        if batch["status"] != "completed" and batch["polls"] >= self.batch_polls:
+            out = []
+            for line in batch["lines"]:
+                cid = line["custom_id"]
+                if cid in self.batch_failures:
+                    out.append({"id": "r", "custom_id": cid, "response": {"status_code": 500, "body": {}}, "error": None})
+                else:
+                    out.append({"id": "r", "custom_id": cid, "error": None, "response": {
+                        "status_code": 200, "body": completion("batch:" + reply_for(line["body"]))}})
+            fid = f"file-{next(self._ids)}"
+            self.files[fid] = b"".join(json.dumps(o).encode() + b"\n" for o in out)
+            batch["output"] = fid
+            batch["status"] = "completed"
+        elif batch["status"] != "completed":
+            batch["status"] = "in_progress"
+        return self._batch_obj(batch)
+
+    def _batch_obj(self, batch: Dict[str, Any]) -> Dict[str, Any]:
+        total = len(batch["lines"])
+        done = batch["status"] == "completed"
+        return {
+            "id": batch["id"], "object": "batch", "endpoint": "/v1/chat/completions",
+            "input_file_id": batch["input"], "completion_window": "24h", "status": batch["status"],
+            "created_at": 0, "output_file_id": batch["output"], "error_file_id": None,
+            "request_counts": {"total": total, "completed": total if done else 0, "failed": 0},
+        }
+
+
+def _make_handler(fake: FakeOpenAI) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def _send(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None, raw: Optional[bytes] = None) -> None:
+            data = raw if raw is not None else json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/octet-stream" if raw is not None else "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self) -> None:
+            fake.requests.append((time.monotonic(), "POST", self.path))
+            data = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if self.path.endswith("/chat/completions"):
+                status, headers, payload = fake.chat(json.loads(data))
+                return self._send(status, payload, headers)
+            if self.path.endswith("/files"):
+                return self._send(200, fake.upload(self.headers["Content-Type"], data))
+            if self.path.endswith("/batches"):
+                return self._send(200, fake.create_batch(json.loads(data)))
+            self._send(404, {"error": {"message": "not found"}})
+
+        def do_GET(self) -> None:
+            fake.requests.append((time.monotonic(), "GET", self.path))
+            parts = self.path.split("?")[0].strip("/").split("/")
+            if len(parts) == 3 and parts[1] == "batches":
+                return self._send(200, fake.retrieve_batch(parts[2]))
+            if len(parts) == 4 and parts[1] == "files" and parts[3] == "content":
+                return self._send(200, None, raw=fake.files[parts[2]])
+            self._send(404, {"error": {"message": "not found"}})
+
+    return Handler
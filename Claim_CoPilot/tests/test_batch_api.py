@@ -0,0 +1,206 @@
+import json
+
+from agents.summarization import SummarizationAgent
+from agents.validation import ValidationAgent
+from batch_api import BatchSubmitter, custom_id, run_deferred
+from dedup import IntakeIndex
+from llm_cache import LLMCache
+from llm_client import LLMClient
+from orchestrator import Orchestrator
+from state import ClaimState
+
+TEXTS = [
+    "Claimant John Smith reports a car accident on 2024-03-02. Claim amount: $4,500.",
+    "Jane Doe, home policy, water damage in the kitchen. Claim amount: $12,000.",
+    "Bob Stone, health policy, hospital stay after a fall. Claim amount: $900.",
+]
+
+
+def make_llm(fake, **kwargs):
+    return LLMClient(api_key="test", base_url=fake.base_url, backoff_base=0.01, **kwargs)
+
+
+def make_submitter(llm, tmp_path, **kwargs):
+    return BatchSubmitter(llm, work_dir=tmp_path, poll_interval=0.01, verbose=False, **kwargs)
+
+
+def make_states():
+    states = [ClaimState.from_documents(t) for t in TEXTS]
+    for state in states:
+        state.extracted_fields = {"policy_type": "auto"}
+        state.triage = {"priority": "low"}
+    return states
+
+
+def actions(state):
+    return [entry.action for entry in state.trace]
+
+
+# --- Batch lifecycle ---------------------------------------------------------
+
+def test_submit_poll_and_download(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    submitter = make_submitter(llm, tmp_path)
+    agent = ValidationAgent(llm)
+    lines = [submitter.request_line(f"{i}:x", agent, f"prompt {i}") for i in range(3)]
+    fake_openai.batch_failures.add("1:x")
+
+    path = submitter.write_requests(lines)
+    batch_id = submitter.submit(path)
+    assert fake_openai.calls("POST", "/files") == 1
+    assert fake_openai.calls("POST", "/batches") == 1
+    assert json.loads((tmp_path / path.name.replace(".requests.jsonl", ".job.json")).read_text())["batch_id"] == batch_id
+
+    batch = submitter.wait(batch_id)
+    assert batch.status == "completed"
+    assert fake_openai.calls("GET", f"/batches/{batch_id}") == 2
+
+    results = submitter.fetch_results(batch)
+    assert sorted(results) == ["0:x", "2:x"]
+    assert results["0:x"][0] == "batch:echo:prompt 0"
+    assert results["0:x"][1]["total_tokens"] == 8
+
+
+def test_resubmitting_the_same_requests_reattaches(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    submitter = make_submitter(llm, tmp_path)
+    lines = [submitter.request_line("0:x", ValidationAgent(llm), "prompt")]
+
+    first = submitter.submit(submitter.write_requests(lines))
+    second = submitter.submit(submitter.write_requests(lines))
+    assert first == second
+    assert fake_openai.calls("POST", "/files") == 1
+    assert fake_openai.calls("POST", "/batches") == 1
+
+
+# --- Claims ------------------------------------------------------------------
+
+def test_run_agents_writes_answers_into_states(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    validation, summarization = ValidationAgent(llm), SummarizationAgent(llm)
+    states = make_states()
+
+    make_submitter(llm, tmp_path).run_agents([validation, summarization], states)
+
+    # One batch with every prompt, no real-time requests
+    assert fake_openai.calls("POST", "/batches") == 1
+    assert fake_openai.calls("POST", "/chat/completions") == 0
+    for state in states:
+        assert state.summary.startswith("batch:echo:")
+        assert any(i.startswith("LLM-note: batch:echo:") for i in state.issues)
+        assert actions(state) == ["validate_fields", "summarize_claim"]
+
+
+def test_missing_batch_answers_fall_back_to_sync(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    summarization = SummarizationAgent(llm)
+    states = make_states()
+    fake_openai.batch_failures.add(custom_id(1, summarization))
+
+    make_submitter(llm, tmp_path).run_agents([summarization], states)
+
+    assert fake_openai.calls("POST", "/chat/completions") == 1
+    assert states[0].summary.startswith("batch:echo:")
+    assert states[1].summary.startswith("echo:")
+    assert states[2].summary.startswith("batch:echo:")
+
+
+def test_missing_batch_answers_without_fallback_are_traced(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    summarization = SummarizationAgent(llm)
+    states = make_states()
+    fake_openai.batch_failures.add(custom_id(1, summarization))
+
+    make_submitter(llm, tmp_path, fallback_sync=False).run_agents([summarization], states)
+
+    assert fake_openai.calls("POST", "/chat/completions") == 0
+    assert states[1].summary is None
+    assert actions(states[1]) == ["batch_missing"]
+
+
+def test_cached_answers_are_not_submitted_again(fake_openai, tmp_path):
+    llm = make_llm(fake_openai, cache=LLMCache())
+    summarization = SummarizationAgent(llm)
+
+    make_submitter(llm, tmp_path).run_agents([summarization], make_states())
+    states = make_states()
+    make_submitter(llm, tmp_path).run_agents([summarization], states)
+
+    assert fake_openai.calls("POST", "/batches") == 1
+    assert all(s.summary.startswith("batch:echo:") for s in states)
+
+
+def test_run_deferred_runs_the_pipeline_through_one_batch(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    orchestrator = Orchestrator(llm)
+
+    states = run_deferred(orchestrator, TEXTS, make_submitter(llm, tmp_path))
+
+    assert fake_openai.calls("POST", "/batches") == 1
+    assert fake_openai.calls("POST", "/chat/completions") == 0
+    for state in states:
+        assert state.triage
+        assert state.summary.startswith("batch:echo:")
+
+
+def test_run_deferred_uses_the_dedup_index(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    index = IntakeIndex(store_states=True)
+    orchestrator = Orchestrator(llm, dedup=index, reuse_duplicates=True)
+    submitter = make_submitter(llm, tmp_path)
+
+    first = run_deferred(orchestrator, TEXTS[:2], submitter, claim_ids=["a", "b"])
+    assert index.get_state("a").summary == first[0].summary
+
+    again = run_deferred(orchestrator, [TEXTS[0]], submitter, claim_ids=["c"])
+    # Answered from the stored state: no second batch
+    assert fake_openai.calls("POST", "/batches") == 1
+    assert again[0].summary == first[0].summary
+    assert "Possible duplicate: same text as claim a" in again[0].issues
+    assert actions(again[0])[-1] == "reuse_duplicate"
+
+
+def make_long_states():
+    long_text = " ".join(f"Line {i}: the insured vehicle was damaged on the highway." for i in range(40))
+    states = [ClaimState.from_documents([long_text, "Police report: no injuries."]), make_states()[0]]
+    for state in states:
+        state.extracted_fields = {"policy_type": "auto"}
+    return states
+
+
+def make_long_summarizer(llm):
+    agent = SummarizationAgent(llm)
+    agent.prompt_budget = 200
+    agent.map_budget = 150
+    return agent
+
+
+def test_long_claims_are_map_reduced_in_deferred_mode(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    summarization = make_long_summarizer(llm)
+    states = make_long_states()
+    parts = summarization.map_parts(states[0])
+    assert len(parts) > 2 and not summarization.map_parts(states[1])
+
+    make_submitter(llm, tmp_path).run_agents([summarization], states)
+
+    # One batch for the document parts, one for the claim summaries
+    assert fake_openai.calls("POST", "/batches") == 2
+    assert fake_openai.calls("POST", "/chat/completions") == 0
+    assert states[0].summary.startswith("batch:echo:Document summaries:")
+    assert actions(states[0]) == ["summarize_documents", "summarize_claim"]
+    assert states[0].trace[0].info == {"parts": [label for label, _ in parts], "empty_replies": 0}
+    assert actions(states[1]) == ["summarize_claim"]
+
+
+def test_missing_map_answers_fall_back_to_sync(fake_openai, tmp_path):
+    llm = make_llm(fake_openai)
+    summarization = make_long_summarizer(llm)
+    states = make_long_states()
+    fake_openai.batch_failures.add(f"{custom_id(0, summarization)}:map:1")
+
+    make_submitter(llm, tmp_path).run_agents([summarization], states)
+
+    assert fake_openai.calls("POST", "/chat/completions") == 1
+    assert states[0].trace[0].info["empty_replies"] == 0
+    assert states[0].summary.startswith("batch:echo:Document summaries:")
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from dedup import IntakeIndex
+
+
+def claim(i):
+    return f"Claimant number {i} reports damage to the insured vehicle on the highway, claim {i * 7919}."
+
+
+def db_ids(path):
+    with sqlite3.connect(str(path)) as db:
+        return {cid for (cid,) in db.execute("SELECT claim_id FROM claims")}
+
+
+# --- Matching ------------------------------------------------------------------
+
+BASE_TEXT = (
+    "Jane Doe, home policy, reports water damage in the kitchen after a pipe burst on "
+    "2024-05-03. The plumber replaced the pipe and the floor needs to be redone. Claim amount: $12,000."
+)
+
+
+def test_exact_duplicates_ignore_case_and_whitespace():
+    index = IntakeIndex()
+    assert index.add(BASE_TEXT, "a") == ("a", None)
+    _, match = index.add("  " + BASE_TEXT.upper().replace(" ", "\n  "), "b")
+    assert (match.kind, match.claim_id, match.similarity) == ("exact", "a", 1.0)
+    # The newest copy is what later duplicates point to
+    assert index.check(BASE_TEXT).claim_id == "b"
+
+
+def test_near_duplicates_are_found_and_unrelated_claims_are_not():
+    index = IntakeIndex()
+    index.add(BASE_TEXT, "a")
+    for i in range(20):
+        index.add(claim(i), f"other-{i}")
+
+    edited = BASE_TEXT.replace("Claim amount: $12,000.", "Claim amount: $12,500.")
+    match = index.check(edited)
+    assert match.kind == "near" and match.claim_id == "a"
+    assert match.similarity >= index.threshold
+    assert "near-duplicate of claim a" in match.issue()
+
+    assert index.check("Bob Stone, health policy, hospital stay after a fall on the stairs.") is None
+
+
+def test_persisted_index_finds_matches_after_reopening(tmp_path):
+    path = tmp_path / "intake.sqlite"
+    index = IntakeIndex(path)
+    index.add(BASE_TEXT, "a")
+    index.close()
+
+    index = IntakeIndex(path)
+    assert index.check(BASE_TEXT).claim_id == "a"
+    index.close()
+
+
+# --- Claim ids -----------------------------------------------------------------
+
+def test_supplied_ids_do_not_use_up_assigned_ones():
+    index = IntakeIndex()
+    assert index.add(claim(0), "a")[0] == "a"
+    assert index.add(claim(1))[0] == "intake-0"
+    assert index.add(claim(2), "b")[0] == "b"
+    assert index.add(claim(3))[0] == "intake-1"
+
+
+def test_supplied_intake_ids_never_collide_with_assigned_ones():
+    index = IntakeIndex()
+    assert index.add(claim(0))[0] == "intake-0"
+    # Ahead of the counter: later assignments skip it
+    assert index.add(claim(1), "intake-1")[0] == "intake-1"
+    assert index.add(claim(2))[0] == "intake-2"
+    # Same claim again under its assigned id is fine, another text is not
+    assert index.add(claim(0), "intake-0")[0] == "intake-0"
+    with pytest.raises(ValueError):
+        index.add(claim(3), "intake-0")
+    assert len(index) == 3
+
+
+def test_ids_stay_unique_after_pruning_and_reopening(tmp_path):
+    path = tmp_path / "intake.sqlite"
+    index = IntakeIndex(path, max_entries=20)
+    ids = [index.add(claim(i))[0] for i in range(250)]
+    index.flush()
+    # Pruned while inserting, not only on close()
+    assert len(db_ids(path)) <= 20 + 100
+    index.close()
+    assert db_ids(path) == set(ids[-20:])
+
+    index = IntakeIndex(path, max_entries=20)
+    assert len(index) == 20
+    more = [index.add(claim(i))[0] for i in range(250, 260)]
+    index.close()
+    assert len(set(ids + more)) == len(ids) + len(more)
@@ -0,0 +1,95 @@
+import random
+
+import numpy as np
+import pytest
+
+import eval as claim_eval
+import model_registry
+from agents.triage import TriageAgent
+from jsonl_io import JsonlWriter, iter_jsonl
+from orchestrator import Orchestrator
+
+
+CLAIMS = [
+    {"id": 1, "text": "John Smith, auto policy, rear-ended on 2024-03-02. Claim amount: $4,500."},
+    {"id": 2, "text": "Jane Doe, home policy, water damage in the kitchen. Claim amount: $900."},
+]
+
+
+# --- Prediction cache ----------------------------------------------------------
+
+def test_pipeline_version_builds_no_pipeline(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("pipeline_version must not build an Orchestrator")
+
+    monkeypatch.setattr(Orchestrator, "__init__", fail)
+    version = claim_eval.pipeline_version(combined_llm=True)
+    assert sorted(version["agents"]) == ["ExtractionAgent", "ReviewAgent", "TriageAgent"]
+    assert version["llm_enabled"] is False
+    assert not model_registry.ner_loaded()
+
+    # A class-level setting change is a new version
+    monkeypatch.setattr(TriageAgent, "priority_labels", ("High", "Low"), raising=False)
+    assert claim_eval.pipeline_version(combined_llm=True)["agents"]["TriageAgent"] != version["agents"]["TriageAgent"]
+
+
+def test_prediction_cache_keeps_only_the_current_version(tmp_path):
+    path = tmp_path / "predictions.jsonl"
+    config = claim_eval.pipeline_version()
+    old = dict(config, agents={"TriageAgent": "0" * 16})
+    with JsonlWriter(path) as writer:
+        for c in CLAIMS:
+            key = {"id": str(c["id"]), "text_hash": claim_eval.text_hash(c["text"])}
+            writer.write(dict(key, config=old, pred={"priority": "Old"}))
+            writer.write(dict(key, config=config, pred={"priority": "Low"}))
+
+    preds = claim_eval.predict_agentic(CLAIMS, cache_path=path)
+
+    assert [p["priority"] for p in preds] == ["Low", "Low"]
+    records = list(iter_jsonl(path))
+    assert [r["id"] for r in records] == ["1", "2"]
+    assert all(r["config"] == config for r in records)
+    assert not path.with_name(path.name + ".tmp").exists()
+
+
+# --- Metrics -------------------------------------------------------------------
+
+def random_rows(rng, n):
+    values = {
+        "claimant_name": ["John Smith", "Jane Doe", "Liu Chen"],
+        "policy_type": claim_eval.POLICY_TYPES,
+        "claim_amount": [900.0, 4500.0, 4500, 12000.5],
+        "incident_date": ["2024-03-02", "2024-07-15"],
+        "priority": ["High", "Medium", "Low"],
+    }
+    return [{f: (None if rng.random() < 0.2 else rng.choice(v)) for f, v in values.items()} for _ in range(n)]
+
+
+def test_vectorized_metrics_match_the_reference():
+    rng = random.Random(7)
+    gold = random_rows(rng, 300)
+    preds = {"agentic": random_rows(rng, 300), "baseline": random_rows(rng, 300)}
+
+    results = claim_eval.evaluate(gold, preds, n_boot=50)
+
+    for system, rows in preds.items():
+        for field in claim_eval.FIELDS:
+            bucket = {"tp": 0, "fp": 0, "fn": 0}
+            for g, p in zip(gold, rows):
+                claim_eval.update_prf_counts(g.get(field), p.get(field), bucket)
+            assert results["metrics_raw"][system][field] == bucket
+            row = results["summary"][field]
+            expected = claim_eval.prf(bucket["tp"], bucket["fp"], bucket["fn"])
+            assert (row[f"{system}_precision"], row[f"{system}_recall"], row[f"{system}_f1"]) == pytest.approx(expected)
+            lo, hi = results["bootstrap_ci"]["fields"][field][f"{system}_f1"]
+            assert 0.0 <= lo <= hi <= 1.0
+
+        for field in claim_eval.CATEGORICAL_FIELDS:
+            assert sum(map(sum, results["confusion"][system][field]["matrix"])) == len(gold)
+
+
+def test_prf_arrays_match_prf():
+    counts = [(0, 0, 0), (0, 3, 0), (0, 0, 4), (5, 0, 0), (3, 1, 2), (7, 2, 9)]
+    prec, rec, f1 = claim_eval.prf_arrays(*np.array(counts).T)
+    for j, (tp, fp, fn) in enumerate(counts):
+        assert (prec[j], rec[j], f1[j]) == pytest.approx(claim_eval.prf(tp, fp, fn))
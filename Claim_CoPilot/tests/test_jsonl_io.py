@@ -0,0 +1,36 @@
+import importlib
+import sys
+import types
+
+import pytest
+
+import jsonl_io
+
+
+@pytest.mark.parametrize("data", [b"{", b"not json", b"\xff\xfe", "[1,"])
+def test_malformed_input_raises_value_error(data):
+    with pytest.raises(ValueError):
+        jsonl_io.loads(data)
+
+
+def test_codec_specific_decode_errors_become_value_error(monkeypatch):
+    # A codec whose decode error is not a ValueError (like msgspec.DecodeError)
+    class DecodeError(Exception):
+        pass
+
+    def decode(data):
+        raise DecodeError("truncated")
+
+    fake = types.ModuleType("msgspec")
+    fake.DecodeError = DecodeError
+    fake.json = types.SimpleNamespace(decode=decode, encode=lambda obj: b"null")
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    monkeypatch.setitem(sys.modules, "msgspec", fake)
+    try:
+        module = importlib.reload(jsonl_io)
+        assert module.JSON_BACKEND == "msgspec"
+        with pytest.raises(ValueError, match="truncated"):
+            module.loads(b"{")
+    finally:
+        monkeypatch.undo()
+        importlib.reload(jsonl_io)
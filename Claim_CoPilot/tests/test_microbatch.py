@@ -0,0 +1,67 @@
+import asyncio
+
+from microbatch import MicroBatcher
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def with_batcher(batcher, body):
+    await batcher.start()
+    try:
+        return await body(batcher)
+    finally:
+        await batcher.stop()
+
+
+def test_items_are_batched_and_keep_their_order():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        return [i * 10 for i in items]
+
+    async def body(batcher):
+        return await asyncio.gather(*batcher.submit_many(list(range(5))))
+
+    results = run(with_batcher(MicroBatcher(process, max_batch_size=8, max_wait=0.01), body))
+    assert results == [0, 10, 20, 30, 40]
+    assert calls == [[0, 1, 2, 3, 4]]
+
+
+def test_one_failing_item_only_fails_its_own_future():
+    calls = []
+
+    def process(items):
+        calls.append(list(items))
+        if "bad" in items:
+            raise ValueError("bad claim")
+        return [item.upper() for item in items]
+
+    async def body(batcher):
+        futures = batcher.submit_many(["a", "bad", "c"])
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    a, bad, c = run(with_batcher(MicroBatcher(process, max_batch_size=8, max_wait=0.01), body))
+    assert (a, c) == ("A", "C")
+    assert isinstance(bad, ValueError)
+    # The whole batch once, then each item on its own
+    assert calls == [["a", "bad", "c"], ["a"], ["bad"], ["c"]]
+
+
+
+def test_items_arriving_at_the_deadline_are_not_lost():
+    def process(items):
+        return items
+
+    async def body(batcher):
+        # Submissions spread around the collection deadline
+        futures = []
+        for i in range(300):
+            futures.extend(batcher.submit_many([i]))
+            await asyncio.sleep(0.0005 * (i % 5))
+        return await asyncio.wait_for(asyncio.gather(*futures), 10)
+
+    results = run(with_batcher(MicroBatcher(process, max_batch_size=16, max_wait=0.001), body))
+    assert results == list(range(300))
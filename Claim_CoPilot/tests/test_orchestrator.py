@@ -0,0 +1,63 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from orchestrator import Orchestrator
+from stage_graph import StageGraph
+from state import ClaimState
+
+
+def stage_threads():
+    return [t for t in threading.enumerate() if t.name.startswith("claim-stage")]
+
+
+def stage(name, reads=(), writes=()):
+    return SimpleNamespace(name=name, reads=reads, writes=writes)
+
+
+def test_stage_pool_is_created_lazily_and_closed():
+    before = len(stage_threads())
+    with Orchestrator() as orc:
+        assert orc._pool is None
+        state = orc.run("John Smith filed a claim for $1,200 on 2024-01-05 (auto policy).")
+        assert state.summary
+        assert orc._pool is not None
+    assert orc._pool is None
+    assert len(stage_threads()) == before
+
+
+def test_sequential_orchestrator_starts_no_threads():
+    with Orchestrator(parallel=False) as orc:
+        orc.run_many(["Jane Doe, home policy, $500."])
+        assert orc._pool is None
+
+
+def test_stage_error_is_raised_after_running_siblings_finish():
+    graph = StageGraph([stage("A", writes=("a",)), stage("B", writes=("b",)), stage("C", reads=("a", "b"))])
+    finished = []
+    b_started = threading.Event()
+
+    def call(agent):
+        if agent.name == "A":
+            b_started.wait(5)
+            raise RuntimeError("stage A failed")
+        b_started.set()
+        time.sleep(0.2)
+        finished.append(agent.name)
+
+    with ThreadPoolExecutor(4) as pool:
+        with pytest.raises(RuntimeError, match="stage A failed"):
+            graph.execute(call, pool)
+        # B (still running on the same state when A failed) completed before
+        # the error was raised; C (depends on A) never started
+        assert finished == ["B"]
+
+
+def test_orchestrator_is_usable_after_close():
+    orc = Orchestrator()
+    orc.close()
+    assert isinstance(orc.run("Bob Stone, health policy, $900."), ClaimState)
+    orc.close()
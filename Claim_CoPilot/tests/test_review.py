@@ -0,0 +1,46 @@
+import json
+
+import pytest
+
+from agents.review import REVIEW_SCHEMA, conforms, parse_review
+
+
+def reply(**data):
+    return json.dumps(data)
+
+
+def test_valid_reply():
+    assert parse_review(reply(issues=[" Missing date ", ""], summary=" Car crash. ")) == (["Missing date"], "Car crash.")
+    assert parse_review(reply(issues=[], summary="ok", extra=1)) == ([], "ok")
+
+
+@pytest.mark.parametrize("text", [
+    None,
+    "",
+    "not json",
+    "[1, 2]",
+    reply(summary="no issues key"),
+    reply(issues=[], summary=""),
+    reply(issues=[], summary="   "),
+    reply(issues="one string", summary="s"),
+    reply(issues=[1, 2], summary="s"),
+    reply(issues=[], summary=3),
+])
+def test_invalid_replies_are_rejected(text):
+    assert parse_review(text) is None
+
+
+def test_parse_review_follows_the_schema(monkeypatch):
+    # The schema, not hand-written checks, decides what conforms
+    schema = json.loads(json.dumps(REVIEW_SCHEMA))
+    schema["required"].append("priority")
+    monkeypatch.setattr("agents.review.REVIEW_SCHEMA", schema)
+    assert parse_review(reply(issues=[], summary="s")) is None
+    assert parse_review(reply(issues=[], summary="s", priority="high")) == ([], "s")
+
+
+def test_conforms_nested_types():
+    schema = {"type": "array", "items": {"type": "object", "required": ["a"]}}
+    assert conforms([{"a": 1}], schema)
+    assert not conforms([{"b": 1}], schema)
+    assert not conforms({"a": 1}, schema)
@@ -0,0 +1,200 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from service import ClaimService
+from state import ClaimState
+
+
+class FakeOrchestrator:
+    """
+    Stands in for the Orchestrator: summary = "summary of <text>", and a
+    claim containing "boom" makes its whole run_many() call fail.
+    """
+    dedup = None
+
+    def __init__(self):
+        self.calls = []
+        # While set to an unset Event, run_many() blocks on it
+        self.gate = None
+
+    def close(self):
+        pass
+
+    def run_many(self, texts, chunk_size=1, claim_ids=None):
+        self.calls.append(list(texts))
+        if self.gate is not None:
+            self.gate.wait(10)
+        if any("boom" in t for t in texts):
+            raise RuntimeError("pipeline broke")
+        states = []
+        for text in texts:
+            state = ClaimState.from_documents(text)
+            state.summary = f"summary of {text}"
+            states.append(state)
+        return states
+
+
+@contextmanager
+def running(service):
+    service.orchestrator = FakeOrchestrator()
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(service.serve())
+
+    def target():
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(task)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            loop.close()
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 5
+    while service.port == 0:
+        assert time.monotonic() < deadline, "service did not start"
+        time.sleep(0.01)
+    try:
+        yield service
+    finally:
+        if service.orchestrator.gate is not None:
+            service.orchestrator.gate.set()
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(5)
+
+
+def request(service, method, path, body=None):
+    conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+    try:
+        conn.request(method, path, body=None if body is None else json.dumps(body).encode())
+        resp = conn.getresponse()
+        data = resp.read()
+        payload = json.loads(data) if resp.getheader("Content-Type") == "application/json" else data.decode()
+        return resp.status, resp, payload
+    finally:
+        conn.close()
+
+
+def in_thread(fn, *args):
+    box = {}
+    thread = threading.Thread(target=lambda: box.setdefault("result", fn(*args)), daemon=True)
+    thread.start()
+    return thread, box
+
+
+def wait_for(service, predicate):
+    deadline = time.monotonic() + 5
+    while not predicate(request(service, "GET", "/healthz")[2]["queue"]):
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def service():
+    with running(ClaimService(port=0, max_batch_size=4, max_wait=0.05, max_queue=8)) as svc:
+        yield svc
+
+
+# --- Endpoints ---------------------------------------------------------------
+
+def test_single_claim(service):
+    status, _, payload = request(service, "POST", "/claims", {"id": 7, "text": "car crash"})
+    assert status == 200
+    assert payload["id"] == 7
+    assert payload["summary"] == "summary of car crash"
+
+
+def test_batch_results_keep_input_order(service):
+    claims = [{"id": i, "text": f"claim {i}"} for i in range(7)]
+    status, _, payload = request(service, "POST", "/claims:batch", {"claims": claims})
+    assert status == 200
+    assert [r["id"] for r in payload["results"]] == list(range(7))
+    assert [r["summary"] for r in payload["results"]] == [f"summary of claim {i}" for i in range(7)]
+    # Split into micro-batches of at most max_batch_size
+    assert all(len(call) <= 4 for call in service.orchestrator.calls)
+
+
+def raw_request(service, path, data):
+    conn = http.client.HTTPConnection("127.0.0.1", service.port, timeout=10)
+    try:
+        conn.request("POST", path, body=data)
+        resp = conn.getresponse()
+        return resp.status, json.loads(resp.read())
+    finally:
+        conn.close()
+
+
+def test_malformed_json_gets_400(service):
+    for data in (b"{", b"not json", b"\xff"):
+        status, payload = raw_request(service, "/claims", data)
+        assert status == 400
+        assert payload["error"] == "Body is not valid JSON"
+
+
+def test_invalid_requests(service):
+    assert request(service, "POST", "/claims", {"text": ""})[0] == 400
+    assert request(service, "POST", "/claims", {"documents": [1, 2]})[0] == 400
+    assert request(service, "POST", "/claims:batch", {"claims": "nope"})[0] == 400
+    assert request(service, "GET", "/claims")[0] == 405
+    assert request(service, "GET", "/nothing")[0] == 404
+    assert service.orchestrator.calls == []
+
+
+def test_batch_larger_than_queue_gets_413(service):
+    claims = [{"text": f"claim {i}"} for i in range(9)]
+    status, _, payload = request(service, "POST", "/claims:batch", {"claims": claims})
+    assert status == 413
+    assert "8" in payload["error"]
+    assert service.orchestrator.calls == []
+
+
+def test_full_queue_gets_503_with_retry_after():
+    with running(ClaimService(port=0, max_batch_size=1, max_wait=0.01, max_queue=2)) as service:
+        service.orchestrator.gate = threading.Event()
+        # One claim running (blocked), two waiting: the queue is full
+        first, _ = in_thread(request, service, "POST", "/claims", {"text": "first"})
+        wait_for(service, lambda q: q["running_batches"] == 1)
+        waiting, box = in_thread(request, service, "POST", "/claims:batch",
+                                 {"claims": [{"text": "second"}, {"text": "third"}]})
+        wait_for(service, lambda q: q["queued"] == 2)
+
+        status, resp, payload = request(service, "POST", "/claims", {"text": "fourth"})
+        assert status == 503
+        assert int(resp.getheader("Retry-After")) >= 1
+        assert "full" in payload["error"]
+
+        # Accepted requests still complete once the pipeline frees up
+        service.orchestrator.gate.set()
+        waiting.join(5)
+        first.join(5)
+        assert box["result"][0] == 200
+        assert [r["summary"] for r in box["result"][2]["results"]] == ["summary of second", "summary of third"]
+
+
+def test_failing_claim_only_fails_its_own_request():
+    with running(ClaimService(port=0, max_batch_size=8, max_wait=0.2, max_queue=8)) as service:
+        texts = ["good one", "boom", "good two"]
+        threads = [in_thread(request, service, "POST", "/claims", {"text": t}) for t in texts]
+        for thread, _ in threads:
+            thread.join(5)
+        statuses = [box["result"][0] for _, box in threads]
+        assert statuses == [200, 500, 200]
+        assert threads[0][1]["result"][2]["summary"] == "summary of good one"
+        # One micro-batch with all three claims, then each claim on its own
+        assert len(service.orchestrator.calls) == 4
+        assert sorted(service.orchestrator.calls[0]) == sorted(texts)
+
+
+def test_healthz_and_metrics(service):
+    status, _, payload = request(service, "GET", "/healthz")
+    assert status == 200 and payload["ok"] is True
+    status, _, text = request(service, "GET", "/metrics")
+    assert status == 200
+    assert "claimcopilot_service_requests_total" in text
@@ -0,0 +1,65 @@
+from agents.extraction import ExtractionAgent
+from agents.triage import DEFAULT_TRIAGE_RULES, TriageAgent
+from llm_client import LLMClient
+from orchestrator import Orchestrator
+from stage_cache import StageCache, run_incremental
+
+TEXTS = [
+    "Claimant John Smith reports a car accident on 2024-03-02. Claim amount: $4,500.",
+    "Jane Doe, home policy, water damage in the kitchen. Claim amount: $12,000.",
+    "Bob Stone, health policy, hospital stay after a fall. Claim amount: $900.",
+]
+
+
+def make_llm(fake):
+    return LLMClient(api_key="test", base_url=fake.base_url, backoff_base=0.01)
+
+
+def fields(state):
+    # Everything but the trace, whose timestamps differ for re-run stages
+    return {k: v for k, v in state.to_dict().items() if k != "trace"}
+
+
+def run_once(orchestrator, path):
+    cache = StageCache(path)
+    try:
+        states = list(run_incremental(orchestrator, TEXTS, cache))
+    finally:
+        cache.close()
+    return states, cache.stats()
+
+
+def test_triage_rule_change_reruns_only_triage(fake_openai, tmp_path, monkeypatch):
+    # Regex-only extraction that still counts as healthy (not degraded)
+    monkeypatch.setattr(ExtractionAgent, "_get_ner", lambda self: None)
+    path = tmp_path / "stages.sqlite"
+    llm = make_llm(fake_openai)
+
+    first, stats = run_once(Orchestrator(llm), path)
+    assert all(s["misses"] == 3 and s["hits"] == 0 for s in stats.values())
+    llm_calls = fake_openai.calls("POST", "/chat/completions")
+
+    # A new rule that never fires: new TriageAgent fingerprint, same priorities
+    rules = DEFAULT_TRIAGE_RULES + [{"priority": "Urgent", "min_amount": 1e12}]
+    agents = [TriageAgent(llm, rules=rules) if isinstance(a, TriageAgent) else a for a in Orchestrator(llm).agents]
+    again, stats = run_once(Orchestrator(llm, agents=agents), path)
+
+    assert stats["TriageAgent"] == {"hits": 0, "misses": 3}
+    assert all(s == {"hits": 3, "misses": 0} for name, s in stats.items() if name != "TriageAgent")
+    assert fake_openai.calls("POST", "/chat/completions") == llm_calls
+    assert [fields(s) for s in again] == [fields(s) for s in first]
+
+
+def test_fallback_outputs_are_not_stored(fake_openai, tmp_path):
+    path = tmp_path / "stages.sqlite"
+    # No API key: the LLM stages produce echo fallbacks
+    run_once(Orchestrator(LLMClient()), path)
+
+    states, stats = run_once(Orchestrator(make_llm(fake_openai)), path)
+
+    assert stats["TriageAgent"] == {"hits": 3, "misses": 0}
+    assert stats["ValidationAgent"] == {"hits": 0, "misses": 3}
+    assert stats["SummarizationAgent"] == {"hits": 0, "misses": 3}
+    # Answered by the API this time, not replayed from the cache
+    assert fake_openai.calls("POST", "/chat/completions") == 6
+    assert all(s.summary for s in states)
@@ -0,0 +1,47 @@
+from agents.summarization import SummarizationAgent
+from llm_client import LLMClient
+from state import ClaimState
+
+LONG = " ".join(f"Line {i}: the insured vehicle was damaged on the highway." for i in range(40))
+
+
+def make_agent():
+    agent = SummarizationAgent(LLMClient())
+    # Small budgets so one document is split into several map parts
+    agent.prompt_budget = 200
+    agent.map_budget = 150
+    return agent
+
+
+def make_state():
+    state = ClaimState.from_documents([LONG, "Police report: no injuries."])
+    state.extracted_fields = {"policy_type": "auto"}
+    return state
+
+
+def actions(state):
+    return [entry.action for entry in state.trace]
+
+
+def test_reduce_prompt_has_no_side_effects():
+    agent, state = make_agent(), make_state()
+    parts = agent.map_parts(state)
+    assert len(parts) > 2
+
+    prompt = agent.reduce_prompt(state, parts, ["s"] * len(parts))
+    assert prompt.startswith("Document summaries:")
+    assert agent.reduce_prompt(state, parts, ["s"] * len(parts)) == prompt
+    assert state.trace == []
+
+
+def test_map_reduce_is_traced_once_per_claim():
+    agent = make_agent()
+    state = make_state()
+    agent.run(state)
+    assert actions(state) == ["summarize_documents", "summarize_claim"]
+
+    states = [make_state(), ClaimState.from_documents("Short claim.")]
+    agent.run_batch(states)
+    assert actions(states[0]) == ["summarize_documents", "summarize_claim"]
+    assert actions(states[1]) == ["summarize_claim"]
+    assert states[0].trace[0].info["parts"] == [label for label, _ in agent.map_parts(states[0])]
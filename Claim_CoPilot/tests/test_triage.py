@@ -0,0 +1,56 @@
+import random
+
+from agents.triage import TriageAgent
+from generate_dataset import DEFAULT_SEED, generate_single_claim
+from state import ClaimBatch, ClaimState
+
+
+def make_states(n=200):
+    rng = random.Random(DEFAULT_SEED)
+    states = []
+    for i in range(n):
+        rec = generate_single_claim(i, rng)
+        text = rec["text"]
+        amount = rec["claim_amount"]
+        if i % 5 == 1:
+            amount = float("nan")
+        elif i % 5 == 2:
+            amount = None
+        if i % 3 == 0:
+            # No injury keywords: only the amount rule can match
+            text = f"{rec['claimant_name']} reports a broken window. The estimated cost is ${rec['claim_amount']:.2f}."
+        state = ClaimState.from_documents(text)
+        state.extracted_fields = {"policy_type": rec["policy_type"]}
+        if amount is not None:
+            state.extracted_fields["claim_amount"] = amount
+        states.append(state)
+    # Nothing extracted at all
+    states.append(ClaimState.from_documents("Hello."))
+    return states
+
+
+def outcome(state):
+    return state.triage, [(t.agent, t.action, t.info) for t in state.trace]
+
+
+def test_run_batch_matches_run():
+    agent = TriageAgent()
+    one_by_one, batched = make_states(), make_states()
+    for state in one_by_one:
+        agent.run(state)
+    agent.run_batch(batched)
+
+    assert [outcome(s) for s in batched] == [outcome(s) for s in one_by_one]
+    # Every rule and the default fired somewhere
+    assert {s.triage["priority"] for s in one_by_one} == {"High", "Medium", "Low"}
+
+
+def test_run_batch_on_a_claim_batch_matches_run():
+    agent = TriageAgent(rules=[{"priority": "Medium", "min_amount": 3000.0, "keywords": ("auto",)}],
+                        default_priority="Normal")
+    one_by_one, batched = make_states(60), make_states(60)
+    for state in one_by_one:
+        agent.run(state)
+    agent.run_batch(ClaimBatch(batched))
+
+    assert [outcome(s) for s in batched] == [outcome(s) for s in one_by_one]